@@ -0,0 +1,67 @@
+from typing import Union  # Объединение типов
+
+from grpc import RpcError  # Ошибка вызова
+
+from .proto.tradeapi.v1.orders_pb2 import GetOrdersResult  # Заявки
+from .proto.tradeapi.v1.portfolios_pb2 import GetPortfolioResult  # Портфель
+from .proto.tradeapi.v1.stops_pb2 import GetStopsResult  # Стоп заявки
+
+
+class AccountSnapshot:
+    """Портфель, заявки и стоп заявки одного счета"""
+    parts = ('portfolio', 'orders', 'stops')  # Части снимка счета
+
+    def __init__(self, client_id):
+        """Инициализация
+
+        :param str client_id: Идентификатор торгового счёта
+        """
+        self.client_id = client_id  # Идентификатор торгового счёта
+        self.portfolio: Union[GetPortfolioResult, None] = None  # Портфель
+        self.orders: Union[GetOrdersResult, None] = None  # Заявки
+        self.stops: Union[GetStopsResult, None] = None  # Стоп заявки
+        self.errors: dict[str, RpcError] = {}  # Ошибки по части снимка
+        self.latencies: dict[str, float] = {}  # Длительность вызова по части снимка, с
+
+    @property
+    def ok(self) -> bool:
+        """Все запрошенные части получены без ошибок"""
+        return not self.errors
+
+    def __repr__(self):
+        return f'AccountSnapshot({self.client_id}, ok={self.ok}, latencies={self.latencies})'
+
+
+class AccountsSnapshot:
+    """Снимок нескольких счетов, полученный параллельными вызовами. Ошибка по одному счету не влияет на остальные"""
+
+    def __init__(self, accounts: dict[str, AccountSnapshot], duration):
+        """Инициализация
+
+        :param dict accounts: Снимки по идентификатору счета
+        :param float duration: Общая длительность получения снимка, с
+        """
+        self.accounts = accounts  # Снимки по идентификатору счета
+        self.duration = duration  # Общая длительность, с
+
+    def __getitem__(self, client_id) -> AccountSnapshot:
+        return self.accounts[client_id]
+
+    def __iter__(self):
+        return iter(self.accounts.values())
+
+    def __len__(self):
+        return len(self.accounts)
+
+    @property
+    def errors(self) -> dict[str, dict[str, RpcError]]:
+        """Ошибки по счету и части снимка"""
+        return {client_id: account.errors for client_id, account in self.accounts.items() if account.errors}
+
+    @property
+    def max_latency(self) -> float:
+        """Самый долгий вызов, с"""
+        return max((latency for account in self.accounts.values() for latency in account.latencies.values()), default=0.0)
+
+    def __repr__(self):
+        return f'AccountsSnapshot({len(self.accounts)} счетов, {self.duration * 1000:.1f} мс, ошибок: {len(self.errors)})'
@@ -0,0 +1,270 @@
+from asyncio import Queue, CancelledError, current_task  # Очередь подписок/отписок, отмена потока событий
+from typing import AsyncIterator, Union  # Асинхронный итератор событий, объединение типов
+from uuid import uuid4  # Номера подписок должны быть уникальными во времени и пространстве
+
+from grpc import ssl_channel_credentials, ChannelCredentials  # Защищенный канал
+from grpc.aio import secure_channel, AioRpcError  # Асинхронный канал
+from google.protobuf.timestamp_pb2 import Timestamp  # Представление времени
+from google.protobuf.wrappers_pb2 import DoubleValue  # Представление цены
+from .proto.tradeapi.v1 import common_pb2 as common  # Покупка/продажа
+from .proto.tradeapi.v1.common_pb2 import OrderValidBefore  # Время действия заявки
+from .proto.tradeapi.v1.events_pb2 import (
+    SubscriptionRequest, OrderBookSubscribeRequest, OrderBookUnsubscribeRequest, OrderTradeSubscribeRequest, OrderTradeUnsubscribeRequest,
+    Event)  # Запросы и события подписок
+from .grpc.tradeapi.v1.events_pb2_grpc import EventsStub  # Сервис подписок
+from .proto.tradeapi.v1.orders_pb2 import (
+    GetOrdersRequest, GetOrdersResult,
+    OrderProperty, OrderCondition, NewOrderRequest, NewOrderResult,
+    CancelOrderRequest, CancelOrderResult)  # Заявки
+from .grpc.tradeapi.v1.orders_pb2_grpc import OrdersStub  # Сервис заявок
+from .proto.tradeapi.v1.portfolios_pb2 import PortfolioContent, GetPortfolioRequest, GetPortfolioResult  # Портфель
+from .grpc.tradeapi.v1.portfolios_pb2_grpc import PortfoliosStub  # Сервис портфелей
+from .grpc.tradeapi.v1.securities_pb2 import GetSecuritiesRequest, GetSecuritiesResult  # Тикеры
+from .grpc.tradeapi.v1.securities_pb2_grpc import SecuritiesStub  # Сервис тикеров
+from .proto.tradeapi.v1.stops_pb2 import (
+    GetStopsRequest, GetStopsResult, StopLoss, TakeProfit, NewStopRequest, NewStopResult, CancelStopRequest, CancelStopResult)  # Стоп заявки
+from .grpc.tradeapi.v1.stops_pb2_grpc import StopsStub  # Сервис стоп заявок
+from .EventDispatcher import EventDispatcher  # Диспетчер событий подписок
+from .FinamPy import FinamPy  # Синхронный клиент. Берем из него сервер, рынки и временнУю зону
+
+
+class AsyncFinamPy:
+    """Асинхронная работа с сервером TRANSAQ из Python через gRPC (grpc.aio)
+
+    Экземпляр создается внутри работающего цикла событий asyncio. Вызовы запрос/ответ не занимают потоков,
+    события подписок читаются через async for из events() или передаются в диспетчер через dispatch_events()
+    """
+    tz_msk = FinamPy.tz_msk  # Московская временнАя зона
+    server = FinamPy.server  # Сервер для исполнения вызовов
+    markets = FinamPy.markets  # Рынки
+
+    def __init__(self, access_token, server=None, credentials: ChannelCredentials = None):
+        """Инициализация
+
+        :param str access_token: Торговый токен доступа
+        :param str server: Сервер для исполнения вызовов. None - сервер Finam Trade API
+        :param ChannelCredentials credentials: Учетные данные канала. None - SSL. Для локального сервера grpc.local_channel_credentials()
+        """
+        self.metadata = [('x-api-key', access_token)]  # Торговый токен доступа
+        if server:  # Если задан сервер
+            self.server = server  # то работаем с ним
+        self.channel = secure_channel(self.server, credentials or ssl_channel_credentials())  # Защищенный асинхронный канал
+
+        # Сервисы
+        self.events_stub = EventsStub(self.channel)  # Сервис событий
+        self.orders_stub = OrdersStub(self.channel)  # Сервис заявок
+        self.portfolios_stub = PortfoliosStub(self.channel)  # Сервис портфелей
+        self.securities_stub = SecuritiesStub(self.channel)  # Сервис тикеров
+        self.stops_stub = StopsStub(self.channel)  # Сервис стоп заявок
+
+        self.dispatcher = EventDispatcher()  # Диспетчер событий для dispatch_events()
+        self.subscription_queue: Queue[Union[SubscriptionRequest, None]] = Queue()  # Буфер команд на подписку/отписку. None - завершение потока событий
+
+    async def __aenter__(self):
+        """Вход в класс с async with"""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Выход из класса с async with"""
+        await self.close()
+
+    # Запросы
+
+    async def call_function(self, func, request):
+        """Вызов функции"""
+        try:  # Пытаемся
+            return await func(request, metadata=self.metadata)  # вызвать функцию и вернуть ответ
+        except AioRpcError:  # Если получили ошибку канала
+            return None  # то возвращаем пустое значение
+
+    # Events
+
+    async def request_iterator(self):
+        """Асинхронный генератор запросов на подписку/отписку"""
+        while True:  # Будем пытаться читать из очереди до закрытия канала
+            request = await self.subscription_queue.get()
+            if request is None:  # Если пришла команда завершения потока событий
+                return  # то закрываем поток запросов
+            yield request
+
+    async def events(self) -> AsyncIterator[Event]:
+        """Асинхронный поток событий подписок. Пустые события пропускаются"""
+        call = self.events_stub.GetEvents(self.request_iterator(), metadata=self.metadata)  # Получаем значения подписок
+        try:
+            async for event in call:  # Пробегаемся по значениям подписок до закрытия канала
+                if event.WhichOneof('payload'):  # Если событие не пустое
+                    yield event
+        except AioRpcError:  # При закрытии канала попадем на эту ошибку
+            pass  # Все в порядке, ничего делать не нужно
+        except CancelledError:  # Закрытие канала отменяет вызов
+            task = current_task()
+            if task is not None and getattr(task, 'cancelling', lambda: 0)():  # Если отменяют саму задачу, а не вызов
+                raise  # то передаем отмену дальше
+        finally:
+            call.cancel()  # Закрываем поток событий, если из цикла вышли раньше
+
+    async def dispatch_events(self):
+        """Передача событий подписок обработчикам диспетчера до закрытия потока событий"""
+        dispatch = self.dispatcher.dispatch  # Передача события обработчикам по типу события
+        async for event in self.events():  # Пробегаемся по событиям подписок
+            dispatch(event)
+
+    async def subscribe_order_book(self, security_code, security_board, request_id=None) -> str:
+        """Запрос подписки на стакан
+
+        :param str security_code: Тикер инструмента
+        :param str security_board: Режим торгов
+        :param str request_id: Идентификатор запроса
+        """
+        if not request_id:  # Если идентификатор запроса не указан
+            request_id = str(uuid4())  # то создаем его из уникального идентификатора
+        await self.subscription_queue.put(SubscriptionRequest(order_book_subscribe_request=OrderBookSubscribeRequest(
+            request_id=request_id, security_code=security_code, security_board=security_board)))
+        return request_id
+
+    async def unsubscribe_order_book(self, request_id, security_code, security_board):
+        """Запрос на отписку от стакана
+
+        :param str request_id: Идентификатор запроса
+        :param str security_code: Тикер инструмента
+        :param str security_board: Режим торгов
+        """
+        await self.subscription_queue.put(SubscriptionRequest(order_book_unsubscribe_request=OrderBookUnsubscribeRequest(
+            request_id=request_id, security_code=security_code, security_board=security_board)))
+
+    async def subscribe_order_trade(self, client_ids, include_trades=True, include_orders=True, request_id=None) -> str:
+        """Запрос подписки на ордера и сделки
+
+        :param list client_ids: Торговые коды счетов
+        :param bool include_trades: Включить сделки в подписку
+        :param bool include_orders: Включить заявки в подписку
+        :param str request_id: Идентификатор запроса
+        """
+        if not request_id:  # Если идентификатор запроса не указан
+            request_id = str(uuid4())  # то создаем его из уникального идентификатора
+        await self.subscription_queue.put(SubscriptionRequest(order_trade_subscribe_request=OrderTradeSubscribeRequest(
+            request_id=request_id, client_ids=client_ids, include_trades=include_trades, include_orders=include_orders)))
+        return request_id
+
+    async def unsubscribe_order_trade(self, request_id):
+        """Отменить все предыдущие запросы на подписки на ордера и сделки
+
+        :param str request_id: Идентификатор запроса
+        """
+        await self.subscription_queue.put(SubscriptionRequest(order_trade_unsubscribe_request=OrderTradeUnsubscribeRequest(
+            request_id=request_id)))
+
+    # Orders
+
+    async def get_orders(self, client_id, include_matched=True, include_canceled=True, include_active=True) -> Union[GetOrdersResult, None]:
+        """Возвращает список заявок. Параметры как у FinamPy.get_orders
+
+        :param str client_id: Идентификатор торгового счёта
+        :param bool include_matched: Вернуть исполненные заявки
+        :param bool include_canceled: Вернуть отмененные заявки
+        :param bool include_active: Вернуть активные заявки
+        """
+        request = GetOrdersRequest(client_id=client_id, include_matched=include_matched, include_canceled=include_canceled, include_active=include_active)
+        return await self.call_function(self.orders_stub.GetOrders, request)
+
+    async def new_order(self, client_id, security_board, security_code, buy_sell: common, quantity, use_credit=False, price: float = None,
+                        property: OrderProperty = OrderProperty.ORDER_PROPERTY_PUT_IN_QUEUE, condition: OrderCondition = None, valid_before: OrderValidBefore = None) -> Union[NewOrderResult, None]:
+        """Создать новую заявку. Параметры как у FinamPy.new_order
+
+        :param str client_id: Идентификатор торгового счёта
+        :param str security_board: Режим торгов
+        :param str security_code: Тикер инструмента
+        :param common buy_sell: Направление сделки
+        :param int quantity: Количество лотов инструмента для заявки
+        :param bool use_credit: Использовать кредит. Недоступно для срочного рынка
+        :param float price: Цена заявки. None для рыночной заявки
+        :param OrderProperty property: Поведение заявки при выставлении в стакан
+        :param OrderCondition condition: Типы условных ордеров
+        :param OrderValidBefore valid_before: Условие по времени действия заявки
+        """
+        request = NewOrderRequest(client_id=client_id, security_board=security_board, security_code=security_code, buy_sell=buy_sell, quantity=quantity, price=DoubleValue(value=price),
+                                  use_credit=use_credit, property=property, condition=condition, valid_before=valid_before)
+        return await self.call_function(self.orders_stub.NewOrder, request)
+
+    async def cancel_order(self, client_id, transaction_id) -> Union[CancelOrderResult, None]:
+        """Отменяет заявку
+
+        :param str client_id: Идентификатор торгового счёта
+        :param int transaction_id: Идентификатор транзакции, который может быть использован для отмены заявки или определения номера заявки в сервисе событий
+        """
+        request = CancelOrderRequest(client_id=client_id, transaction_id=transaction_id)
+        return await self.call_function(self.orders_stub.CancelOrder, request)
+
+    # Portfolios
+
+    async def get_portfolio(self, client_id, include_currencies=True, include_money=True, include_positions=True, include_max_buy_sell=True) -> Union[GetPortfolioResult, None]:
+        """Возвращает портфель
+
+        :param str client_id: Идентификатор торгового счёта
+        :param bool include_currencies: Валютные позиции
+        :param bool include_money: Денежные позиции
+        :param bool include_positions: Позиции DEPO
+        :param bool include_max_buy_sell: Лимиты покупки и продажи
+        """
+        request = GetPortfolioRequest(client_id=client_id, content=PortfolioContent(
+            include_currencies=include_currencies,
+            include_money=include_money,
+            include_positions=include_positions,
+            include_max_buy_sell=include_max_buy_sell))
+        return await self.call_function(self.portfolios_stub.GetPortfolio, request)
+
+    # Securities
+
+    async def get_securities(self) -> Union[GetSecuritiesResult, None]:
+        """Справочник инструментов"""
+        request = GetSecuritiesRequest()
+        return await self.call_function(self.securities_stub.GetSecurities, request)
+
+    # Stops
+
+    async def get_stops(self, client_id, include_executed=True, include_canceled=True, include_active=True) -> Union[GetStopsResult, None]:
+        """Возвращает список стоп-заявок
+
+        :param str client_id: Идентификатор торгового счёта
+        :param bool include_executed: Вернуть исполненные стоп-заявки
+        :param bool include_canceled: Вернуть отмененные стоп-заявки
+        :param bool include_active: Вернуть активные стоп-заявки
+        """
+        request = GetStopsRequest(client_id=client_id, include_executed=include_executed, include_canceled=include_canceled, include_active=include_active)
+        return await self.call_function(self.stops_stub.GetStops, request)
+
+    async def new_stop(self, client_id, security_board, security_code, buy_sell: common,
+                       stop_loss: StopLoss = None, take_profit: TakeProfit = None,
+                       expiration_date: Timestamp = None, link_order=None, valid_before: common.OrderValidBefore = None) -> Union[NewStopResult, None]:
+        """Выставляет стоп-заявку. Параметры как у FinamPy.new_stop
+
+        :param str client_id: Идентификатор торгового счёта
+        :param str security_board: Режим торгов
+        :param str security_code: Тикер инструмента
+        :param common buy_sell: Направление сделки
+        :param StopLoss stop_loss: Стоп лосс заявка
+        :param TakeProfit take_profit: Тейк профит заявка
+        :param Timestamp expiration_date: Дата экспирации заявки FORTS
+        :param int link_order: Биржевой номер связанной (активной) заявки
+        :param common.OrderValidBefore valid_before: Время действия заявки
+        """
+        request = NewStopRequest(client_id=client_id, security_board=security_board, security_code=security_code, buy_sell=buy_sell,
+                                 stop_loss=stop_loss, take_profit=take_profit,
+                                 expiration_date=expiration_date, link_order=link_order, valid_before=valid_before)
+        return await self.call_function(self.stops_stub.NewStop, request)
+
+    async def cancel_stop(self, client_id, stop_id) -> Union[CancelStopResult, None]:
+        """Снимает стоп-заявку
+
+        :param str client_id: Идентификатор торгового счёта
+        :param int stop_id: Идентификатор стоп-заявки
+        """
+        request = CancelStopRequest(client_id=client_id, stop_id=stop_id)
+        return await self.call_function(self.stops_stub.CancelStop, request)
+
+    # Выход и закрытие
+
+    async def close(self):
+        """Закрытие потока событий и канала"""
+        self.subscription_queue.put_nowait(None)  # Завершаем поток запросов на подписку
+        await self.channel.close()  # Закрываем канал
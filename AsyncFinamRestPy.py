@@ -0,0 +1,289 @@
+from asyncio import gather, Semaphore  # Параллельные запросы, ограничение их количества
+
+from .AsyncRestTransport import AsyncRestTransport  # Асинхронный транспорт запросов с пулом постоянных соединений
+from .FinamRestPy import FinamRestPy  # Синхронный клиент. Берем из него сервер и анализ результата запроса
+
+
+class AsyncFinamRestPy:
+    """Асинхронная работа с Comon Trade Api из Python через aiohttp
+
+    Методы такие же, как у FinamRestPy, но не блокируют цикл событий asyncio. Несколько запросов
+    выполняются параллельно через gather() или пакетные методы. Несколько счетов могут работать через один транспорт:
+    AsyncFinamRestPy(client_id, token, transport=other.transport)
+    """
+    server = FinamRestPy.server  # Сервер для исполнения вызовов
+
+    def default_handler(self, response=None):
+        """Пустой обработчик события по умолчанию. Его можно заменить на пользовательский"""
+        pass
+
+    # Функции для запросов/ответов
+
+    get_headers = FinamRestPy.get_headers  # Хедеры для запросов такие же, как у синхронного клиента
+    check_result = FinamRestPy.check_result  # Анализ результата запроса такой же, как у синхронного клиента. Транспорт отдает ответ с прочитанным телом
+
+    async def gather(self, *coroutines, max_concurrency=None):
+        """Параллельное выполнение запросов
+
+        :param coroutines: Запросы этого клиента, например, self.get_orders(), self.get_portfolio()
+        :param int max_concurrency: Максимальное количество одновременных запросов. None - без ограничения
+        :return: Результаты в порядке запросов. Вместо исключения - None, исключение передается в OnError
+        """
+        if max_concurrency:  # Если количество одновременных запросов ограничено
+            semaphore = Semaphore(max_concurrency)
+
+            async def limited(coroutine):
+                async with semaphore:
+                    return await coroutine
+            coroutines = [limited(coroutine) for coroutine in coroutines]
+        results = await gather(*coroutines, return_exceptions=True)  # Ошибка одного запроса не отменяет остальные
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):  # Если запрос завершился исключением
+                self.OnError(f'Ошибка запроса: {result!r}')  # Событие ошибки
+                results[i] = None
+        return results
+
+    # Инициализация и вход
+
+    def __init__(self, client_id, access_token, server=None, pool_size=10, timeout=(3.05, 30), transport: AsyncRestTransport = None):
+        """Инициализация
+
+        :param str client_id: Идентификатор торгового счёта
+        :param str access_token: Торговый токен доступа
+        :param str server: Сервер для исполнения вызовов. None - сервер Comon Trade API
+        :param int pool_size: Максимальное количество постоянных соединений с сервером
+        :param timeout: Таймаут запросов по умолчанию, с: число или (подключение, чтение)
+        :param AsyncRestTransport transport: Общий транспорт запросов. None - создать свой
+        """
+        self.client_id = client_id  # Идентификатор торгового счёта
+        self.access_token = access_token  # Торговый токен доступа
+        self.headers = self.get_headers()  # Заголовки с токеном передаются в каждом запросе, поэтому транспорт может быть общим для счетов с разными токенами
+        if server:  # Если задан сервер
+            self.server = server  # то работаем с ним
+        self.transport = transport or AsyncRestTransport(self.server, access_token, pool_size, timeout)  # Транспорт запросов. Сессия создается при первом запросе
+        self.OnError = self.default_handler  # Ошибка
+
+    async def __aenter__(self):
+        """Вход в класс с async with"""
+        return self
+
+    async def close(self):
+        """Закрытие соединений с сервером"""
+        await self.transport.close()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Выход из класса с async with"""
+        await self.close()  # Закрываем соединения
+
+    # AccessTokens
+
+    async def check_access_token(self):
+        """Проверка токена"""
+        return self.check_result(await self.transport.get('/api/v1/access-tokens/check', headers=self.headers))
+
+    # Orders
+
+    async def create_order(self, security_board, security_code, buy_sell, quantity, use_credit, price, property,
+                           condition_type, condition_price, condition_time, valid_type, valid_time):
+        """Создать новую заявку. Параметры как у FinamRestPy.create_order
+
+        :param str security_board: Режим торгов
+        :param str security_code: Тикер инструмента
+        :param str buy_sell: Направление сделки 'Buy'/'Sell'
+        :param int quantity: Количество лотов инструмента для заявки
+        :param bool use_credit: Использовать кредит. Недоступно для срочного рынка
+        :param float price: Цена заявки. 0 для рыночной заявки
+        :param str property: Поведение заявки при выставлении в стакан
+        :param str condition_type: Типы условных ордеров
+        :param float condition_price: Значение цены для условия
+        :param str condition_time: Время, когда заявка была отменена на сервере. В UTC
+        :param str valid_type: Установка временнЫх рамок действия заявки
+        :param str valid_time: Время, когда заявка была отменена на сервере. В UTC
+        """
+        params = {'clientId': self.client_id,
+                  'securityBoard': security_board,
+                  'securityCode': security_code,
+                  'buySell': buy_sell,
+                  'quantity': quantity,
+                  'useCredit': use_credit,
+                  'price': price,
+                  'property': property,
+                  'condition':
+                      {'type': condition_type,
+                       'price': condition_price,
+                       'time': condition_time},
+                  'validBefore':
+                      {'type': valid_type,
+                       'time': valid_time}}
+        return self.check_result(await self.transport.post('/api/v1/orders', params=params, headers=self.headers))
+
+    async def delete_order(self, transaction_id):
+        """Отменяет заявку
+
+        :param int transaction_id: Идентификатор транзакции, который может быть использован для отмены заявки или определения номера заявки в сервисе событий
+        """
+        params = {'ClientId': self.client_id, 'TransactionId': transaction_id}
+        return self.check_result(await self.transport.delete('/api/v1/orders', params=params, headers=self.headers))
+
+    async def delete_orders(self, transaction_ids, max_concurrency=None):
+        """Параллельная отмена нескольких заявок
+
+        :param transaction_ids: Идентификаторы транзакций
+        :param int max_concurrency: Максимальное количество одновременных запросов. None - без ограничения
+        :return: Результаты отмены в порядке идентификаторов. None - ошибка
+        """
+        return await self.gather(*(self.delete_order(transaction_id) for transaction_id in transaction_ids), max_concurrency=max_concurrency)
+
+    async def get_orders(self, include_matched=True, include_canceled=True, include_active=True):
+        """Возвращает список заявок
+
+        :param bool include_matched: Вернуть исполненные заявки
+        :param bool include_canceled: Вернуть отмененные заявки
+        :param bool include_active: Вернуть активные заявки
+        """
+        params = {'ClientId': self.client_id,
+                  'IncludeMatched': include_matched,
+                  'IncludeCanceled': include_canceled,
+                  'IncludeActive': include_active}
+        return self.check_result(await self.transport.get('/api/v1/orders', params=params, headers=self.headers))
+
+    # Portfolio
+
+    async def get_portfolio(self, include_currencies=True, include_money=True, include_positions=True, include_max_buy_sell=True):
+        """Возвращает портфель
+
+        :param bool include_currencies: Валютные позиции
+        :param bool include_money: Денежные позиции
+        :param bool include_positions: Позиции DEPO
+        :param bool include_max_buy_sell: Лимиты покупки и продажи
+        """
+        params = {'ClientId': self.client_id,
+                  'Content.IncludeCurrencies': include_currencies,
+                  'Content.IncludeMoney': include_money,
+                  'Content.IncludePositions': include_positions,
+                  'Content.IncludeMaxBuySell': include_max_buy_sell}
+        return self.check_result(await self.transport.get('/api/v1/portfolio', params=params, headers=self.headers))
+
+    async def get_snapshot(self):
+        """Портфель, заявки и стоп-заявки счета, полученные параллельно
+
+        :return: (портфель, заявки, стоп-заявки). None - ошибка запроса
+        """
+        return tuple(await self.gather(self.get_portfolio(), self.get_orders(), self.get_stop_orders()))
+
+    # Securities
+
+    async def get_securities(self):
+        """Справочник инструментов"""
+        return self.check_result(await self.transport.get('/api/v1/securities', headers=self.headers))
+
+    # Stops
+
+    async def create_stop_order(self, security_board, security_code, buy_sell,
+                                sl_activation_price, sl_price, sl_market_price, sl_value, sl_units, sl_time, sl_use_credit,
+                                tp_activation_price, tp_correction_price_value, tp_correction_price_units, tp_spread_price_value, tp_spread_price_units,
+                                tp_market_price, tp_quantity_value, tp_quantity_units, tp_time, tp_use_credit,
+                                expiration_date, link_order, valid_type, valid_time):
+        """Выставляет стоп-заявку. Параметры как у FinamRestPy.create_stop_order
+
+        :param str security_board: Режим торгов
+        :param str security_code: Тикер инструмента
+        :param str buy_sell: Направление сделки
+            'Buy' - покупка
+            'Sell' - продажа
+        :param float sl_activation_price: Цена активации
+        :param float sl_price: Цена заявки
+        :param bool sl_market_price: По рынку
+        :param float sl_value: Значение объема стоп-заявки
+        :param str sl_units: Единицы объема стоп-заявки
+            'Percent' - Процент
+            'Lots' - Лоты
+        :param int sl_time: Защитное время, сек.
+        :param bool sl_use_credit: Использовать кредит
+        :param float tp_activation_price: Цена активации
+        :param float tp_correction_price_value: Значение цены стоп-заявки
+        :param str tp_correction_price_units: Единицы цены стоп-заявки
+            'Percent' - Процент
+            'Pips' - Шаги цены
+        :param float tp_spread_price_value: Значение цены стоп-заявки
+        :param str tp_spread_price_units: Единицы цены стоп-заявки
+            'Percent' - Процент
+            'Pips' - Шаги цены
+        :param bool tp_market_price: По рынку
+        :param float tp_quantity_value: Значение объема стоп-заявки
+        :param str tp_quantity_units: Единицы объема стоп-заявки
+            'Percent' - Процент
+            'Lots' - Лоты
+        :param int tp_time: Защитное время, сек.
+        :param bool tp_use_credit: Использовать кредит
+        :param str expiration_date: Время, когда заявка была отменена на сервере. В UTC
+        :param int link_order: Биржевой номер связанной (активной) заявки
+        :param str valid_type: Установка временнЫх рамок действия заявки
+            'TillEndSession' - До окончания текущей сессии
+            'TillCancelled' - До отмены
+            'ExactTime' - До заданного времени (valid_time)
+        :param str valid_time: Время, когда заявка была отменена на сервере. В UTC
+        """
+        params = {'clientId': self.client_id,
+                  'securityBoard': security_board,
+                  'securityCode': security_code,
+                  'buySell': buy_sell,
+                  'stopLoss':
+                      {'activationPrice': sl_activation_price,
+                       'price': sl_price,
+                       'marketPrice': sl_market_price,
+                       'quantity':
+                           {'value': sl_value,
+                            'units': sl_units},
+                       'time': sl_time,
+                       'useCredit': sl_use_credit},
+                  'takeProfit':
+                      {'activationPrice': tp_activation_price,
+                       'correctionPrice':
+                           {'value': tp_correction_price_value,
+                            'units': tp_correction_price_units},
+                       'spreadPrice':
+                           {'value': tp_spread_price_value,
+                            'units': tp_spread_price_units},
+                       'marketPrice': tp_market_price,
+                       'quantity':
+                           {'value': tp_quantity_value,
+                            'units': tp_quantity_units},
+                       'time': tp_time,
+                       'useCredit': tp_use_credit},
+                  'expirationDate': expiration_date,
+                  'linkOrder': link_order,
+                  'validBefore':
+                      {'type': valid_type,
+                       'time': valid_time}}
+        return self.check_result(await self.transport.post('/api/v1/orders', params=params, headers=self.headers))
+
+    async def delete_stop_order(self, stop_id):
+        """Снимает стоп-заявку
+
+        :param int stop_id: Идентификатор стоп-заявки
+        """
+        params = {'ClientId': self.client_id, 'StopId': stop_id}
+        return self.check_result(await self.transport.delete('/api/v1/stops', params=params, headers=self.headers))
+
+    async def delete_stop_orders(self, stop_ids, max_concurrency=None):
+        """Параллельное снятие нескольких стоп-заявок
+
+        :param stop_ids: Идентификаторы стоп-заявок
+        :param int max_concurrency: Максимальное количество одновременных запросов. None - без ограничения
+        :return: Результаты снятия в порядке идентификаторов. None - ошибка
+        """
+        return await self.gather(*(self.delete_stop_order(stop_id) for stop_id in stop_ids), max_concurrency=max_concurrency)
+
+    async def get_stop_orders(self, include_executed=True, include_canceled=True, include_active=True):
+        """Возвращает список стоп-заявок
+
+        :param bool include_executed: Вернуть исполненные стоп-заявки
+        :param bool include_canceled: Вернуть отмененные стоп-заявки
+        :param bool include_active: Вернуть активные стоп-заявки
+        """
+        params = {'ClientId': self.client_id,
+                  'IncludeExecuted': include_executed,
+                  'IncludeCanceled': include_canceled,
+                  'IncludeActive': include_active}
+        return self.check_result(await self.transport.get('/api/v1/orders', params=params, headers=self.headers))
@@ -0,0 +1,116 @@
+from collections import namedtuple  # Ответ сервера
+from time import perf_counter  # Замер длительности запросов
+from typing import Callable, Union  # Обработчик запросов, объединение типов
+
+
+AsyncRestResponse = namedtuple('AsyncRestResponse', 'status_code content request')  # Ответ сервера с прочитанным телом. Поля как у requests.Response
+
+
+class AsyncRestTransport:
+    """Асинхронный транспорт запросов REST на aiohttp: сессия с пулом постоянных соединений, заголовками и таймаутами по умолчанию
+
+    Сессия создается при первом запросе внутри работающего цикла событий asyncio. Статистика и обработчик on_request
+    такие же, как у RestTransport. Для работы нужен пакет aiohttp
+    """
+
+    def __init__(self, server, access_token, pool_size=10, timeout=(3.05, 30)):
+        """Инициализация
+
+        :param str server: Сервер, например, https://trade-api.comon.ru
+        :param str access_token: Торговый токен доступа по умолчанию. Клиенты передают свой токен в заголовках каждого запроса
+        :param int pool_size: Максимальное количество постоянных соединений с сервером
+        :param timeout: Таймаут по умолчанию, с: число или (подключение, чтение)
+        """
+        self.server = server.rstrip('/')  # Сервер
+        self.pool_size = pool_size  # Максимальное количество соединений
+        self.timeout = timeout  # Таймаут по умолчанию
+        self.headers = {'accept': 'text/plain', 'X-Api-Key': access_token}  # Заголовки собираются один раз
+        self.session = None  # Сессия aiohttp. Создается при первом запросе
+        self.on_request: Union[Callable, None] = None  # Обработчик завершения запроса (метод, путь, статус, длительность). None - без обработчика
+        self.stats: dict[tuple[str, str], dict] = {}  # Статистика по (метод, путь): count, errors, total, max. Цикл событий один, блокировка не нужна
+
+    @staticmethod
+    def client_timeout(timeout):
+        """Таймаут aiohttp из числа или (подключение, чтение)"""
+        from aiohttp import ClientTimeout
+        if isinstance(timeout, tuple):  # Если таймауты подключения и чтения заданы отдельно
+            return ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+        return ClientTimeout(total=timeout)
+
+    @staticmethod
+    def query(params):
+        """Параметры запроса в том же виде, что и у requests: логические значения - True/False, None пропускается, у вложенных справочников - ключи
+
+        :param dict params: Параметры запроса
+        :return: Список пар (имя, значение)
+        """
+        if not params:  # Если параметров нет
+            return None
+        query = []
+        for name, value in params.items():
+            if value is None:  # requests не передает пустые значения
+                continue
+            if isinstance(value, (dict, list, tuple)):  # requests передает каждый элемент отдельно
+                query.extend((name, str(item)) for item in value if item is not None)
+            else:
+                query.append((name, str(value)))
+        return query
+
+    def get_session(self):
+        """Сессия aiohttp. Создается при первом обращении внутри цикла событий"""
+        if self.session is None or self.session.closed:  # Если сессии нет или она закрыта
+            try:
+                from aiohttp import ClientSession, TCPConnector
+            except ImportError:  # Если aiohttp не установлен
+                raise ImportError('Для асинхронных запросов REST установите пакет aiohttp') from None
+            self.session = ClientSession(connector=TCPConnector(limit=self.pool_size), headers=self.headers, timeout=self.client_timeout(self.timeout))
+        return self.session
+
+    async def request(self, method, path, params=None, timeout=None, headers=None) -> AsyncRestResponse:
+        """Запрос к серверу
+
+        :param str method: Метод HTTP: GET, POST, DELETE
+        :param str path: Путь, например, /api/v1/orders
+        :param dict params: Параметры запроса
+        :param timeout: Таймаут, с. None - по умолчанию
+        :param dict headers: Дополнительные заголовки
+        :return: Ответ сервера (статус, тело, запрос)
+        """
+        session = self.get_session()
+        kwargs = {'timeout': self.client_timeout(timeout)} if timeout else {}  # Без таймаута запроса действует таймаут сессии. timeout=None его бы отключил
+        start = perf_counter()  # Начало запроса
+        status = None  # Статус ответа. None - ответ не получен
+        try:
+            async with session.request(method, f'{self.server}{path}', params=self.query(params), headers=headers, **kwargs) as response:
+                content = await response.read()  # Тело читаем до возврата соединения в пул
+                status = response.status
+                return AsyncRestResponse(status, content, response.request_info)
+        finally:
+            duration = perf_counter() - start  # Длительность запроса
+            stats = self.stats.get((method, path))
+            if stats is None:  # Если запросов к этой точке доступа еще не было
+                stats = self.stats[(method, path)] = {'count': 0, 'errors': 0, 'total': 0.0, 'max': 0.0}
+            stats['count'] += 1
+            stats['errors'] += status is None or status >= 400
+            stats['total'] += duration
+            stats['max'] = max(stats['max'], duration)
+            if self.on_request:  # Если задан обработчик запросов
+                self.on_request(method, path, status, duration)
+
+    async def get(self, path, params=None, **kwargs) -> AsyncRestResponse:
+        """Запрос GET"""
+        return await self.request('GET', path, params, **kwargs)
+
+    async def post(self, path, params=None, **kwargs) -> AsyncRestResponse:
+        """Запрос POST"""
+        return await self.request('POST', path, params, **kwargs)
+
+    async def delete(self, path, params=None, **kwargs) -> AsyncRestResponse:
+        """Запрос DELETE"""
+        return await self.request('DELETE', path, params, **kwargs)
+
+    async def close(self):
+        """Закрытие всех соединений"""
+        if self.session is not None:  # Если сессия создавалась
+            await self.session.close()
+            self.session = None
@@ -0,0 +1,356 @@
+from collections import namedtuple  # Бар для обработчика
+from math import nan  # Средневзвешенная цена бара без объема
+from threading import Lock  # Блокировка баров при обновлении и чтении
+from time import time_ns  # Время получения стакана
+from typing import Callable, Union  # Обработчик баров, объединение типов
+
+import numpy as np  # Бары храним в предвыделенных массивах
+
+from .proto.tradeapi.v1.events_pb2 import TradeEvent, OrderBookEvent, TimeFrame  # События сделок и стаканов, таймфрейм
+from .EventDispatcher import EventDispatcher  # Диспетчер событий подписок
+from .MskTime import MskTime  # Перевод времени UTC в московское
+
+Bar = namedtuple('Bar', 'time open high low close volume vwap trades')  # Бар: время начала (datetime64[ns] МСК), OHLC, объем, средневзвешенная цена, кол-во сделок
+bar_dtype = np.dtype([('time', 'datetime64[ns]'), ('open', np.float64), ('high', np.float64), ('low', np.float64), ('close', np.float64),
+                      ('volume', np.float64), ('vwap', np.float64), ('trades', np.int64)])  # Бары в массиве
+
+minute_ns = 60 * 1_000_000_000  # Минута, нс
+day_ns = 24 * 60 * minute_ns  # День, нс
+timeframe_units = {TimeFrame.UNIT_MINUTE: 'M1', TimeFrame.UNIT_HOUR: 'H1', TimeFrame.UNIT_DAY: 'D1', TimeFrame.UNIT_WEEK: 'W1',
+                   TimeFrame.UNIT_MONTH: 'MN1', TimeFrame.UNIT_QUARTER: 'Q1', TimeFrame.UNIT_YEAR: 'Y1'}  # Таймфрейм по единице измерения TimeFrame
+calendar_months = {'MN': 1, 'Q': 3, 'Y': 12}  # Календарные таймфреймы в месяцах
+
+
+def parse_timeframe(timeframe: Union[str, TimeFrame]) -> tuple[str, int]:
+    """Разбор таймфрейма
+
+    :param timeframe: Таймфрейм: M<минут>, H<часов>, D1, W1, MN1 (месяц), Q1 (квартал), Y1 (год) или сообщение TimeFrame
+    :return: Единица измерения (M, H, D, W, MN, Q, Y), количество
+    """
+    if isinstance(timeframe, TimeFrame):  # Если таймфрейм задан сообщением
+        if timeframe.time_unit not in timeframe_units:
+            raise ValueError(f'Не задана единица измерения таймфрейма {timeframe}')
+        timeframe = timeframe_units[timeframe.time_unit]
+    unit = timeframe.rstrip('0123456789')  # Единица измерения
+    count = timeframe[len(unit):]  # Количество
+    if unit not in ('M', 'H', 'D', 'W', 'MN', 'Q', 'Y') or not count.isdigit() or int(count) < 1 or (unit not in ('M', 'H') and count != '1'):
+        raise ValueError(f'Неизвестный таймфрейм {timeframe}. Допустимые таймфреймы: M<минут>, H<часов>, D1, W1, MN1, Q1, Y1')
+    return unit, int(count)
+
+
+def bar_bounds(unit, count, msk_ns: int) -> tuple[int, int]:
+    """Начало и окончание бара, в который попадает время
+
+    :param str unit: Единица измерения таймфрейма
+    :param int count: Количество единиц
+    :param int msk_ns: Московское время, нс Unix
+    :return: Начало бара, окончание бара, нс Unix
+    """
+    if unit in ('M', 'H', 'D'):  # Бары фиксированной длительности
+        size = count * (minute_ns if unit == 'M' else 60 * minute_ns if unit == 'H' else day_ns)
+        start = msk_ns - msk_ns % size
+        return start, start + size
+    if unit == 'W':  # Недели начинаются с понедельника. 01.01.1970 - четверг
+        day = msk_ns // day_ns
+        start = (day - (day + 3) % 7) * day_ns
+        return start, start + 7 * day_ns
+    months = calendar_months[unit]  # Календарные бары
+    month = int(np.datetime64(msk_ns, 'ns').astype('datetime64[M]').astype(np.int64))  # Месяцев от 01.1970
+    month -= month % months
+    return (int(np.datetime64(month, 'M').astype('datetime64[ns]').astype(np.int64)),
+            int(np.datetime64(month + months, 'M').astype('datetime64[ns]').astype(np.int64)))
+
+
+def bar_starts(unit, count, msk_ns: np.ndarray) -> np.ndarray:
+    """Начала баров для массива времени
+
+    :param str unit: Единица измерения таймфрейма
+    :param int count: Количество единиц
+    :param msk_ns: Московское время, нс Unix (массив int64)
+    :return: Начала баров, нс Unix (массив int64)
+    """
+    if unit in ('M', 'H', 'D'):  # Бары фиксированной длительности
+        size = count * (minute_ns if unit == 'M' else 60 * minute_ns if unit == 'H' else day_ns)
+        return msk_ns - msk_ns % size
+    if unit == 'W':  # Недели начинаются с понедельника
+        days = msk_ns // day_ns
+        return (days - (days + 3) % 7) * day_ns
+    months = msk_ns.view('datetime64[ns]').astype('datetime64[M]').astype(np.int64)  # Календарные бары
+    months -= months % calendar_months[unit]
+    return months.astype('datetime64[M]').astype('datetime64[ns]').astype(np.int64)
+
+
+class BarSeries:
+    """Бары одного инструмента и таймфрейма. Текущий бар - в переменных, закрытые бары - в кольцевом буфере"""
+
+    def __init__(self, timeframe, capacity):
+        """Инициализация
+
+        :param str timeframe: Таймфрейм
+        :param int capacity: Количество хранимых закрытых баров
+        """
+        self.timeframe = timeframe  # Таймфрейм
+        self.unit, self.count = parse_timeframe(timeframe)  # Единица измерения и количество
+        self.buffer = np.zeros(capacity, dtype=bar_dtype)  # Закрытые бары
+        self.closed = 0  # Количество закрытых баров за все время
+        self.start = self.end = None  # Начало и окончание текущего бара, нс. None - текущего бара нет
+        self.open = self.high = self.low = self.close = self.volume = self.value = 0.0  # Текущий бар
+        self.trades = 0
+
+    def update(self, msk_ns, price, quantity) -> Union[Bar, None]:
+        """Обновление текущего бара
+
+        :param int msk_ns: Московское время, нс Unix
+        :param float price: Цена
+        :param float quantity: Количество. 0 - без объема (середина спреда)
+        :return: Закрытый бар, если время перешло в новый бар. Иначе, None
+        """
+        bar = None
+        if self.end is None or msk_ns >= self.end:  # Если текущего бара нет, или время вышло за него
+            if self.end is not None:  # Если текущий бар есть
+                bar = self.close_bar()  # то закрываем его
+            self.start, self.end = bar_bounds(self.unit, self.count, msk_ns)  # Новый бар
+            self.open = self.high = self.low = price
+            self.volume = self.value = 0.0
+            self.trades = 0
+        elif price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.volume += quantity
+        self.value += price * quantity
+        self.trades += 1
+        return bar
+
+    def close_bar(self) -> Bar:
+        """Закрытие текущего бара с записью в буфер"""
+        bar = Bar(np.datetime64(self.start, 'ns'), self.open, self.high, self.low, self.close, self.volume,
+                  self.value / self.volume if self.volume else nan, self.trades)
+        self.buffer[self.closed % len(self.buffer)] = bar
+        self.closed += 1
+        self.start = self.end = None
+        return bar
+
+    def bars(self) -> np.ndarray:
+        """Закрытые бары от старых к новым"""
+        capacity = len(self.buffer)
+        if self.closed <= capacity:  # Если буфер еще не заполнен
+            return self.buffer[:self.closed].copy()
+        index = self.closed % capacity  # Самый старый бар
+        return np.concatenate((self.buffer[index:], self.buffer[:index]))
+
+    def current(self) -> Union[Bar, None]:
+        """Текущий незакрытый бар"""
+        if self.end is None:  # Если текущего бара нет
+            return None
+        return Bar(np.datetime64(self.start, 'ns'), self.open, self.high, self.low, self.close, self.volume,
+                   self.value / self.volume if self.volume else nan, self.trades)
+
+
+class BarBuilder:
+    """Построение баров OHLCV и средневзвешенной цены по нескольким таймфреймам из потока событий
+
+    Источник цены: trade - сделки TradeEvent (цена, количество, время сделки), mid - середина спреда стаканов OrderBookEvent
+    (время получения, без объема). Бары строятся по московскому времени и по тикеру. Бар закрывается первым событием следующего бара
+    или вызовом flush. Закрытые бары передаются в обработчик on_bar(тикер, таймфрейм, Bar)
+
+    Использование: builder = BarBuilder(('M1', 'M5', 'H1')).attach(fp_provider.dispatcher)
+    """
+    msk_time = MskTime()  # Перевод времени UTC в московское
+    sources = ('trade', 'mid')  # Источники цены
+
+    def __init__(self, timeframes=('M1',), source='trade', capacity=10000, on_bar: Callable = None):
+        """Инициализация
+
+        :param timeframes: Таймфреймы: M<минут>, H<часов>, D1, W1, MN1, Q1, Y1 или сообщения TimeFrame
+        :param str source: Источник цены: trade - сделки, mid - середина спреда стаканов
+        :param int capacity: Количество хранимых закрытых баров по каждому тикеру и таймфрейму
+        :param on_bar: Обработчик закрытого бара (тикер, таймфрейм, Bar). None - без обработчика
+        """
+        if source not in self.sources:  # Если источник цены неизвестен
+            raise ValueError(f'Неизвестный источник цены {source}. Допустимые источники: {", ".join(self.sources)}')
+        self.timeframes = tuple(timeframe if isinstance(timeframe, str) else timeframe_units[timeframe.time_unit] for timeframe in timeframes)  # Таймфреймы строками
+        for timeframe in self.timeframes:  # Проверяем таймфреймы
+            parse_timeframe(timeframe)
+        self.source = source  # Источник цены
+        self.capacity = capacity  # Количество хранимых закрытых баров
+        self.on_bar = on_bar  # Обработчик закрытого бара
+        self.series: dict[str, tuple[BarSeries, ...]] = {}  # Бары всех таймфреймов по тикеру
+        self.lock = Lock()  # Блокировка баров
+
+    def attach(self, dispatcher: EventDispatcher):
+        """Подключение к событиям диспетчера
+
+        :param EventDispatcher dispatcher: Диспетчер событий
+        :return: Построитель баров
+        """
+        if self.source == 'trade':  # Бары по сделкам
+            dispatcher.add_listener('trade', self.on_trade)
+        else:  # Бары по середине спреда
+            dispatcher.add_listener('order_book', self.on_order_book)
+        return self
+
+    def detach(self, dispatcher: EventDispatcher):
+        """Отключение от событий диспетчера
+
+        :param EventDispatcher dispatcher: Диспетчер событий
+        """
+        if self.source == 'trade':
+            dispatcher.remove_listener('trade', self.on_trade)
+        else:
+            dispatcher.remove_listener('order_book', self.on_order_book)
+
+    def on_trade(self, event: TradeEvent):
+        """Обработчик события сделки
+
+        :param TradeEvent event: Событие сделки
+        """
+        created_at = event.created_at
+        utc_ns = created_at.seconds * 1_000_000_000 + created_at.nanos or time_ns()  # Время сделки. Если не задано, то время получения
+        self.update(event.security_code, self.msk_time.utc_to_msk_ns_value(utc_ns), event.price, event.quantity)
+
+    def on_order_book(self, event: OrderBookEvent):
+        """Обработчик события стакана
+
+        :param OrderBookEvent event: Событие стакана
+        """
+        if not event.asks or not event.bids:  # Если одной из сторон стакана нет
+            return  # то середины спреда нет
+        mid = (min(row.price for row in event.asks) + max(row.price for row in event.bids)) / 2  # Середина спреда
+        self.update(event.security_code, self.msk_time.utc_to_msk_ns_value(time_ns()), mid, 0.0)
+
+    def update(self, security_code, msk_ns, price, quantity=0.0):
+        """Обновление баров всех таймфреймов
+
+        :param str security_code: Тикер
+        :param int msk_ns: Московское время, нс Unix
+        :param float price: Цена
+        :param float quantity: Количество. 0 - без объема
+        """
+        series = self.series.get(security_code)
+        if series is None:  # Если баров тикера еще нет
+            series = self.series.setdefault(security_code, tuple(BarSeries(timeframe, self.capacity) for timeframe in self.timeframes))
+        closed = []  # Закрытые бары
+        with self.lock:
+            for item in series:  # Пробегаемся по всем таймфреймам
+                bar = item.update(msk_ns, price, quantity)
+                if bar is not None:  # Если бар закрылся
+                    closed.append((item.timeframe, bar))
+        if closed and self.on_bar:  # Если есть закрытые бары и обработчик
+            for timeframe, bar in closed:
+                self.on_bar(security_code, timeframe, bar)
+
+    def flush(self, msk_ns=None):
+        """Закрытие баров, время которых вышло. Для закрытия баров по таймеру, когда событий нет
+
+        :param int msk_ns: Московское время, нс Unix. None - текущее время
+        """
+        msk_ns = self.msk_time.utc_to_msk_ns_value(time_ns()) if msk_ns is None else msk_ns
+        closed = []
+        with self.lock:
+            for security_code, series in list(self.series.items()):
+                for item in series:
+                    if item.end is not None and msk_ns >= item.end:  # Если время бара вышло
+                        closed.append((security_code, item.timeframe, item.close_bar()))
+        if self.on_bar:
+            for security_code, timeframe, bar in closed:
+                self.on_bar(security_code, timeframe, bar)
+
+    def get_series(self, security_code, timeframe) -> Union[BarSeries, None]:
+        """Бары тикера и таймфрейма"""
+        for item in self.series.get(security_code, ()):
+            if item.timeframe == timeframe:
+                return item
+        return None
+
+    def bars(self, security_code, timeframe) -> np.ndarray:
+        """Закрытые бары от старых к новым
+
+        :param str security_code: Тикер
+        :param str timeframe: Таймфрейм
+        :return: Массив bar_dtype
+        """
+        item = self.get_series(security_code, timeframe)
+        if item is None:  # Если баров нет
+            return np.zeros(0, dtype=bar_dtype)
+        with self.lock:
+            return item.bars()
+
+    def current(self, security_code, timeframe) -> Union[Bar, None]:
+        """Текущий незакрытый бар
+
+        :param str security_code: Тикер
+        :param str timeframe: Таймфрейм
+        """
+        item = self.get_series(security_code, timeframe)
+        if item is None:
+            return None
+        with self.lock:
+            return item.current()
+
+    @staticmethod
+    def build(msk_ns, prices, quantities, timeframe) -> np.ndarray:
+        """Построение баров массивами
+
+        :param msk_ns: Московское время, нс Unix
+        :param prices: Цены
+        :param quantities: Количества
+        :param str timeframe: Таймфрейм
+        :return: Массив bar_dtype
+        """
+        msk_ns, prices, quantities = np.asarray(msk_ns, dtype=np.int64), np.asarray(prices, dtype=np.float64), np.asarray(quantities, dtype=np.float64)
+        if len(msk_ns) and np.any(msk_ns[1:] < msk_ns[:-1]):  # Если время не по возрастанию
+            order = np.argsort(msk_ns, kind='stable')  # то сортируем, сохраняя порядок событий с одинаковым временем
+            msk_ns, prices, quantities = msk_ns[order], prices[order], quantities[order]
+        starts = bar_starts(*parse_timeframe(timeframe), msk_ns)  # Начала баров
+        firsts = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]]) if len(starts) else np.zeros(0, dtype=np.int64)  # Первые события баров
+        lasts = np.r_[firsts[1:], len(starts)] - 1  # Последние события баров
+        bars = np.zeros(len(firsts), dtype=bar_dtype)
+        if not len(firsts):
+            return bars
+        bars['time'] = starts[firsts].view('datetime64[ns]')
+        bars['open'] = prices[firsts]
+        bars['high'] = np.maximum.reduceat(prices, firsts)
+        bars['low'] = np.minimum.reduceat(prices, firsts)
+        bars['close'] = prices[lasts]
+        bars['volume'] = np.add.reduceat(quantities, firsts)
+        value = np.add.reduceat(prices * quantities, firsts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            bars['vwap'] = np.where(bars['volume'] > 0, value / bars['volume'], nan)
+        bars['trades'] = lasts - firsts + 1
+        return bars
+
+    @classmethod
+    def from_replay(cls, replay, timeframes=('M1',), source='trade') -> dict[str, dict[str, np.ndarray]]:
+        """Построение баров из журнала событий
+
+        :param EventReplay replay: Журнал событий
+        :param timeframes: Таймфреймы
+        :param str source: Источник цены: trade - сделки, mid - середина спреда стаканов
+        :return: Бары по тикеру и таймфрейму
+        """
+        codes, times, prices, quantities = [], [], [], []  # События подряд
+        if source == 'trade':  # Бары по сделкам
+            for received_ns, event_type, event in replay.events(['trade']):
+                created_at = event.created_at
+                codes.append(event.security_code)
+                times.append(created_at.seconds * 1_000_000_000 + created_at.nanos or received_ns)
+                prices.append(event.price)
+                quantities.append(event.quantity)
+        else:  # Бары по середине спреда
+            for received_ns, event_type, event in replay.events(['order_book']):
+                if event.asks and event.bids:
+                    codes.append(event.security_code)
+                    times.append(received_ns)
+                    prices.append((min(row.price for row in event.asks) + max(row.price for row in event.bids)) / 2)
+                    quantities.append(0.0)
+        codes = np.array(codes, dtype=object)
+        msk_ns = cls.msk_time.utc_to_msk_ns(np.array(times, dtype=np.int64))  # Переводим время в московское целиком
+        prices, quantities = np.array(prices, dtype=np.float64), np.array(quantities, dtype=np.float64)
+        result = {}
+        for security_code in dict.fromkeys(codes):  # Пробегаемся по тикерам в порядке появления
+            mask = codes == security_code
+            result[security_code] = {timeframe if isinstance(timeframe, str) else timeframe_units[timeframe.time_unit]:
+                                     cls.build(msk_ns[mask], prices[mask], quantities[mask], timeframe) for timeframe in timeframes}
+        return result
@@ -0,0 +1,234 @@
+from operator import attrgetter  # Чтение вложенных полей
+from typing import Iterable  # Последовательность сообщений
+
+import numpy as np  # Столбцы
+from google.protobuf.descriptor import FieldDescriptor  # Типы полей сообщений
+from google.protobuf.message import Message  # Сообщение protobuf
+
+from .MskTime import MskTime  # Перевод времени UTC в московское
+from .proto.tradeapi.v1.events_pb2 import TradeEvent, OrderEvent  # События сделок и заявок
+from .proto.tradeapi.v1.orders_pb2 import GetOrdersResult  # Заявки
+from .proto.tradeapi.v1.portfolios_pb2 import GetPortfolioResult  # Портфель
+from .proto.tradeapi.v1.stops_pb2 import GetStopsResult  # Стоп заявки
+
+
+class ColumnarExport:
+    """Выгрузка сообщений protobuf (заявок, стоп заявок, позиций портфеля, событий) в столбцы
+
+    Схема столбцов строится по описанию сообщения и не зависит от данных: вложенные сообщения разворачиваются в столбцы
+    с именами через _ (condition_type, stop_loss_price), повторяющиеся поля пропускаются. Перечисления в numpy - значения int32,
+    в pandas - Categorical, в Arrow - dictionary. Время Timestamp переводится в московское целиком, незаданное время - NaT.
+    pandas и pyarrow нужны только для соответствующих форматов
+    """
+    dtypes = {FieldDescriptor.TYPE_DOUBLE: np.float64, FieldDescriptor.TYPE_FLOAT: np.float32,
+              FieldDescriptor.TYPE_INT64: np.int64, FieldDescriptor.TYPE_SINT64: np.int64, FieldDescriptor.TYPE_SFIXED64: np.int64,
+              FieldDescriptor.TYPE_UINT64: np.uint64, FieldDescriptor.TYPE_FIXED64: np.uint64,
+              FieldDescriptor.TYPE_INT32: np.int32, FieldDescriptor.TYPE_SINT32: np.int32, FieldDescriptor.TYPE_SFIXED32: np.int32,
+              FieldDescriptor.TYPE_UINT32: np.uint32, FieldDescriptor.TYPE_FIXED32: np.uint32,
+              FieldDescriptor.TYPE_BOOL: np.bool_, FieldDescriptor.TYPE_ENUM: np.int32,
+              FieldDescriptor.TYPE_STRING: object, FieldDescriptor.TYPE_BYTES: object}  # Тип столбца по типу поля
+    formats = ('numpy', 'pandas', 'arrow')  # Форматы выгрузки
+    msk_time = MskTime()  # Перевод времени UTC в московское
+    schemas = {}  # Схемы столбцов по полному имени сообщения
+
+    @classmethod
+    def schema(cls, descriptor) -> list[tuple]:
+        """Схема столбцов сообщения
+
+        :param descriptor: Описание сообщения, например, Order.DESCRIPTOR
+        :return: Список (имя столбца, путь к полю через точку, тип столбца, описание перечисления или None)
+        """
+        schema = cls.schemas.get(descriptor.full_name)
+        if schema is None:  # Если схема еще не строилась
+            schema = cls.schemas[descriptor.full_name] = cls.build_schema(descriptor)
+        return schema
+
+    @classmethod
+    def build_schema(cls, descriptor, prefix='') -> list[tuple]:
+        """Построение схемы столбцов по описанию сообщения
+
+        :param descriptor: Описание сообщения
+        :param str prefix: Путь к вложенному сообщению
+        """
+        schema = []
+        for field in descriptor.fields:  # Пробегаемся по всем полям сообщения
+            if field.is_repeated:  # Повторяющиеся поля в строку не укладываются
+                continue
+            path = prefix + field.name  # Путь к полю
+            if field.type == FieldDescriptor.TYPE_MESSAGE:  # Если поле - сообщение
+                if field.message_type.full_name == 'google.protobuf.Timestamp':  # Время
+                    schema.append((path.replace('.', '_'), path, 'datetime64[ns]', None))
+                else:  # Вложенное сообщение
+                    schema += cls.build_schema(field.message_type, f'{path}.')  # разворачиваем в столбцы
+            else:  # Если поле простого типа или перечисление
+                schema.append((path.replace('.', '_'), path, cls.dtypes[field.type], field.enum_type))
+        return schema
+
+    @staticmethod
+    def rows_descriptor(rows: Iterable[Message], descriptor=None) -> tuple:
+        """Последовательность сообщений и их описание
+
+        :param rows: Сообщения одного типа
+        :param descriptor: Описание сообщения. Нужно, если сообщений может не быть
+        :return: Последовательность с длиной, описание сообщения
+        """
+        rows = rows if hasattr(rows, '__len__') else list(rows)
+        if descriptor is None:  # Если описание сообщения не задано
+            if not len(rows):  # Без сообщений схему не построить
+                raise ValueError('Для пустой последовательности сообщений нужно задать descriptor')
+            descriptor = rows[0].DESCRIPTOR  # то берем его из первого сообщения
+        return rows, descriptor
+
+    @classmethod
+    def columns(cls, rows: Iterable[Message], descriptor=None) -> dict[str, np.ndarray]:
+        """Столбцы numpy из последовательности сообщений
+
+        :param rows: Сообщения одного типа
+        :param descriptor: Описание сообщения. Нужно, если сообщений может не быть
+        :return: Справочник имя столбца - массив
+        """
+        rows, descriptor = cls.rows_descriptor(rows, descriptor)
+        schema = cls.schema(descriptor)
+        paths = []  # Пути ко всем читаемым полям. У времени читаются секунды и наносекунды
+        for name, path, dtype, enum_type in schema:
+            paths += [f'{path}.seconds', f'{path}.nanos'] if dtype == 'datetime64[ns]' else [path]
+        records = list(map(attrgetter(*paths, '__class__'), rows))  # Один проход по сообщениям. __class__ - чтобы всегда получать кортеж
+        fields = iter(zip(*records) if records else [()] * len(paths))  # Значения по полям
+        columns = {}
+        for name, path, dtype, enum_type in schema:  # Пробегаемся по всем столбцам
+            if dtype == 'datetime64[ns]':  # Время
+                seconds = np.array(next(fields), dtype=np.int64)
+                nanos = np.array(next(fields), dtype=np.int64)
+                values = cls.msk_time.utc_to_msk_ns(seconds * 1_000_000_000 + nanos).view('datetime64[ns]')  # Переводим в московское время целиком
+                values[(seconds == 0) & (nanos == 0)] = np.datetime64('NaT')  # Незаданное время
+            elif dtype is object:  # Строки
+                values = np.empty(len(records), dtype=object)
+                values[:] = next(fields)
+            else:  # Числа, логические значения, перечисления
+                values = np.array(next(fields), dtype=dtype)
+            columns[name] = values
+        return columns
+
+    @staticmethod
+    def enum_codes(values: np.ndarray, enum_type) -> tuple[np.ndarray, list[str]]:
+        """Коды категорий перечисления
+
+        :param values: Значения перечисления
+        :param enum_type: Описание перечисления
+        :return: Коды категорий (-1 - неизвестное значение), имена категорий
+        """
+        enum_values = sorted(enum_type.values, key=lambda value: value.number)  # Значения перечисления по возрастанию
+        numbers = np.array([value.number for value in enum_values], dtype=np.int32)
+        codes = np.searchsorted(numbers, values).astype(np.int32)
+        codes[codes >= len(numbers)] = -1
+        codes[(codes >= 0) & (numbers[np.maximum(codes, 0)] != values)] = -1  # Значения, которых нет в перечислении
+        return codes, [value.name for value in enum_values]
+
+    @classmethod
+    def to_numpy(cls, rows: Iterable[Message], descriptor=None) -> np.ndarray:
+        """Структурированный массив numpy
+
+        :param rows: Сообщения одного типа
+        :param descriptor: Описание сообщения
+        """
+        rows, descriptor = cls.rows_descriptor(rows, descriptor)
+        columns = cls.columns(rows, descriptor)
+        array = np.empty(len(rows), dtype=[(name, values.dtype) for name, values in columns.items()])
+        for name, values in columns.items():
+            array[name] = values
+        return array
+
+    @classmethod
+    def to_pandas(cls, rows: Iterable[Message], descriptor=None):
+        """Таблица pandas. Перечисления - Categorical
+
+        :param rows: Сообщения одного типа
+        :param descriptor: Описание сообщения
+        :return: pandas.DataFrame
+        """
+        try:
+            import pandas as pd
+        except ImportError:  # Если pandas не установлен
+            raise ImportError('Для выгрузки в pandas установите пакет pandas') from None
+        rows, descriptor = cls.rows_descriptor(rows, descriptor)
+        enums = {name: enum_type for name, path, dtype, enum_type in cls.schema(descriptor)}  # Перечисления по столбцам
+        data = {}
+        for name, values in cls.columns(rows, descriptor).items():
+            if enums.get(name):  # Если столбец - перечисление
+                codes, categories = cls.enum_codes(values, enums[name])
+                data[name] = pd.Categorical.from_codes(codes, categories=categories)
+            else:
+                data[name] = values
+        return pd.DataFrame(data)
+
+    @classmethod
+    def to_arrow(cls, rows: Iterable[Message], descriptor=None):
+        """Таблица Arrow. Перечисления - dictionary
+
+        :param rows: Сообщения одного типа
+        :param descriptor: Описание сообщения
+        :return: pyarrow.Table
+        """
+        try:
+            import pyarrow as pa
+        except ImportError:  # Если pyarrow не установлен
+            raise ImportError('Для выгрузки в Arrow установите пакет pyarrow') from None
+        rows, descriptor = cls.rows_descriptor(rows, descriptor)
+        enums = {name: enum_type for name, path, dtype, enum_type in cls.schema(descriptor)}  # Перечисления по столбцам
+        data = {}
+        for name, values in cls.columns(rows, descriptor).items():
+            if enums.get(name):  # Если столбец - перечисление
+                codes, categories = cls.enum_codes(values, enums[name])
+                data[name] = pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0), pa.array(categories))
+            elif values.dtype == object:  # Строки
+                data[name] = pa.array(values.tolist(), type=pa.string())
+            else:  # Числа и время. NaT становится null
+                data[name] = pa.array(values)
+        return pa.table(data)
+
+    @classmethod
+    def export(cls, rows: Iterable[Message], descriptor=None, output='numpy'):
+        """Выгрузка сообщений в выбранном формате
+
+        :param rows: Сообщения одного типа
+        :param descriptor: Описание сообщения
+        :param str output: Формат: numpy - структурированный массив, pandas - DataFrame, arrow - pyarrow.Table
+        """
+        if output not in cls.formats:  # Если формат неизвестен
+            raise ValueError(f'Неизвестный формат {output}. Допустимые форматы: {", ".join(cls.formats)}')
+        return getattr(cls, f'to_{output}')(rows, descriptor)
+
+    @classmethod
+    def orders(cls, result: GetOrdersResult, output='numpy'):
+        """Заявки из ответа get_orders"""
+        return cls.export(result.orders, GetOrdersResult.DESCRIPTOR.fields_by_name['orders'].message_type, output)
+
+    @classmethod
+    def stops(cls, result: GetStopsResult, output='numpy'):
+        """Стоп заявки из ответа get_stops"""
+        return cls.export(result.stops, GetStopsResult.DESCRIPTOR.fields_by_name['stops'].message_type, output)
+
+    @classmethod
+    def positions(cls, result: GetPortfolioResult, output='numpy'):
+        """Позиции из ответа get_portfolio или события портфеля"""
+        return cls.export(result.positions, GetPortfolioResult.DESCRIPTOR.fields_by_name['positions'].message_type, output)
+
+    @classmethod
+    def money(cls, result: GetPortfolioResult, output='numpy'):
+        """Денежные позиции из ответа get_portfolio или события портфеля"""
+        return cls.export(result.money, GetPortfolioResult.DESCRIPTOR.fields_by_name['money'].message_type, output)
+
+    @classmethod
+    def currencies(cls, result: GetPortfolioResult, output='numpy'):
+        """Валюты из ответа get_portfolio или события портфеля"""
+        return cls.export(result.currencies, GetPortfolioResult.DESCRIPTOR.fields_by_name['currencies'].message_type, output)
+
+    @classmethod
+    def trades(cls, events: Iterable[TradeEvent], output='numpy'):
+        """Сделки из накопленных событий TradeEvent"""
+        return cls.export(events, TradeEvent.DESCRIPTOR, output)
+
+    @classmethod
+    def order_events(cls, events: Iterable[OrderEvent], output='numpy'):
+        """Заявки из накопленных событий OrderEvent"""
+        return cls.export(events, OrderEvent.DESCRIPTOR, output)
@@ -0,0 +1,222 @@
+from collections import deque  # Очередь событий с быстрым удалением с обоих концов
+from time import monotonic  # Время для ограничения частоты доставки
+from threading import Thread, Lock, Condition  # Поток обработчиков, блокировка и условия буфера
+from typing import Union  # Объединение типов
+
+from .EventDispatcher import EventDispatcher  # Диспетчер событий подписок
+
+
+class EventBuffer:
+    """Ограниченный буфер событий между потоком чтения подписок (GetEvents) и потоком обработчиков
+
+    Поток чтения только кладет события в буфер, поэтому медленный обработчик не задерживает чтение потока gRPC.
+    Заявки, сделки, портфели и результаты запросов хранятся в одной очереди и доставляются в порядке прихода.
+    Стаканы хранятся в своей очереди и доставляются, только когда первая очередь пуста.
+    Для каждого типа события задается политика переполнения:
+        block - поток чтения ждет освобождения места (обратное давление через управление потоком gRPC)
+        drop_oldest - удаляется самое старое событие
+        keep_latest - хранится только последнее событие по ключу (для стакана - режим торгов и тикер)
+    Для политики keep_latest (склейка стаканов) можно ограничить частоту доставки событий по каждому ключу.
+    Заявки, сделки, портфели и результаты запросов никогда не склеиваются
+    """
+    event_types = ('order', 'trade', 'portfolio', 'response', 'order_book')  # Типы событий
+    ordered_types = ('order', 'trade', 'portfolio', 'response')  # Типы событий с общей очередью в порядке прихода. Доставляются раньше стаканов
+    overflow_policies = ('block', 'drop_oldest', 'keep_latest')  # Политики переполнения
+    default_policies = {'order': 'block', 'trade': 'block', 'portfolio': 'block', 'response': 'block', 'order_book': 'drop_oldest'}  # Политики по умолчанию
+    keys = {'order_book': lambda event: (event.security_board, event.security_code)}  # Ключи событий для политики keep_latest
+
+    def __init__(self, max_size=10000, policies=None, max_rates=None):
+        """Инициализация
+
+        :param int max_size: Максимальное количество событий каждого типа в буфере
+        :param dict policies: Политики переполнения по типу события. Не заданные типы берутся из default_policies
+        :param dict max_rates: Максимальное количество доставок в секунду по ключу для типов событий с политикой keep_latest
+        """
+        self.max_size = max_size  # Максимальное количество событий каждого типа
+        self.policies = {**self.default_policies, **(policies or {})}  # Политики переполнения
+        for event_type, policy in self.policies.items():  # Пробегаемся по всем политикам
+            if event_type not in self.event_types:  # Если такого типа события нет
+                raise ValueError(f'Неизвестный тип события {event_type}. Допустимые типы: {", ".join(self.event_types)}')
+            if policy not in self.overflow_policies:  # Если такой политики нет
+                raise ValueError(f'Неизвестная политика переполнения {policy}. Допустимые политики: {", ".join(self.overflow_policies)}')
+            if policy == 'keep_latest' and event_type not in self.keys:  # Если у события нет ключа
+                raise ValueError(f'Для событий типа {event_type} политика keep_latest недоступна')
+        self.intervals = {}  # Минимальный интервал между доставками по ключу, с
+        for event_type, max_rate in (max_rates or {}).items():  # Пробегаемся по всем ограничениям частоты
+            if self.policies.get(event_type) != 'keep_latest':  # Если события этого типа не склеиваются
+                raise ValueError(f'Частоту доставки можно ограничить только для событий с политикой keep_latest, а не {event_type}')
+            if max_rate:  # Если частота ограничена
+                self.intervals[event_type] = 1 / max_rate
+        self.next_times = {event_type: {} for event_type in self.intervals}  # Время, раньше которого нельзя доставлять событие по ключу
+        self.ordered = deque()  # Общая очередь (тип события, содержимое) для ordered_types
+        self.counts = dict.fromkeys(self.ordered_types, 0)  # Количество событий каждого типа в общей очереди
+        self.queues = {event_type: {} if self.policies[event_type] == 'keep_latest' else deque()
+                       for event_type in self.event_types if event_type not in self.ordered_types}  # Очереди стаканов. Доставляются после общей очереди
+        self.depth = 0  # Общее количество событий в буфере
+        self.received = dict.fromkeys(self.event_types, 0)  # Количество принятых событий
+        self.dropped = dict.fromkeys(self.event_types, 0)  # Количество удаленных при переполнении событий
+        self.coalesced = dict.fromkeys(self.event_types, 0)  # Количество склеенных событий (замененных более новыми по ключу)
+        self.dispatched = dict.fromkeys(self.event_types, 0)  # Количество переданных обработчикам событий
+        self.max_depth = dict.fromkeys(self.event_types, 0)  # Максимальная глубина очереди
+        self.errors = 0  # Количество исключений в обработчиках
+        self.last_error: Union[Exception, None] = None  # Последнее исключение в обработчике
+        self.lock = Lock()  # Блокировка буфера
+        self.not_empty = Condition(self.lock)  # В буфере появилось событие
+        self.not_full = Condition(self.lock)  # В буфере освободилось место
+        self.closed = False  # Буфер закрыт
+        self.dispatcher: Union[EventDispatcher, None] = None  # Диспетчер событий. Передает события обработчикам
+        self.dispatch_thread: Union[Thread, None] = None  # Поток обработчиков
+
+    def start(self, dispatcher: EventDispatcher):
+        """Запуск потока обработчиков
+
+        :param EventDispatcher dispatcher: Диспетчер событий. Метод передачи событий берется при каждом событии, поэтому set_metrics() действует сразу
+        """
+        self.dispatcher = dispatcher
+        self.dispatch_thread = Thread(target=self.dispatch_handler, name='EventsDispatchThread', daemon=True)  # Создаем поток обработчиков
+        self.dispatch_thread.start()  # Запускаем поток
+
+    def put(self, event_type, payload):
+        """Постановка события в буфер. Вызывается из потока чтения подписок
+
+        :param str event_type: Тип события
+        :param payload: Содержимое события
+        """
+        with self.lock:
+            if self.closed:  # Если буфер закрыт
+                return  # то событие не принимаем
+            self.received[event_type] += 1
+            policy = self.policies[event_type]  # Политика переполнения
+            if event_type in self.counts:  # Если событие в общей очереди
+                if self.counts[event_type] >= self.max_size:  # Если событий этого типа слишком много
+                    if policy == 'block':  # Если ждем освобождения места
+                        while self.counts[event_type] >= self.max_size and not self.closed:
+                            self.not_full.wait()
+                        if self.closed:  # Если буфер закрыли во время ожидания
+                            return
+                    else:  # Удаляем самое старое событие этого типа. Только при переполнении
+                        for index, (queued_type, _) in enumerate(self.ordered):
+                            if queued_type == event_type:
+                                del self.ordered[index]
+                                break
+                        self.counts[event_type] -= 1
+                        self.dropped[event_type] += 1
+                        self.depth -= 1
+                self.ordered.append((event_type, payload))
+                self.counts[event_type] += 1
+                length = self.counts[event_type]  # Количество событий типа в буфере
+            else:
+                queue = self.queues[event_type]  # Очередь типа события
+                if policy == 'keep_latest':  # Последнее событие по ключу
+                    key = self.keys[event_type](payload)  # Ключ события
+                    if key in queue:  # Если событие по ключу еще не обработано
+                        queue[key] = payload  # то заменяем его, сохраняя место в очереди
+                        self.coalesced[event_type] += 1
+                        return
+                    if len(queue) >= self.max_size:  # Если очередь заполнена
+                        del queue[next(iter(queue))]  # то удаляем самый старый ключ
+                        self.dropped[event_type] += 1
+                        self.depth -= 1
+                    queue[key] = payload
+                else:
+                    if len(queue) >= self.max_size:  # Если очередь заполнена
+                        if policy == 'block':  # Если ждем освобождения места
+                            while len(queue) >= self.max_size and not self.closed:
+                                self.not_full.wait()
+                            if self.closed:  # Если буфер закрыли во время ожидания
+                                return
+                        else:  # Удаляем самое старое событие
+                            queue.popleft()
+                            self.dropped[event_type] += 1
+                            self.depth -= 1
+                    queue.append(payload)
+                length = len(queue)  # Количество событий типа в буфере
+            self.depth += 1
+            if length > self.max_depth[event_type]:  # Если глубина очереди максимальная
+                self.max_depth[event_type] = length
+            self.not_empty.notify()  # Будим поток обработчиков
+
+    def get(self):
+        """Получение следующего события, которое можно доставить сейчас. Вызывается под блокировкой
+
+        :return: Тип события и его содержимое или None, время ожидания следующего события или None, если ждем без ограничения
+        """
+        if self.ordered:  # Если есть заявки, сделки, портфели или результаты запросов
+            event_type, payload = self.ordered.popleft()  # то доставляем их в порядке прихода
+            self.counts[event_type] -= 1
+            self.depth -= 1
+            return (event_type, payload), None
+        wait = None  # Время ожидания события, частота доставки которого ограничена
+        for event_type in self.queues:  # Пробегаемся по очередям стаканов
+            queue = self.queues[event_type]
+            if not queue:  # Если в очереди нет событий
+                continue  # то переходим к следующему типу
+            if not isinstance(queue, dict):  # Если очередь событий
+                self.depth -= 1
+                return (event_type, queue.popleft()), None
+            interval = self.intervals.get(event_type)  # Минимальный интервал между доставками по ключу
+            if not interval or self.closed:  # Если частота доставки не ограничена или буфер закрывается
+                self.depth -= 1
+                return (event_type, queue.pop(next(iter(queue)))), None  # Забираем самый старый ключ
+            now = monotonic()
+            next_times = self.next_times[event_type]
+            for key in queue:  # Пробегаемся по ключам от самого старого
+                next_time = next_times.get(key, 0)  # Время, раньше которого нельзя доставлять событие по ключу
+                if next_time <= now:  # Если событие можно доставить
+                    next_times[key] = now + interval
+                    self.depth -= 1
+                    return (event_type, queue.pop(key)), None
+                wait = next_time - now if wait is None else min(wait, next_time - now)
+        return None, wait
+
+    def dispatch_handler(self):
+        """Поток обработчиков"""
+        while True:
+            with self.lock:
+                while True:
+                    if self.closed and not self.depth:  # Если буфер закрыт и пуст
+                        return  # то выходим
+                    item, wait = self.get()  # Событие с наибольшим приоритетом
+                    if item:  # Если есть событие, которое можно доставить сейчас
+                        break
+                    self.not_empty.wait(wait)  # Ждем новое событие или время доставки склеенного события
+                event_type, payload = item
+                self.dispatched[event_type] += 1
+                self.not_full.notify()  # Будим поток чтения, если он ждет места
+            try:
+                self.dispatcher.dispatch_payload(event_type, payload)  # Обработчики вызываются без блокировки буфера
+            except Exception as e:  # Исключение в обработчике не должно останавливать поток обработчиков
+                self.errors += 1
+                self.last_error = e
+
+    def stats(self) -> dict:
+        """Статистика буфера
+
+        :return: Глубина буфера, количество исключений в обработчиках и счетчики по типам событий
+        """
+        with self.lock:
+            return {'depth': self.depth, 'errors': self.errors,
+                    'events': {event_type: {'depth': self.counts[event_type] if event_type in self.counts else len(self.queues[event_type]),
+                                            'max_depth': self.max_depth[event_type],
+                                            'received': self.received[event_type],
+                                            'dropped': self.dropped[event_type],
+                                            'coalesced': self.coalesced[event_type],
+                                            'dispatched': self.dispatched[event_type]} for event_type in self.event_types}}
+
+    @classmethod
+    def conflation(cls, max_rate=None, max_size=10000):
+        """Буфер в режиме склейки стаканов. Заявки, сделки и портфели доставляются без потерь
+
+        :param float max_rate: Максимальное количество доставок стакана в секунду по каждому инструменту.
+            None - доставлять последний стакан, как только освободится обработчик
+        :param int max_size: Максимальное количество событий каждого типа в буфере
+        :return: Буфер событий
+        """
+        return cls(max_size, {'order_book': 'keep_latest'}, {'order_book': max_rate})
+
+    def close(self):
+        """Закрытие буфера. Поток обработчиков завершится после обработки оставшихся событий"""
+        with self.lock:
+            self.closed = True
+            self.not_empty.notify_all()
+            self.not_full.notify_all()
@@ -0,0 +1,167 @@
+from time import perf_counter  # Замер времени обработки
+from typing import Callable, Union  # Обработчики событий, объединение типов
+
+from .proto.tradeapi.v1.common_pb2 import ResponseEvent  # Событие результата выполнения запроса
+from .proto.tradeapi.v1.events_pb2 import Event, OrderEvent, TradeEvent, OrderBookEvent, PortfolioEvent  # События подписок
+
+
+class EventDispatcher:
+    """Табличный диспетчер событий подписок
+
+    Тип события определяется один раз по полю oneof payload (WhichOneof), после чего событие передается
+    основному обработчику, всем слушателям этого типа и слушателям инструмента (режим торгов, тикер)
+    """
+    event_types = ('order', 'trade', 'order_book', 'portfolio', 'response')  # Типы событий = имена полей oneof payload в Event
+    instrument_event_types = ('order', 'trade', 'order_book')  # Типы событий, которые можно маршрутизировать по инструменту
+    board_event_types = ('order_book',)  # Типы событий с режимом торгов. В заявках и сделках его нет
+
+    def __init__(self):
+        """Инициализация"""
+        self.handlers = dict.fromkeys(self.event_types)  # Основной обработчик по типу события (on_order, on_trade, ...)
+        self.listeners = {event_type: [] for event_type in self.event_types}  # Дополнительные слушатели по типу события
+        self.instrument_listeners = {event_type: {} for event_type in self.event_types}  # Слушатели по типу события и инструменту
+        self.targets = {event_type: () for event_type in self.event_types}  # Собранные кортежи обработчиков. Пересобираются при каждом изменении
+        self.metrics = None  # Замеры времени обработки. None - без замеров
+
+    def check_event_type(self, event_type):
+        """Проверка типа события
+
+        :param str event_type: Тип события
+        """
+        if event_type not in self.targets:  # Если такого типа события нет
+            raise ValueError(f'Неизвестный тип события {event_type}. Допустимые типы: {", ".join(self.event_types)}')
+
+    def check_route(self, event_type, security_board):
+        """Проверка маршрута по инструменту
+
+        :param str event_type: Тип события
+        :param str security_board: Режим торгов
+        """
+        if event_type not in self.instrument_event_types:  # Если у события нет инструмента
+            raise ValueError(f'События типа {event_type} нельзя маршрутизировать по инструменту')
+        if security_board is not None and event_type not in self.board_event_types:  # Если у события нет режима торгов, то слушатель никогда не сработает
+            raise ValueError(f'В событиях типа {event_type} нет режима торгов. Маршрутизация только по тикеру: security_board=None')
+
+    def rebuild(self, event_type):
+        """Пересборка кортежа обработчиков для типа события. Чтение кортежа из потока подписок не требует блокировок
+
+        :param str event_type: Тип события
+        """
+        handler = self.handlers[event_type]  # Основной обработчик
+        self.targets[event_type] = ((handler,) if handler else ()) + tuple(self.listeners[event_type])
+
+    def set_handler(self, event_type, handler: Union[Callable, None]):
+        """Установка основного обработчика события
+
+        :param str event_type: Тип события
+        :param handler: Обработчик события. None - без основного обработчика
+        """
+        self.check_event_type(event_type)
+        self.handlers[event_type] = handler
+        self.rebuild(event_type)
+
+    def add_listener(self, event_type, listener: Callable, security_board=None, security_code=None):
+        """Добавление слушателя события
+
+        :param str event_type: Тип события: order, trade, order_book, portfolio, response
+        :param listener: Слушатель события
+        :param str security_board: Режим торгов. None - любой режим торгов. Только для стаканов: в событиях заявок и сделок режима торгов нет
+        :param str security_code: Тикер инструмента. None - события всех инструментов
+        """
+        self.check_event_type(event_type)
+        if security_code is None:  # Если слушаем все события типа
+            self.listeners[event_type].append(listener)
+            self.rebuild(event_type)
+            return
+        self.check_route(event_type, security_board)
+        routes = dict(self.instrument_listeners[event_type])  # Копия при записи. Поток подписок всегда видит целый справочник
+        key = (security_board, security_code)  # Ключ маршрута
+        routes[key] = routes.get(key, ()) + (listener,)
+        self.instrument_listeners[event_type] = routes
+
+    def remove_listener(self, event_type, listener: Callable, security_board=None, security_code=None):
+        """Удаление слушателя события
+
+        :param str event_type: Тип события
+        :param listener: Слушатель события
+        :param str security_board: Режим торгов
+        :param str security_code: Тикер инструмента
+        """
+        self.check_event_type(event_type)
+        if security_code is None:  # Если слушатель всех событий типа
+            self.listeners[event_type].remove(listener)
+            self.rebuild(event_type)
+            return
+        self.check_route(event_type, security_board)
+        routes = dict(self.instrument_listeners[event_type])
+        key = (security_board, security_code)
+        listeners = tuple(item for item in routes.get(key, ()) if item != listener)  # Оставшиеся слушатели инструмента
+        if listeners:  # Если слушатели инструмента остались
+            routes[key] = listeners
+        else:  # Если слушателей инструмента не осталось
+            routes.pop(key, None)  # то удаляем маршрут
+        self.instrument_listeners[event_type] = routes
+
+    def set_metrics(self, metrics):
+        """Включение/выключение замеров времени обработки событий
+
+        :param Metrics metrics: Замеры. None - выключить замеры. Без замеров события передаются обработчикам без накладных расходов
+        """
+        self.metrics = metrics
+        if metrics:  # Если замеры включены
+            self.dispatch_payload = self.measured_dispatch_payload  # то передаем события через обработку с замерами
+        else:  # Если замеры выключены
+            self.__dict__.pop('dispatch_payload', None)  # то возвращаемся к обработке без замеров
+
+    def dispatch(self, event: Event) -> Union[str, None]:
+        """Передача события подписки обработчикам
+
+        :param Event event: Событие подписки
+        :return: Тип события или None, если событие пустое
+        """
+        event_type = event.WhichOneof('payload')  # Тип события определяем один раз без создания пустых сообщений для сравнения
+        if event_type is None:  # Если событие пустое
+            return None  # то обрабатывать нечего
+        self.dispatch_payload(event_type, getattr(event, event_type))
+        return event_type
+
+    def dispatch_payload(self, event_type, payload: Union[OrderEvent, TradeEvent, OrderBookEvent, PortfolioEvent, ResponseEvent]):
+        """Передача содержимого события обработчикам
+
+        :param str event_type: Тип события
+        :param payload: Содержимое события
+        """
+        for target in self.targets[event_type]:  # Пробегаемся по всем обработчикам типа события
+            target(payload)
+        routes = self.instrument_listeners[event_type]  # Слушатели инструментов
+        if routes:  # Если есть слушатели инструментов
+            if event_type == 'order_book':  # У стакана есть режим торгов
+                for listener in routes.get((payload.security_board, payload.security_code), ()):
+                    listener(payload)
+            for listener in routes.get((None, payload.security_code), ()):  # Слушатели тикера на любом режиме торгов
+                listener(payload)
+
+    def measured_dispatch_payload(self, event_type, payload: Union[OrderEvent, TradeEvent, OrderBookEvent, PortfolioEvent, ResponseEvent]):
+        """Передача содержимого события обработчикам с замером времени по типу события и по каждому обработчику
+
+        :param str event_type: Тип события
+        :param payload: Содержимое события
+        """
+        metrics = self.metrics
+        start = last = perf_counter()  # Начало обработки события
+        for target in self.targets[event_type]:  # Пробегаемся по всем обработчикам типа события
+            target(payload)
+            now = perf_counter()
+            metrics.observe_handler(target, now - last)
+            last = now
+        routes = self.instrument_listeners[event_type]  # Слушатели инструментов
+        if routes:  # Если есть слушатели инструментов
+            listeners = routes.get((None, payload.security_code), ())  # Слушатели тикера на любом режиме торгов
+            if event_type == 'order_book':  # У стакана есть режим торгов
+                listeners = routes.get((payload.security_board, payload.security_code), ()) + listeners
+            for listener in listeners:
+                listener(payload)
+                now = perf_counter()
+                metrics.observe_handler(listener, now - last)
+                last = now
+        metrics.observe_event(event_type, payload, last - start)
@@ -0,0 +1,133 @@
+import os  # Папка и файлы журнала
+from collections import deque  # Очередь записей между потоком подписок и потоком записи
+from datetime import datetime, timezone  # Имена файлов в UTC
+from struct import Struct  # Заголовки файла и записей
+from threading import Thread, Event  # Поток записи и сигнал завершения
+from time import time_ns  # Время получения события
+from typing import Union  # Объединение типов
+
+
+class EventRecorder:
+    """Запись событий подписок (GetEvents) в двоичный журнал только на добавление
+
+    Формат файла: сигнатура magic, затем записи подряд. Запись: заголовок record_header
+    (время получения события в нс UTC, длина сообщения) и сериализованное сообщение Event в том виде, как оно пришло из gRPC.
+    В потоке подписок событие только кладется в очередь, запись на диск идет пачками в отдельном потоке.
+    Файлы ротируются по размеру и/или смене даты UTC
+    """
+    magic = b'FPEVLOG1'  # Сигнатура файла журнала
+    record_header = Struct('<qI')  # Время получения в нс, длина сообщения
+    extension = '.fplog'  # Расширение файлов журнала
+
+    def __init__(self, directory, prefix='events', max_bytes=None, daily=True, flush_interval=0.1):
+        """Инициализация и запуск потока записи
+
+        :param str directory: Папка журнала
+        :param str prefix: Начало имен файлов журнала
+        :param int max_bytes: Максимальный размер файла, байт. None - без ограничения
+        :param bool daily: Новый файл при смене даты UTC
+        :param float flush_interval: Период записи накопленных событий на диск, с
+        """
+        self.directory = directory  # Папка журнала
+        self.prefix = prefix  # Начало имен файлов
+        self.max_bytes = max_bytes  # Максимальный размер файла
+        self.daily = daily  # Новый файл при смене даты
+        self.flush_interval = flush_interval  # Период записи
+        self.queue = deque()  # Записи, ожидающие записи на диск: (время получения, сообщение)
+        self.file = None  # Текущий файл журнала
+        self.next_day_ns = 0  # Начало следующих суток UTC после открытия текущего файла, нс
+        self.file_number = 0  # Номер файла журнала
+        self.paths = []  # Записанные файлы журнала
+        self.records = 0  # Количество записанных событий
+        self.bytes = 0  # Количество записанных байт
+        self.errors = 0  # Количество ошибок записи. События пачки с ошибкой теряются
+        self.last_error: Union[Exception, None] = None  # Последняя ошибка записи
+        os.makedirs(directory, exist_ok=True)
+        self.closed = Event()  # Сигнал завершения записи
+        self.writer_thread = Thread(target=self.writer_handler, name='EventRecorderThread', daemon=True)  # Создаем поток записи
+        self.writer_thread.start()  # Запускаем поток
+
+    def record(self, data: bytes, received_ns: Union[int, None] = None):
+        """Запись события. Вызывается из потока подписок, на диск не пишет
+
+        :param bytes data: Сериализованное сообщение Event
+        :param int received_ns: Время получения события в нс UTC. None - текущее время
+        """
+        self.queue.append((received_ns or time_ns(), data))
+
+    def open_file(self, received_ns):
+        """Открытие нового файла журнала
+
+        :param int received_ns: Время получения первого события файла в нс UTC
+        """
+        self.close_file()  # Закрываем предыдущий файл, если он открыт
+        moment = datetime.fromtimestamp(received_ns / 1e9, timezone.utc)
+        self.file_number += 1
+        path = os.path.join(self.directory, f'{self.prefix}_{moment:%Y%m%d_%H%M%S}_{self.file_number:06d}{self.extension}')
+        self.file = open(path, 'ab')
+        if not self.file.tell():  # Если файл новый
+            self.file.write(self.magic)
+        day_ns = 24 * 60 * 60 * 10 ** 9  # Сутки в нс
+        self.next_day_ns = (received_ns // day_ns + 1) * day_ns
+        self.paths.append(path)
+
+    def flush(self):
+        """Запись накопленных событий на диск. Вызывается из потока записи"""
+        pack = self.record_header.pack
+        header_size = self.record_header.size
+        chunks = []  # Заголовки и сообщения текущего файла
+        size = self.file.tell() if self.file else 0  # Размер текущего файла с учетом еще не записанных событий
+        popleft = self.queue.popleft
+        while self.queue:  # Пока есть накопленные события
+            received_ns, data = popleft()
+            if self.file is None or self.daily and received_ns >= self.next_day_ns or self.max_bytes and size >= self.max_bytes:  # Если нужен новый файл
+                if chunks:  # Если есть события для текущего файла
+                    self.write(chunks)  # то дописываем их
+                    chunks = []
+                self.open_file(received_ns)
+                size = self.file.tell()
+            chunks.append(pack(received_ns, len(data)))
+            chunks.append(data)
+            size += header_size + len(data)
+        if chunks:  # Если есть события для записи
+            self.write(chunks)
+            self.file.flush()
+
+    def write(self, chunks: list):
+        """Запись пачки событий в текущий файл. Счетчики увеличиваются только после успешной записи
+
+        :param list chunks: Заголовки и сообщения событий подряд
+        """
+        data = b''.join(chunks)
+        self.file.write(data)
+        self.records += len(chunks) // 2
+        self.bytes += len(data)
+
+    def writer_handler(self):
+        """Поток записи"""
+        while True:
+            closed = self.closed.wait(self.flush_interval)  # Раз в период или по завершению записи
+            try:
+                self.flush()
+            except Exception as e:  # Ошибка записи (нет места, файл закрыт) не должна останавливать поток записи
+                self.errors += 1
+                self.last_error = e
+                self.close_file()  # Следующая пачка запишется в новый файл
+            if closed:  # Если запись завершена, то оставшиеся события уже записаны
+                break
+        self.close_file()
+
+    def close_file(self):
+        """Закрытие текущего файла журнала. Ошибки закрытия учитываются как ошибки записи"""
+        file, self.file = self.file, None
+        if file:  # Если файл открыт
+            try:
+                file.close()
+            except Exception as e:  # При закрытии дописывается буфер, может не хватить места
+                self.errors += 1
+                self.last_error = e
+
+    def close(self):
+        """Завершение записи. Оставшиеся события записываются на диск. Ошибки записи - в errors и last_error"""
+        self.closed.set()
+        self.writer_thread.join()
@@ -0,0 +1,119 @@
+import os  # Файлы журнала
+from mmap import mmap, ACCESS_READ  # Отображение файла журнала в память только для чтения
+from time import time_ns, sleep  # Воспроизведение в реальном времени
+from typing import Iterator, Union  # Итератор событий, объединение типов
+
+from .proto.tradeapi.v1.common_pb2 import ResponseEvent  # Событие результата выполнения запроса
+from .proto.tradeapi.v1.events_pb2 import Event, OrderEvent, TradeEvent, OrderBookEvent, PortfolioEvent  # События подписок
+from .EventRecorder import EventRecorder  # Формат журнала
+from .EventDispatcher import EventDispatcher  # Диспетчер событий подписок
+
+
+class EventReplay:
+    """Воспроизведение журналов событий подписок EventRecorder через обработчики диспетчера без сети
+
+    Файлы читаются через mmap. Тип события определяется по первому байту сообщения Event (тег поля oneof payload),
+    поэтому разбираются только события тех типов, на которые есть обработчики, и только вложенное сообщение
+    """
+    payload_classes = {'order': OrderEvent, 'trade': TradeEvent, 'order_book': OrderBookEvent, 'portfolio': PortfolioEvent, 'response': ResponseEvent}  # Классы событий по типу
+    tags = {(Event.DESCRIPTOR.fields_by_name[event_type].number << 3) | 2: event_type for event_type in payload_classes}  # Тип события по тегу поля (номер поля, длина)
+
+    def __init__(self, paths: Union[str, list]):
+        """Инициализация
+
+        :param paths: Файл журнала, папка с файлами журнала или список файлов в порядке воспроизведения
+        """
+        if isinstance(paths, str):  # Если задан один путь
+            if os.path.isdir(paths):  # Если это папка
+                paths = sorted(os.path.join(paths, name) for name in os.listdir(paths) if name.endswith(EventRecorder.extension))  # то берем все файлы журнала
+            else:  # Если это файл
+                paths = [paths]
+        self.paths = paths  # Файлы журнала
+
+    def records(self, path) -> Iterator[tuple[int, int, int, mmap]]:
+        """Записи файла журнала без разбора
+
+        :param str path: Файл журнала
+        :return: Итератор (время получения в нс, смещение сообщения, длина сообщения, отображение файла)
+        """
+        with open(path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:  # Пустой файл нельзя отобразить в память
+                return
+            with mmap(f.fileno(), 0, access=ACCESS_READ) as mm:
+                magic = EventRecorder.magic
+                if mm[:len(magic)] != magic:  # Если это не журнал событий
+                    raise ValueError(f'Файл {path} не является журналом событий')
+                unpack_from = EventRecorder.record_header.unpack_from
+                header_size = EventRecorder.record_header.size
+                position, size = len(magic), len(mm)
+                while position + header_size <= size:  # Пока в файле есть целые заголовки
+                    received_ns, length = unpack_from(mm, position)
+                    position += header_size
+                    if position + length > size:  # Если запись оборвана (файл еще пишется)
+                        return
+                    yield received_ns, position, length, mm
+                    position += length
+
+    def events(self, event_types=None, start_ns=None, end_ns=None) -> Iterator[tuple[int, str, object]]:
+        """События журнала
+
+        :param event_types: Типы событий, которые нужно разбирать. None - все типы
+        :param int start_ns: Время получения первого события, нс UTC. None - с начала журнала
+        :param int end_ns: Время получения, до которого воспроизводить события, нс UTC. None - до конца журнала
+        :return: Итератор (время получения в нс, тип события, событие)
+        """
+        wanted = {tag: (event_type, self.payload_classes[event_type]) for tag, event_type in self.tags.items()
+                  if event_types is None or event_type in event_types}  # Разбираемые типы событий по тегу
+        for path in self.paths:  # Пробегаемся по всем файлам журнала
+            for received_ns, position, length, mm in self.records(path):  # Пробегаемся по всем записям файла
+                if start_ns is not None and received_ns < start_ns:  # Если событие раньше начала
+                    continue  # то пропускаем его
+                if end_ns is not None and received_ns >= end_ns:  # Если событие позже окончания
+                    return  # то воспроизведение закончено
+                if not length:  # Если событие пустое
+                    continue
+                tag = mm[position]  # Тег поля oneof payload
+                if tag not in self.tags:  # Если это не известное событие (например, неизвестное поле)
+                    event = Event.FromString(mm[position:position + length])  # то разбираем сообщение целиком
+                    event_type = event.WhichOneof('payload')
+                    if event_type and (event_types is None or event_type in event_types):
+                        yield received_ns, event_type, getattr(event, event_type)
+                    continue
+                item = wanted.get(tag)
+                if item is None:  # Если события этого типа не нужны
+                    continue  # то не разбираем
+                start, shift, payload_length = position + 1, 0, 0
+                while True:  # Длина вложенного сообщения (varint)
+                    byte = mm[start]
+                    start += 1
+                    payload_length |= (byte & 0x7F) << shift
+                    if byte < 0x80:
+                        break
+                    shift += 7
+                event_type, payload_class = item
+                yield received_ns, event_type, payload_class.FromString(mm[start:start + payload_length])  # Разбираем только вложенное сообщение
+
+    def run(self, dispatcher: EventDispatcher, speed=None, start_ns=None, end_ns=None) -> int:
+        """Воспроизведение событий через обработчики диспетчера
+
+        :param EventDispatcher dispatcher: Диспетчер событий, например, FinamPy.dispatcher
+        :param float speed: Скорость воспроизведения. None - как можно быстрее, 1 - в реальном времени, 10 - в 10 раз быстрее
+        :param int start_ns: Время получения первого события, нс UTC. None - с начала журнала
+        :param int end_ns: Время получения, до которого воспроизводить события, нс UTC. None - до конца журнала
+        :return: Количество переданных обработчикам событий
+        """
+        event_types = [event_type for event_type in dispatcher.event_types
+                       if dispatcher.targets[event_type] or dispatcher.instrument_listeners[event_type]]  # Типы событий, на которые есть обработчики
+        dispatch = dispatcher.dispatch_payload
+        count = 0  # Количество событий
+        first_ns = wall_start_ns = None  # Время первого события в журнале и время начала воспроизведения
+        for received_ns, event_type, payload in self.events(event_types, start_ns, end_ns):  # Пробегаемся по событиям
+            if speed:  # Если воспроизводим в масштабе времени
+                if first_ns is None:
+                    first_ns, wall_start_ns = received_ns, time_ns()
+                delay = (received_ns - first_ns) / speed - (time_ns() - wall_start_ns)  # Сколько ждать до события, нс
+                if delay > 0:
+                    sleep(delay / 1e9)
+            dispatch(event_type, payload)
+            count += 1
+        return count
@@ -7,12 +7,11 @@ if __name__ == '__main__':  # Точка входа при запуске это
 
     symbols = (('TQBR', 'SBER'), ('FUT', 'SiM3'), ('FUT', 'RIM3'))  # Кортеж тикеров в виде (код площадки, код тикера)
 
-    print('Получаем информацию обо всех тикерах (займет несколько секунд)...')
-    securities = fp_provider.get_securities()  # Получаем информацию обо всех тикерах
-    # print('Ответ от сервера:', securities)
+    print('Получаем информацию обо всех тикерах (с сервера займет несколько секунд, из файла справочника - доли секунды)...')
+    fp_provider.securities_cache.load()  # Загружаем справочник из файла. Если файла нет или он устарел, то с сервера
     for board, symbol in symbols:  # Пробегаемся по всем тикерам
         try:
-            si = next(item for item in securities.securities if item.board == board and item.code == symbol)
+            si = fp_provider.securities_cache.get(board, symbol)  # Поиск тикера по индексу
             # print(si)
             print(f'\nИнформация о тикере {si.board}.{si.code} ({si.short_name}, {fp_provider.markets[si.market]}):')
             print(f'Валюта: {si.currency}')
@@ -0,0 +1,50 @@
+from time import perf_counter  # Замер времени
+
+from FinamPy.EventDispatcher import EventDispatcher  # Диспетчер событий подписок
+from FinamPy.proto.tradeapi.v1.common_pb2 import ResponseEvent
+from FinamPy.proto.tradeapi.v1.events_pb2 import Event, OrderEvent, TradeEvent, OrderBookEvent, OrderBookRow, PortfolioEvent
+
+
+def handler(event):
+    """Пустой обработчик события"""
+    pass
+
+
+def legacy_dispatch(e: Event):
+    """Разбор события сравнением с пустыми сообщениями, как было раньше в FinamPy.subscribtions_handler"""
+    if e.order != OrderEvent():
+        handler(e.order)
+    if e.trade != TradeEvent():
+        handler(e.trade)
+    if e.order_book != OrderBookEvent():
+        handler(e.order_book)
+    if e.portfolio != PortfolioEvent():
+        handler(e.portfolio)
+    if e.response != ResponseEvent:
+        handler(e.response)
+
+
+def events_per_second(dispatch, events):
+    """Количество обработанных событий в секунду"""
+    start = perf_counter()
+    for event in events:
+        dispatch(event)
+    return len(events) / (perf_counter() - start)
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    order_book = OrderBookEvent(security_code='SBER', security_board='TQBR',
+                                asks=[OrderBookRow(price=250 + i / 100, quantity=10 * i) for i in range(1, 11)],
+                                bids=[OrderBookRow(price=250 - i / 100, quantity=10 * i) for i in range(1, 11)])
+    trade = TradeEvent(security_code='SBER', trade_no=1, order_no=1, client_id='Client', quantity=1, price=250)
+    events = [Event(order_book=order_book)] * 90_000 + [Event(trade=trade)] * 10_000  # Поток, в котором преобладают стаканы
+
+    dispatcher = EventDispatcher()
+    for event_type in dispatcher.event_types:  # Основной обработчик на каждый тип события, как в FinamPy
+        dispatcher.set_handler(event_type, handler)
+    dispatcher.add_listener('order_book', handler, 'TQBR', 'SBER')  # Слушатель стакана одного инструмента
+
+    before = events_per_second(legacy_dispatch, events)
+    after = events_per_second(dispatcher.dispatch, events)
+    print(f'Сравнение с пустыми сообщениями: {before:,.0f} событий/с')
+    print(f'Диспетчер по WhichOneof: {after:,.0f} событий/с (x{after / before:.1f})')
@@ -0,0 +1,27 @@
+import os  # Размер журнала
+from tempfile import TemporaryDirectory  # Временная папка журнала
+from time import perf_counter  # Замер времени
+
+from FinamPy.EventRecorder import EventRecorder  # Запись событий подписок в двоичный журнал
+from FinamPy.proto.tradeapi.v1.events_pb2 import Event, OrderBookEvent, OrderBookRow
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    order_book = OrderBookEvent(security_code='SBER', security_board='TQBR',
+                                asks=[OrderBookRow(price=250 + i / 100, quantity=10 * i) for i in range(1, 21)],
+                                bids=[OrderBookRow(price=250 - i / 100, quantity=10 * i) for i in range(1, 21)])
+    data = Event(order_book=order_book).SerializeToString()  # Сообщение в том виде, как его отдает поток событий
+    count = 1_000_000  # Количество событий
+
+    with TemporaryDirectory() as directory:
+        recorder = EventRecorder(directory, max_bytes=256 * 1024 * 1024)
+        start = perf_counter()
+        for _ in range(count):  # Так событие записывается в потоке подписок
+            recorder.record(data)
+        hot = perf_counter() - start  # Время в потоке подписок
+        recorder.close()  # Дожидаемся записи на диск
+        total = perf_counter() - start
+        size = sum(os.path.getsize(path) for path in recorder.paths)
+        print(f'Событий: {count:,}, размер сообщения: {len(data)} байт, журнал: {size / 2 ** 20:.1f} МБ в {len(recorder.paths)} файлах')
+        print(f'Затраты в потоке подписок: {hot / count * 1e9:.0f} нс на событие')
+        print(f'Запись на диск: {count / total:,.0f} событий/с')
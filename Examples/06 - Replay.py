@@ -0,0 +1,31 @@
+from tempfile import TemporaryDirectory  # Временная папка журнала
+from time import perf_counter  # Замер времени
+
+from FinamPy.EventRecorder import EventRecorder  # Запись событий подписок в двоичный журнал
+from FinamPy.EventReplay import EventReplay  # Воспроизведение журналов событий
+from FinamPy.EventDispatcher import EventDispatcher  # Диспетчер событий подписок
+from FinamPy.proto.tradeapi.v1.events_pb2 import Event, OrderBookEvent, OrderBookRow, TradeEvent
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    order_book = Event(order_book=OrderBookEvent(security_code='SBER', security_board='TQBR',
+                                                 asks=[OrderBookRow(price=250 + i / 100, quantity=10 * i) for i in range(1, 11)],
+                                                 bids=[OrderBookRow(price=250 - i / 100, quantity=10 * i) for i in range(1, 11)])).SerializeToString()
+    trade = Event(trade=TradeEvent(security_code='SBER', trade_no=1, order_no=1, client_id='Client', quantity=1, price=250)).SerializeToString()
+
+    with TemporaryDirectory() as directory:
+        recorder = EventRecorder(directory)  # Записываем журнал: 9 стаканов на 1 сделку
+        for i in range(2_000_000):
+            recorder.record(trade if i % 10 == 0 else order_book, 1_700_000_000_000_000_000 + i * 1_000_000)
+        recorder.close()
+
+        replay = EventReplay(directory)  # Все файлы журнала из папки
+        for handlers in (('trade',), ('trade', 'order_book')):  # Сначала только сделки, затем сделки и стаканы
+            dispatcher = EventDispatcher()  # Вместо диспетчера можно передать fp_provider.dispatcher со своими обработчиками
+            trades = []
+            for event_type in handlers:
+                dispatcher.set_handler(event_type, trades.append if event_type == 'trade' else lambda event: None)
+            start = perf_counter()
+            count = replay.run(dispatcher)  # Как можно быстрее. speed=1 - в реальном времени, speed=10 - в 10 раз быстрее
+            elapsed = perf_counter() - start
+            print(f'Обработчики {", ".join(handlers)}: {count:,} событий за {elapsed:.2f} с, {count / elapsed * 60:,.0f} событий/мин')
@@ -0,0 +1,50 @@
+from time import perf_counter, sleep  # Замер времени
+
+import grpc  # Учетные данные локального канала
+
+from FinamPy import FinamPy  # Работа с сервером TRANSAQ
+from FinamPy.FakeFinamServer import FakeFinamServer  # Локальный сервер, заменяющий Finam Trade API
+from FinamPy.proto.tradeapi.v1.common_pb2 import BuySell  # Направление сделки
+
+
+def percentile(values, share):
+    """Перцентиль значений"""
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    port = 50151  # Порт локального сервера
+    duration = 5  # Длительность замера потока событий, с
+    orders = 1000  # Количество заявок для замера задержки
+
+    server = FakeFinamServer.run_subprocess(port, events_rate=0, latency=0)  # Сервер в отдельном процессе отдает события как можно быстрее
+    sleep(2)  # Ждем запуска сервера
+    try:
+        fp_provider = FinamPy('FakeToken', server=f'localhost:{port}', credentials=grpc.local_channel_credentials(), separate_channels=True)
+        received = [0]  # Количество полученных рыночных событий
+
+        def on_market_event(event):
+            received[0] += 1
+        fp_provider.on_order_book = on_market_event
+        fp_provider.on_trade = on_market_event
+        for i in range(100):  # Подписываемся на стаканы 100 инструментов
+            fp_provider.subscribe_order_book(f'S{i:05}', 'TQBR')
+        sleep(1)  # Разгон потока событий
+        start_count, start = received[0], perf_counter()
+        sleep(duration)
+        print(f'Поток событий через FinamPy: {(received[0] - start_count) / (perf_counter() - start):,.0f} событий/с')
+
+        latencies = []  # Задержки NewOrder, с
+        for _ in range(orders):  # Последовательные заявки на фоне потока событий
+            start = perf_counter()
+            fp_provider.new_order('Client', 'TQBR', 'S00000', BuySell.BUY_SELL_BUY, 1, price=100.0)
+            latencies.append(perf_counter() - start)
+        print(f'NewOrder: p50 {percentile(latencies, 0.5) * 1000:.2f} мс, p99 {percentile(latencies, 0.99) * 1000:.2f} мс')
+
+        start = perf_counter()
+        fp_provider.new_orders([dict(client_id='Client', security_board='TQBR', security_code='S00000', buy_sell=BuySell.BUY_SELL_BUY, quantity=1, price=100.0)] * 50)
+        print(f'Пакет из 50 заявок: {(perf_counter() - start) * 1000:.2f} мс')
+        fp_provider.close_subscriptions_thread()  # Закрываем поток подписок перед выходом
+    finally:
+        server.terminate()
@@ -0,0 +1,54 @@
+from time import perf_counter, sleep  # Замер времени
+
+import grpc  # Учетные данные локального канала
+
+from FinamPy import FinamPy  # Работа с сервером TRANSAQ
+from FinamPy.FakeFinamServer import FakeFinamServer  # Локальный сервер, заменяющий Finam Trade API
+from FinamPy.Metrics import Metrics  # Замеры задержек вызовов и обработки событий
+from FinamPy.EventDispatcher import EventDispatcher  # Диспетчер событий подписок
+from FinamPy.proto.tradeapi.v1.common_pb2 import BuySell  # Направление сделки
+from FinamPy.proto.tradeapi.v1.events_pb2 import OrderBookEvent, OrderBookRow  # Стакан
+
+
+def dispatch_rate(dispatcher, payload, count=500_000):
+    """Количество событий в секунду через диспетчер"""
+    dispatch = dispatcher.dispatch_payload
+    start = perf_counter()
+    for _ in range(count):
+        dispatch('order_book', payload)
+    return count / (perf_counter() - start)
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    # Накладные расходы замеров на обработку событий
+    order_book = OrderBookEvent(security_code='SBER', security_board='TQBR', asks=[OrderBookRow(price=250.01, quantity=10)], bids=[OrderBookRow(price=250, quantity=10)])
+    dispatcher = EventDispatcher()
+    dispatcher.set_handler('order_book', lambda event: None)
+    print(f'Без замеров: {dispatch_rate(dispatcher, order_book):,.0f} событий/с')
+    dispatcher.set_metrics(Metrics())
+    print(f'С замерами: {dispatch_rate(dispatcher, order_book):,.0f} событий/с')
+    dispatcher.set_metrics(None)
+    print(f'Замеры выключены: {dispatch_rate(dispatcher, order_book):,.0f} событий/с')
+
+    # Замеры вызовов и событий на локальном сервере
+    with FakeFinamServer(events_rate=2000, latency=0.001, access_token='FakeToken') as server:
+        metrics = Metrics()  # Замеры
+        fp_provider = FinamPy('FakeToken', server=server.address, credentials=grpc.local_channel_credentials(), metrics=metrics)
+        fp_provider.on_order_book = lambda event: None  # Обработчики событий
+        fp_provider.on_trade = lambda event: None
+        for code in ('S00000', 'S00001', 'S00002'):  # Подписываемся на стаканы нескольких инструментов
+            fp_provider.subscribe_order_book(code, 'TQBR')
+        for _ in range(100):  # Заявки
+            fp_provider.new_order('Client', 'TQBR', 'S00000', BuySell.BUY_SELL_BUY, 1, price=100.0)
+        fp_provider.get_portfolio('Client')
+        sleep(2)  # Собираем события
+        fp_provider.close_subscriptions_thread()  # Закрываем поток подписок перед выходом
+
+    stats = metrics.stats()  # Сводка замеров
+    for method, item in stats['rpc'].items():
+        print(f'{method}: {item["count"]} вызовов, p50 {item["p50"] * 1000:.2f} мс, p99 {item["p99"] * 1000:.2f} мс, ошибки {item["errors"]}')
+    for event_type, item in stats['events'].items():
+        print(f'{event_type}: {item["count"]} событий, среднее время обработки {item["mean"] * 1e6:.1f} мкс')
+    for (event_type, board, code), item in sorted(stats['instruments'].items()):
+        print(f'{event_type} {board}.{code}: {item["rate"]:.0f} событий/с')
+    print(metrics.prometheus()[:500])  # Начало выгрузки для Prometheus
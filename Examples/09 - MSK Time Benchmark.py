@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta  # Время
+from time import perf_counter  # Замер времени
+
+from pytz import timezone, utc  # Перевод времени через pytz для сравнения
+from google.protobuf.timestamp_pb2 import Timestamp  # Представление времени
+
+from FinamPy.MskTime import MskTime  # Перевод времени UTC в московское
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    tz_msk = timezone('Europe/Moscow')  # Московское время
+    msk_time = MskTime(tz_msk)
+    count = 200_000  # Количество значений времени
+    start_dt = datetime(2023, 3, 1, 7)  # Начало торгов
+    dts = [start_dt + timedelta(milliseconds=37 * i) for i in range(count)]  # Время сделок UTC
+    timestamps = []  # Время сделок в том виде, как его отдают заявки и события
+    for dt in dts:
+        timestamp = Timestamp()
+        timestamp.FromDatetime(dt)
+        timestamps.append(timestamp)
+
+    start = perf_counter()
+    pytz_msk = [utc.localize(dt).astimezone(tz_msk).replace(tzinfo=None) for dt in dts]  # Так переводит FinamPy.utc_to_msk_datetime до изменения
+    pytz_time = perf_counter() - start
+    start = perf_counter()
+    cached_msk = [msk_time.utc_to_msk_datetime(dt) for dt in dts]  # Перевод с запомненным смещением
+    cached_time = perf_counter() - start
+    start = perf_counter()
+    pytz_array = [utc.localize(timestamp.ToDatetime()).astimezone(tz_msk).replace(tzinfo=None) for timestamp in timestamps]  # Timestamp через pytz
+    pytz_timestamps_time = perf_counter() - start
+    start = perf_counter()
+    msk_array = msk_time.timestamps_to_msk_datetime64(timestamps)  # Timestamp массивом
+    array_time = perf_counter() - start
+    assert pytz_msk == cached_msk == pytz_array == msk_array.astype('datetime64[us]').tolist()  # Результаты совпадают
+
+    print(f'datetime через pytz: {count / pytz_time:,.0f} значений/с')
+    print(f'datetime с запомненным смещением: {count / cached_time:,.0f} значений/с ({pytz_time / cached_time:.1f}x)')
+    print(f'Timestamp через pytz: {count / pytz_timestamps_time:,.0f} значений/с')
+    print(f'Timestamp массивом в datetime64: {count / array_time:,.0f} значений/с ({pytz_timestamps_time / array_time:.1f}x)')
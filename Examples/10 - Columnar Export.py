@@ -0,0 +1,52 @@
+from time import perf_counter  # Замер времени
+
+from pytz import timezone, utc  # Перевод времени через pytz, как в цикле по заявкам
+
+from FinamPy.ColumnarExport import ColumnarExport  # Выгрузка сообщений в столбцы
+from FinamPy.proto.tradeapi.v1.common_pb2 import BuySell, Market, OrderValidBeforeType  # Направление сделки, рынок, срок действия заявки
+from FinamPy.proto.tradeapi.v1.orders_pb2 import GetOrdersResult, OrderStatus, OrderConditionType  # Заявки
+
+
+def to_msk(timestamp):
+    """Перевод Timestamp в московское время через pytz"""
+    return utc.localize(timestamp.ToDatetime()).astimezone(tz_msk).replace(tzinfo=None) if timestamp.seconds else None
+
+
+def loop_rows(orders):
+    """Те же столбцы циклом по заявкам, как в примере Accounts"""
+    return [(order.order_no, order.transaction_id, order.security_code, order.client_id, OrderStatus.Name(order.status), BuySell.Name(order.buy_sell),
+             to_msk(order.created_at), order.price, order.quantity, order.balance, order.message, order.currency,
+             OrderConditionType.Name(order.condition.type), order.condition.price, to_msk(order.condition.time),
+             OrderValidBeforeType.Name(order.valid_before.type), to_msk(order.valid_before.time), to_msk(order.accepted_at),
+             order.security_board, Market.Name(order.market)) for order in orders]
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    tz_msk = timezone('Europe/Moscow')  # Московское время
+    count = 50_000  # Количество заявок
+    result = GetOrdersResult(client_id='Client')  # Ответ get_orders
+    for i in range(count):
+        order = result.orders.add(order_no=i, transaction_id=i, security_code='SBER', security_board='TQBR', client_id='Client',
+                                  status=OrderStatus.ORDER_STATUS_MATCHED if i % 3 else OrderStatus.ORDER_STATUS_ACTIVE,
+                                  buy_sell=BuySell.BUY_SELL_BUY if i % 2 else BuySell.BUY_SELL_SELL, price=250 + i % 100 / 100, quantity=10)
+        order.created_at.FromSeconds(1_700_000_000 + i)
+        order.accepted_at.FromSeconds(1_700_000_000 + i)
+
+    start = perf_counter()
+    rows = loop_rows(result.orders)
+    print(f'Цикл Python: {(perf_counter() - start) * 1000:.0f} мс')
+    try:
+        import pandas as pd
+        start = perf_counter()
+        pd.DataFrame(loop_rows(result.orders), columns=[name for name, *_ in ColumnarExport.schema(result.orders[0].DESCRIPTOR)])
+        print(f'Цикл Python в pandas: {(perf_counter() - start) * 1000:.0f} мс')
+    except ImportError:  # pandas может быть не установлен
+        pass
+
+    for output in ColumnarExport.formats:
+        try:
+            start = perf_counter()
+            table = ColumnarExport.orders(result, output)
+            print(f'ColumnarExport {output}: {(perf_counter() - start) * 1000:.0f} мс, {len(table)} строк')
+        except ImportError as e:  # pandas и pyarrow могут быть не установлены
+            print(f'ColumnarExport {output}: {e}')
@@ -0,0 +1,41 @@
+from time import perf_counter  # Замер времени
+
+import numpy as np  # Случайные сделки
+
+from FinamPy.BarBuilder import BarBuilder  # Построение баров
+from FinamPy.EventDispatcher import EventDispatcher  # Диспетчер событий подписок
+from FinamPy.proto.tradeapi.v1.events_pb2 import TradeEvent  # Событие сделки
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    count = 200_000  # Количество сделок
+    rng = np.random.default_rng(0)
+    utc_ns = np.cumsum(rng.integers(0, 1_000_000_000, count)) + 1_700_000_000_000_000_000  # Время сделок UTC, нс
+    prices = np.round(250 + np.cumsum(rng.normal(0, 0.01, count)), 2)  # Цены
+    quantities = rng.integers(1, 100, count)  # Количества
+    events = []  # События сделок в том виде, как их отдает поток событий
+    for t, price, quantity in zip(utc_ns.tolist(), prices.tolist(), quantities.tolist()):
+        event = TradeEvent(security_code='SBER', price=price, quantity=quantity)
+        event.created_at.FromNanoseconds(t)
+        events.append(event)
+
+    timeframes = ('M1', 'M5', 'H1', 'D1')  # Таймфреймы
+    bars = []  # Закрытые бары
+    dispatcher = EventDispatcher()
+    builder = BarBuilder(timeframes, on_bar=lambda security_code, timeframe, bar: bars.append(bar)).attach(dispatcher)
+    start = perf_counter()
+    for event in events:  # Так сделки приходят из потока событий
+        dispatcher.dispatch_payload('trade', event)
+    elapsed = perf_counter() - start
+    print(f'Поток: {count / elapsed:,.0f} сделок/с по {len(timeframes)} таймфреймам, закрыто баров: {len(bars)}')
+    print(builder.bars('SBER', 'H1')[-3:])
+
+    start = perf_counter()
+    msk_ns = BarBuilder.msk_time.utc_to_msk_ns(utc_ns)  # Московское время
+    bulk = {timeframe: BarBuilder.build(msk_ns, prices, quantities, timeframe) for timeframe in timeframes}
+    elapsed = perf_counter() - start
+    print(f'Массивами: {count / elapsed:,.0f} сделок/с по {len(timeframes)} таймфреймам')
+    same = all(np.array_equal(builder.bars('SBER', timeframe)[field], bulk[timeframe][:-1][field]) for timeframe in timeframes
+               for field in ('time', 'open', 'high', 'low', 'close', 'volume', 'trades')) and \
+        all(np.allclose(builder.bars('SBER', timeframe)['vwap'], bulk[timeframe][:-1]['vwap']) for timeframe in timeframes)  # Суммы цена * количество могут отличаться в последнем знаке
+    print(f'Бары совпадают: {same}')
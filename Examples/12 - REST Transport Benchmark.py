@@ -0,0 +1,28 @@
+from time import perf_counter  # Замер времени
+
+import requests  # Запросы без постоянных соединений, как до транспорта
+
+from FinamPy import FinamRestPy  # Работа с Comon Trade API
+from FinamPy.FakeFinamRestServer import FakeFinamRestServer  # Локальный сервер, заменяющий Comon Trade API
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    count = 500  # Количество запросов
+    with FakeFinamRestServer(access_token='FakeToken') as server:
+        headers = {'accept': 'text/plain', 'X-Api-Key': 'FakeToken'}
+        start = perf_counter()
+        for _ in range(count):  # Каждый запрос открывает новое соединение
+            requests.get(f'{server.address}/api/v1/access-tokens/check', headers=headers)
+        single = (perf_counter() - start) / count
+        connections = server.connections
+        print(f'Без постоянных соединений: {single * 1000:.2f} мс на запрос, соединений: {connections}')
+
+        with FinamRestPy('Client', 'FakeToken', server=server.address) as fp_provider:
+            start = perf_counter()
+            for _ in range(count):  # Все запросы идут через одно соединение
+                fp_provider.check_access_token()
+            pooled = (perf_counter() - start) / count
+            print(f'Транспорт с пулом соединений: {pooled * 1000:.2f} мс на запрос ({single / pooled:.1f}x), соединений: {server.connections - connections}')
+            for (method, path), stats in fp_provider.transport.stats.items():  # Статистика по точкам доступа
+                print(f'{method} {path}: {stats["count"]} запросов, среднее {stats["total"] / stats["count"] * 1000:.2f} мс, максимум {stats["max"] * 1000:.2f} мс')
+    print('Для сервера HTTPS выигрыш больше: кроме соединения TCP не повторяется рукопожатие TLS')
@@ -0,0 +1,34 @@
+from asyncio import run  # Запуск асинхронного кода
+from time import perf_counter  # Замер времени
+
+from FinamPy import FinamRestPy, AsyncFinamRestPy  # Работа с Comon Trade API
+from FinamPy.FakeFinamRestServer import FakeFinamRestServer  # Локальный сервер, заменяющий Comon Trade API
+
+
+async def main(server):
+    async with AsyncFinamRestPy('Client', 'FakeToken', server=server.address) as fp_provider:
+        fp_provider.OnError = lambda message: print(message)  # Ошибки запросов
+        print('Токен:', await fp_provider.check_access_token())
+        portfolio, orders, stops = await fp_provider.get_snapshot()  # Портфель, заявки и стоп-заявки параллельно
+        print('Портфель:', portfolio['equity'], 'заявок:', len(orders['orders']))
+
+        transaction_ids = [(await fp_provider.create_order('TQBR', 'SBER', 'Buy', 1, False, 100 + i, 'PutInQueue', None, None, None, 'TillEndSession', None))['transactionId'] for i in range(3)]
+        print('Отмена:', await fp_provider.delete_orders(transaction_ids + [999_999]))  # Последняя заявка не существует: None и событие ошибки
+
+        count = 200  # Количество запросов
+        start = perf_counter()
+        await fp_provider.gather(*(fp_provider.check_access_token() for _ in range(count)), max_concurrency=10)
+        duration = perf_counter() - start
+        print(f'Асинхронно, 10 одновременных запросов: {duration / count * 1000:.2f} мс на запрос')
+    return duration
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    with FakeFinamRestServer(latency=0.005) as server:  # Сервер отвечает с задержкой 5 мс, как удаленный
+        async_duration = run(main(server))
+        with FinamRestPy('Client', 'FakeToken', server=server.address) as fp_provider:
+            start = perf_counter()
+            for _ in range(200):  # Синхронные запросы выполняются по одному
+                fp_provider.check_access_token()
+            sync_duration = perf_counter() - start
+        print(f'Синхронно: {sync_duration / 200 * 1000:.2f} мс на запрос ({sync_duration / async_duration:.1f}x медленнее)')
@@ -0,0 +1,43 @@
+from json import loads  # Разбор JSON до ускорения
+from time import perf_counter  # Замер времени
+from tracemalloc import start, stop, get_traced_memory, reset_peak  # Замер пиковой памяти
+
+import requests  # Запись ответа сервера
+
+from FinamPy.JsonStream import JsonStream  # Разбор ответов JSON: целиком или по частям
+from FinamPy.FakeFinamRestServer import FakeFinamRestServer  # Локальный сервер, заменяющий Comon Trade API
+
+
+def measure(name, func, repeat=5):
+    """Время и пиковая память разбора"""
+    func()  # Прогрев
+    start_time = perf_counter()
+    for _ in range(repeat):
+        count = func()
+    duration = (perf_counter() - start_time) / repeat
+    start()
+    reset_peak()
+    func()
+    peak = get_traced_memory()[1]
+    stop()
+    print(f'{name}: {duration * 1000:.1f} мс, пик памяти {peak / 2 ** 20:.1f} МБ, инструментов {count}')
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    with FakeFinamRestServer(securities=50_000) as server:  # Записываем ответ /api/v1/securities
+        content = requests.get(f'{server.address}/api/v1/securities').content
+    print(f'Ответ справочника: {len(content) / 2 ** 20:.1f} МБ, библиотека разбора: {JsonStream.backend}')
+    chunks = [content[i:i + 65536] for i in range(0, len(content), 65536)]  # Части ответа, как их отдает iter_content
+
+    def old():  # Как было: строка, затем json.loads
+        return len(loads(content.decode('utf-8'))['data']['securities'])
+
+    def fast():  # Разбор из байт
+        return len(JsonStream.loads(content)['data']['securities'])
+
+    def streaming():  # Записи по одной, список не собирается
+        return sum(1 for _ in JsonStream(chunks).iter_items(('data', 'securities')))
+
+    measure('json.loads(content.decode())', old)
+    measure('JsonStream.loads(content)', fast)
+    measure('JsonStream.iter_items по частям', streaming)
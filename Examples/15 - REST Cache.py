@@ -0,0 +1,32 @@
+from time import perf_counter, sleep  # Замер времени, пауза между обновлениями
+
+from FinamPy import FinamRestPy  # Работа с Comon Trade API
+from FinamPy.RestCache import RestCache  # Кэш ответов запросов чтения
+from FinamPy.FakeFinamRestServer import FakeFinamRestServer  # Локальный сервер, заменяющий Comon Trade API
+
+
+def dashboard(fp_provider, refreshes=200):
+    """Панель, которая часто обновляет портфель, заявки и справочник"""
+    start = perf_counter()
+    for _ in range(refreshes):
+        fp_provider.get_portfolio()
+        fp_provider.get_orders()
+        fp_provider.get_securities()
+        sleep(0.005)  # Обновление каждые 5 мс
+    return perf_counter() - start
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    with FakeFinamRestServer(latency=0.002) as server:  # Сервер отвечает с задержкой 2 мс
+        with FinamRestPy('Client', 'FakeToken', server=server.address) as fp_provider:
+            requests = server.requests
+            print(f'Без кэша: {dashboard(fp_provider):.2f} с, запросов к серверу: {server.requests - requests}')
+
+        cache = RestCache({'/api/v1/securities': 600, '/api/v1/portfolio': 0.5, '/api/v1/orders': 0.5})  # Справочник 10 минут, портфель и заявки 0,5 с
+        with FinamRestPy('Client', 'FakeToken', server=server.address, cache=cache) as fp_provider:
+            requests = server.requests
+            print(f'С кэшем: {dashboard(fp_provider):.2f} с, запросов к серверу: {server.requests - requests}, из них 304 без тела: {server.not_modified}')
+            print(f'Статистика кэша: {cache.stats}, доля попаданий {cache.hit_ratio:.0%}')
+
+            fp_provider.create_order('TQBR', 'SBER', 'Buy', 1, False, 100, 'PutInQueue', None, None, None, 'TillEndSession', None)  # Новая заявка сбрасывает заявки и портфель счета
+            print('Заявок после выставления:', len(fp_provider.get_orders()['orders']))
@@ -0,0 +1,30 @@
+from threading import Thread  # Потоки, опрашивающие заявки
+from time import perf_counter, sleep  # Замер времени
+
+from FinamPy import FinamRestPy  # Работа с Comon Trade API
+from FinamPy.RequestScheduler import RequestScheduler  # Ограничение частоты запросов с приоритетами
+from FinamPy.FakeFinamRestServer import FakeFinamRestServer  # Локальный сервер, заменяющий Comon Trade API
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    scheduler = RequestScheduler({'api': (50, 5)})  # Одно ведро на все запросы: 50 запросов в секунду, 5 подряд
+    with FakeFinamRestServer() as server, FinamRestPy('Client', 'FakeToken', server=server.address, scheduler=scheduler) as fp_provider:
+        transaction_id = fp_provider.create_order('TQBR', 'SBER', 'Buy', 1, False, 100, 'PutInQueue', None, None, None, 'TillEndSession', None)['transactionId']
+
+        def poll():  # Панель опрашивает заявки
+            for _ in range(25):
+                fp_provider.get_orders()
+        pollers = [Thread(target=poll) for _ in range(8)]  # 200 запросов чтения - 4 секунды очереди
+        start = perf_counter()
+        for poller in pollers:
+            poller.start()
+        sleep(0.5)  # Очередь запросов чтения набралась
+        cancel_start = perf_counter()
+        fp_provider.delete_order(transaction_id)  # Срочная отмена заявки проходит вперед очереди
+        print(f'Отмена заявки на фоне опроса: {(perf_counter() - cancel_start) * 1000:.0f} мс')
+        for poller in pollers:
+            poller.join()
+        duration = perf_counter() - start
+        print(f'Запросов в секунду: {(server.requests - 2) / duration:.1f} при ограничении 50')
+        for method_class, delay in scheduler.stats()['delays'].items():  # Задержка в очереди по классам запросов
+            print(f'{method_class}: {delay["count"]} запросов, задержка в очереди: средняя {delay["mean"] * 1000:.1f} мс, максимальная {delay["max"] * 1000:.1f} мс')
@@ -0,0 +1,35 @@
+from asyncio import run, gather, create_task, wait_for, Event as AsyncEvent  # Запуск асинхронного кода, параллельные вызовы, ожидание событий
+
+import grpc  # Учетные данные локального канала
+
+from FinamPy import AsyncFinamPy  # Асинхронная работа с сервером TRANSAQ
+from FinamPy.FakeFinamServer import FakeFinamServer  # Локальный сервер, заменяющий Finam Trade API
+from FinamPy.proto.tradeapi.v1.common_pb2 import BuySell  # Направление сделки
+
+
+async def main(address):
+    async with AsyncFinamPy('FakeToken', server=address, credentials=grpc.local_channel_credentials()) as fp_provider:
+        securities, portfolio, orders = await gather(fp_provider.get_securities(), fp_provider.get_portfolio('Client'), fp_provider.get_orders('Client'))  # Вызовы параллельно
+        print(f'Инструментов: {len(securities.securities)}, позиций: {len(portfolio.positions)}, заявок: {len(orders.orders)}')
+
+        new_order = await fp_provider.new_order('Client', 'TQBR', 'S00000', BuySell.BUY_SELL_BUY, 1, price=100)
+        print(f'Заявка: {new_order.transaction_id}, отмена: {await fp_provider.cancel_order("Client", new_order.transaction_id) is not None}')
+
+        order_books = [0]  # Количество полученных стаканов
+        received = AsyncEvent()  # Получено 10 стаканов
+
+        def on_order_book(event):
+            order_books[0] += 1
+            if order_books[0] >= 10:
+                received.set()
+        fp_provider.dispatcher.set_handler('order_book', on_order_book)
+        dispatch_task = create_task(fp_provider.dispatch_events())  # Поток событий в диспетчер
+        await fp_provider.subscribe_order_book('S00000', 'TQBR')
+        await wait_for(received.wait(), 5)  # Ждем стаканы не дольше 5 с
+        print(f'Стаканов получено: {order_books[0]}')
+    await dispatch_task  # Поток событий завершается при закрытии канала
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    with FakeFinamServer(events_rate=1000) as server:  # Локальный сервер отдает 1000 событий в секунду
+        run(main(server.address))
@@ -0,0 +1,169 @@
+from argparse import ArgumentParser  # Параметры запуска из командной строки
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler  # Сервер HTTP
+from itertools import count  # Номера транзакций и заявок
+from json import dumps  # Ответы в виде JSON сообщений
+from threading import Thread, Lock  # Поток сервера, блокировка заявок
+from time import sleep  # Задержка ответа
+from urllib.parse import urlsplit, parse_qs  # Разбор адреса запроса
+from zlib import crc32  # ETag ответа
+
+
+class FakeFinamRestServer:
+    """Локальный сервер HTTP, заменяющий Comon Trade API для замеров клиентов REST
+
+    Отвечает в формате сервера {"data": ..., "error": null}, держит постоянные соединения HTTP/1.1.
+    На запросы GET отдает ETag и отвечает 304 на If-None-Match с тем же ETag.
+    Подключение: FinamRestPy(client_id, token, server=server.address)
+    """
+
+    def __init__(self, port=0, latency=0.0, securities=1000, access_token=None):
+        """Инициализация
+
+        :param int port: Порт сервера. 0 - любой свободный
+        :param float latency: Задержка ответа, с
+        :param int securities: Количество инструментов в справочнике
+        :param str access_token: Торговый токен доступа. None - не проверять
+        """
+        self.latency = latency  # Задержка ответа
+        self.access_token = access_token  # Торговый токен доступа
+        self.securities = [{'code': f'S{i:05}', 'board': 'TQBR', 'market': 'Stock', 'decimals': 2, 'lotSize': 10, 'minStep': 1, 'currency': 'RUB',
+                            'shortName': f'Инструмент {i}', 'properties': 0, 'timeZoneName': 'Russian Standard Time', 'bpCost': 1.0,
+                            'accruedInterest': 0.0, 'priceSign': 'Positive', 'ticker': f'S{i:05}', 'lotDivider': 1,
+                            'instrumentCode': f'S{i:05}'} for i in range(securities)]  # Справочник инструментов
+        self.transaction_ids = count(1)  # Номера транзакций
+        self.orders: dict[int, dict] = {}  # Заявки по номеру транзакции
+        self.lock = Lock()  # Блокировка заявок
+        self.requests = 0  # Количество принятых запросов
+        self.connections = 0  # Количество принятых соединений
+        self.not_modified = 0  # Количество ответов 304
+        self.routes = {('GET', '/api/v1/access-tokens/check'): self.check_access_token,
+                       ('GET', '/api/v1/orders'): self.get_orders, ('POST', '/api/v1/orders'): self.create_order, ('DELETE', '/api/v1/orders'): self.delete_order,
+                       ('GET', '/api/v1/portfolio'): self.get_portfolio, ('GET', '/api/v1/securities'): self.get_securities,
+                       ('DELETE', '/api/v1/stops'): self.delete_stop}  # Обработчики по (метод, путь)
+        self.server = ThreadingHTTPServer(('localhost', port), self.handler_class())  # Сервер HTTP
+        self.server.daemon_threads = True  # Потоки соединений не держат процесс
+        self.port = self.server.server_address[1]  # Порт сервера
+        self.address = f'http://localhost:{self.port}'  # Адрес для подключения клиента
+
+    def handler_class(self):
+        """Класс обработчика запросов, связанный с сервером"""
+        fake_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Постоянные соединения
+            disable_nagle_algorithm = True  # Заголовки и тело уходят отдельно. Без этого ответ ждет подтверждения 40 мс
+
+            def setup(self):
+                super().setup()
+                fake_server.connections += 1
+
+            def log_message(self, format, *args):  # Без вывода каждого запроса
+                pass
+
+            def handle_method(self):
+                fake_server.handle(self)
+            do_GET = do_POST = do_DELETE = handle_method
+
+        return Handler
+
+    def handle(self, request: BaseHTTPRequestHandler):
+        """Обработка запроса
+
+        :param request: Запрос
+        """
+        self.requests += 1
+        url = urlsplit(request.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}  # Параметры запроса
+        if self.latency:  # Если задана задержка
+            sleep(self.latency)
+        if self.access_token and request.headers.get('X-Api-Key') != self.access_token:  # Если токен не тот
+            return self.send(request, 401, b'Unauthorized')
+        route = self.routes.get((request.command, url.path))
+        if route is None:  # Если такого запроса нет
+            return self.send(request, 404, b'Not Found')
+        data, error = route(params)
+        body = dumps({'data': data, 'error': error}, ensure_ascii=False).encode('utf-8')
+        if request.command != 'GET':  # Если запрос не на чтение
+            return self.send(request, 200, body)
+        etag = f'"{crc32(body):08x}"'  # ETag по содержимому ответа
+        if request.headers.get('If-None-Match') == etag:  # Если у клиента те же данные
+            self.not_modified += 1
+            return self.send(request, 304, b'', etag)
+        self.send(request, 200, body, etag)
+
+    @staticmethod
+    def send(request: BaseHTTPRequestHandler, status, body: bytes, etag=None):
+        """Отправка ответа"""
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json; charset=utf-8')
+        request.send_header('Content-Length', str(len(body)))
+        if etag:  # Если у ответа есть ETag
+            request.send_header('ETag', etag)
+        request.end_headers()
+        request.wfile.write(body)
+
+    # Запросы
+
+    def check_access_token(self, params):
+        return {'id': 1}, None
+
+    def get_orders(self, params):
+        with self.lock:
+            return {'clientId': params.get('ClientId'), 'orders': [order for order in self.orders.values() if order['clientId'] == params.get('ClientId')]}, None
+
+    def create_order(self, params):
+        transaction_id = next(self.transaction_ids)
+        with self.lock:
+            self.orders[transaction_id] = {'orderNo': transaction_id, 'transactionId': transaction_id, 'securityCode': params.get('securityCode'),
+                                           'securityBoard': params.get('securityBoard'), 'clientId': params.get('clientId'), 'status': 'Active',
+                                           'buySell': params.get('buySell'), 'price': float(params.get('price', 0)), 'quantity': int(params.get('quantity', 0))}
+        return {'clientId': params.get('clientId'), 'transactionId': transaction_id, 'securityCode': params.get('securityCode')}, None
+
+    def delete_order(self, params):
+        with self.lock:
+            order = self.orders.get(int(params.get('TransactionId', 0)))
+            if order is None:  # Если заявки нет
+                return None, {'code': 'NotFound', 'message': 'Заявка не найдена', 'data': None}
+            order['status'] = 'Cancelled'
+        return {'clientId': params.get('ClientId'), 'transactionId': order['transactionId']}, None
+
+    def get_portfolio(self, params):
+        return {'clientId': params.get('ClientId'), 'equity': 1_000_000, 'balance': 1_000_000,
+                'positions': [{'securityCode': 'S00000', 'market': 'Stock', 'balance': 10, 'currentPrice': 100, 'averagePrice': 99, 'currency': 'RUB'}],
+                'money': [{'market': 'Stock', 'currency': 'RUB', 'balance': 999_000}], 'currencies': []}, None
+
+    def get_securities(self, params):
+        return {'securities': self.securities}, None
+
+    def delete_stop(self, params):
+        return {'clientId': params.get('ClientId'), 'stopId': int(params.get('StopId', 0))}, None
+
+    # Запуск и остановка
+
+    def start(self):
+        """Запуск сервера в отдельном потоке"""
+        Thread(target=self.server.serve_forever, name='FakeFinamRestServerThread', daemon=True).start()
+        return self
+
+    def stop(self):
+        """Остановка сервера"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+if __name__ == '__main__':  # Запуск сервера: python -m FinamPy.FakeFinamRestServer --port 8080
+    parser = ArgumentParser(description='Локальный сервер HTTP, заменяющий Comon Trade API')
+    parser.add_argument('--port', type=int, default=8080, help='Порт сервера')
+    parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа, с')
+    parser.add_argument('--securities', type=int, default=1000, help='Количество инструментов в справочнике')
+    parser.add_argument('--access_token', default=None, help='Торговый токен доступа')
+    arguments = parser.parse_args()
+    fake_server = FakeFinamRestServer(**vars(arguments))
+    print(f'Сервер запущен: {fake_server.address}', flush=True)
+    fake_server.server.serve_forever()
@@ -0,0 +1,312 @@
+import os  # Окружение процесса сервера
+import sys  # Интерпретатор для запуска сервера в отдельном процессе
+from argparse import ArgumentParser  # Параметры запуска из командной строки
+from concurrent.futures import ThreadPoolExecutor  # Потоки обработки вызовов
+from itertools import count  # Номера транзакций, заявок и сделок
+from queue import SimpleQueue, Empty  # Запросы на подписку потока событий
+from random import Random  # Синтетические цены
+from subprocess import Popen  # Сервер в отдельном процессе
+from threading import Thread, Lock, Timer  # Чтение запросов на подписку, блокировка заявок, исполнение заявок
+from time import sleep, monotonic  # Задержка вызовов и темп событий
+
+import grpc  # Сервер gRPC
+
+from .proto.tradeapi.v1.common_pb2 import ResponseEvent, Market  # Результат выполнения запроса, рынки
+from .proto.tradeapi.v1.events_pb2 import Event, OrderEvent, TradeEvent, OrderBookEvent, OrderBookRow  # События подписок
+from .grpc.tradeapi.v1 import events_pb2_grpc, orders_pb2_grpc, portfolios_pb2_grpc, securities_pb2_grpc, stops_pb2_grpc  # Сервисы
+from .proto.tradeapi.v1.orders_pb2 import Order, OrderStatus, NewOrderResult, CancelOrderResult, GetOrdersResult  # Заявки
+from .proto.tradeapi.v1.portfolios_pb2 import GetPortfolioResult, PositionRow, MoneyRow  # Портфель
+from .grpc.tradeapi.v1.securities_pb2 import GetSecuritiesResult  # Справочник инструментов
+from .proto.tradeapi.v1.security_pb2 import Security  # Инструмент
+from .proto.tradeapi.v1.stops_pb2 import Stop, StopStatus, NewStopResult, CancelStopResult, GetStopsResult  # Стоп заявки
+
+
+class FakeFinamServer(events_pb2_grpc.EventsServicer, orders_pb2_grpc.OrdersServicer, portfolios_pb2_grpc.PortfoliosServicer,
+                      securities_pb2_grpc.SecuritiesServicer, stops_pb2_grpc.StopsServicer):
+    """Локальный сервер, заменяющий Finam Trade API для замеров пропускной способности и задержек клиента
+
+    Построен на сгенерированных сервисах. Отдает синтетические стаканы и сделки по подписанным инструментам с заданным темпом,
+    принимает заявки и стоп-заявки с заданной задержкой ответа. Выставление, отмена и исполнение заявок отдаются
+    событиями заявок и сделок в потоки, подписанные на счет (subscribe_order_trade). Подключение: FinamPy(token, server=server.address, credentials=grpc.local_channel_credentials())
+    """
+
+    def __init__(self, port=0, events_rate=10000, trade_ratio=0.1, depth=10, latency=0.0, securities=1000, access_token=None, max_workers=32, seed=0,
+                 fill_delay=None):
+        """Инициализация
+
+        :param int port: Порт сервера. 0 - любой свободный
+        :param float events_rate: Количество событий в секунду на каждый поток событий. None - как можно быстрее
+        :param float trade_ratio: Доля сделок среди рыночных событий
+        :param int depth: Количество уровней стакана с каждой стороны
+        :param float latency: Задержка ответа на вызовы запрос/ответ, с
+        :param int securities: Количество инструментов в справочнике
+        :param str access_token: Торговый токен доступа. None - не проверять
+        :param int max_workers: Количество потоков обработки вызовов
+        :param int seed: Начальное значение генератора цен
+        :param float fill_delay: Через сколько секунд после выставления заявка исполняется целиком одной сделкой. None - заявки не исполняются
+        """
+        self.events_rate = events_rate  # Темп событий
+        self.trade_ratio = trade_ratio  # Доля сделок
+        self.depth = depth  # Количество уровней стакана
+        self.latency = latency  # Задержка ответа
+        self.securities = GetSecuritiesResult(securities=[Security(
+            code=f'S{i:05}', board='TQBR', market=Market.MARKET_STOCK, decimals=2, lot_size=10, min_step=1, currency='RUB',
+            instrument_code=f'S{i:05}', short_name=f'Инструмент {i}', ticker=f'S{i:05}', lot_divider=1) for i in range(securities)])  # Справочник
+        self.access_token = access_token  # Торговый токен доступа
+        self.seed = seed  # Начальное значение генератора цен
+        self.transaction_ids = count(1)  # Номера транзакций
+        self.order_nos = count(1)  # Номера заявок
+        self.trade_nos = count(1)  # Номера сделок
+        self.stop_ids = count(1)  # Номера стоп-заявок
+        self.orders: dict[int, Order] = {}  # Заявки по номеру транзакции
+        self.stops: dict[int, Stop] = {}  # Стоп-заявки по номеру
+        self.fill_delay = fill_delay  # Задержка исполнения заявок
+        self.order_streams: dict[SimpleQueue, object] = {}  # Подписки на заявки и сделки по очереди потока событий
+        self.lock = Lock()  # Блокировка заявок
+        self.server = grpc.server(ThreadPoolExecutor(max_workers))  # Сервер gRPC
+        for add_servicer in (events_pb2_grpc.add_EventsServicer_to_server, orders_pb2_grpc.add_OrdersServicer_to_server,
+                             portfolios_pb2_grpc.add_PortfoliosServicer_to_server, securities_pb2_grpc.add_SecuritiesServicer_to_server,
+                             stops_pb2_grpc.add_StopsServicer_to_server):  # Регистрируем все сервисы
+            add_servicer(self, self.server)
+        self.port = self.server.add_secure_port(f'localhost:{port}', grpc.local_server_credentials())  # Порт сервера
+        self.address = f'localhost:{self.port}'  # Адрес для подключения клиента
+
+    def start(self):
+        """Запуск сервера"""
+        self.server.start()
+        return self
+
+    def stop(self, grace=None):
+        """Остановка сервера
+
+        :param float grace: Время на завершение вызовов, с. None - прервать сразу
+        """
+        self.server.stop(grace)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @staticmethod
+    def run_subprocess(port, **options) -> Popen:
+        """Запуск сервера в отдельном процессе, чтобы сервер и клиент не делили GIL
+
+        :param int port: Порт сервера
+        :param options: Параметры сервера: events_rate, trade_ratio, depth, latency, securities, access_token, fill_delay
+        :return: Процесс сервера. Адрес для подключения f'localhost:{port}'
+        """
+        package_dir = os.path.dirname(os.path.abspath(__file__))  # Папка пакета
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (os.path.dirname(package_dir), os.environ.get('PYTHONPATH')))))
+        args = [sys.executable, '-m', f'{os.path.basename(package_dir)}.FakeFinamServer', '--port', str(port)]
+        for name, value in options.items():  # Параметры сервера
+            args += [f'--{name}', str(value)]
+        return Popen(args, env=env)
+
+    # Служебные функции
+
+    def call(self, context):
+        """Проверка токена и задержка ответа на вызов
+
+        :param context: Контекст вызова
+        """
+        if self.access_token and dict(context.invocation_metadata()).get('x-api-key') != self.access_token:  # Если токен не тот
+            context.abort(grpc.StatusCode.UNAUTHENTICATED, 'Неверный токен')
+        if self.latency:  # Если задана задержка
+            sleep(self.latency)
+
+    def publish(self, client_id, event: Event, kind):
+        """Передача события заявки или сделки в потоки событий, подписанные на счет. Вызывается под блокировкой заявок
+
+        :param str client_id: Идентификатор торгового счёта
+        :param Event event: Событие
+        :param str kind: Вид события: orders - заявка, trades - сделка
+        """
+        for queue, subscription in self.order_streams.items():  # Пробегаемся по всем подпискам на заявки и сделки
+            if getattr(subscription, f'include_{kind}') and (not subscription.client_ids or client_id in subscription.client_ids):
+                queue.put(event)
+
+    def publish_order(self, order: Order):
+        """Передача состояния заявки в подписанные потоки событий. Вызывается под блокировкой заявок
+
+        :param Order order: Заявка
+        """
+        self.publish(order.client_id, Event(order=OrderEvent(**{field.name: getattr(order, field.name) for field in OrderEvent.DESCRIPTOR.fields})), 'orders')
+
+    def fill_order(self, transaction_id):
+        """Исполнение заявки целиком одной сделкой
+
+        :param int transaction_id: Номер транзакции
+        """
+        with self.lock:
+            order = self.orders.get(transaction_id)
+            if order is None or order.status != OrderStatus.ORDER_STATUS_ACTIVE:  # Если заявку успели отменить
+                return
+            self.publish(order.client_id, Event(trade=TradeEvent(
+                security_code=order.security_code, trade_no=next(self.trade_nos), order_no=order.order_no, client_id=order.client_id,
+                quantity=order.balance, price=order.price, value=order.price * order.balance, buy_sell=order.buy_sell)), 'trades')
+            order.balance = 0
+            order.status = OrderStatus.ORDER_STATUS_MATCHED
+            self.publish_order(order)
+
+    # Events
+
+    def GetEvents(self, request_iterator, context):
+        requests = SimpleQueue()  # Запросы на подписку, прочитанные из потока
+
+        def read_requests():
+            """Чтение запросов на подписку"""
+            try:
+                for request in request_iterator:
+                    requests.put(request)
+            except grpc.RpcError:  # Поток закрыт клиентом
+                pass
+        self.call(context)
+        Thread(target=read_requests, daemon=True).start()
+        try:
+            yield from self.events(requests, context)
+        finally:
+            with self.lock:
+                self.order_streams.pop(requests, None)  # Поток закрыт, события заявок больше не нужны
+
+    def events(self, requests: SimpleQueue, context):
+        """События потока: ответы на подписку, события заявок и сделок счетов, синтетические стаканы и сделки
+
+        :param SimpleQueue requests: Очередь потока: запросы на подписку и события заявок и сделок
+        :param context: Контекст вызова
+        """
+        random = Random(self.seed)  # Генератор цен этого потока
+        prices = {}  # Цены подписанных инструментов по (режим торгов, тикер)
+        client_ids = []  # Счета подписки на заявки и сделки
+        interval = 1 / self.events_rate if self.events_rate else 0  # Интервал между событиями, с
+        next_time = monotonic()  # Время следующего события
+        while context.is_active():  # Пока клиент не закрыл поток
+            try:
+                request = requests.get(timeout=0.1) if not prices else requests.get_nowait()  # Без подписок ждем запрос
+            except Empty:
+                request = None
+            if isinstance(request, Event):  # Если это событие заявки или сделки
+                yield request
+                continue
+            if request is not None:  # Если пришел запрос на подписку/отписку
+                kind = request.WhichOneof('payload')
+                payload = getattr(request, kind)
+                if kind == 'order_book_subscribe_request':
+                    prices[(payload.security_board, payload.security_code)] = 100.0
+                elif kind == 'order_book_unsubscribe_request':
+                    prices.pop((payload.security_board, payload.security_code), None)
+                elif kind == 'order_trade_subscribe_request':
+                    client_ids = list(payload.client_ids)
+                    with self.lock:
+                        self.order_streams[requests] = payload
+                elif kind == 'order_trade_unsubscribe_request':
+                    with self.lock:
+                        self.order_streams.pop(requests, None)
+                yield Event(response=ResponseEvent(request_id=payload.request_id, success=True))
+                continue
+            if not prices:  # Если подписок на стаканы нет
+                continue
+            board, code = key = random.choice(list(prices))  # Инструмент события
+            price = prices[key] = round(max(1.0, prices[key] + random.choice((-0.01, 0.0, 0.01))), 2)  # Случайное блуждание цены
+            if random.random() < self.trade_ratio:  # Сделка
+                yield Event(trade=TradeEvent(security_code=code, trade_no=next(self.trade_nos), order_no=0, client_id=client_ids[0] if client_ids else '',
+                                             quantity=random.randint(1, 100), price=price, value=price * 10, buy_sell=random.randint(1, 2)))
+            else:  # Стакан
+                yield Event(order_book=OrderBookEvent(security_code=code, security_board=board,
+                                                      asks=[OrderBookRow(price=round(price + 0.01 * (i + 1), 2), quantity=10 * (i + 1)) for i in range(self.depth)],
+                                                      bids=[OrderBookRow(price=round(price - 0.01 * (i + 1), 2), quantity=10 * (i + 1)) for i in range(self.depth)]))
+            if interval:  # Если задан темп событий
+                next_time += interval
+                delay = next_time - monotonic()
+                if delay > 0.001:  # Спим только ощутимые интервалы, остальное отдаем пачкой
+                    sleep(delay)
+                elif delay < -1:  # Если сильно отстали (клиент не успевает), то не пытаемся догнать
+                    next_time = monotonic()
+
+    # Orders
+
+    def GetOrders(self, request, context):
+        self.call(context)
+        with self.lock:
+            orders = [order for order in self.orders.values() if order.client_id == request.client_id]
+        return GetOrdersResult(client_id=request.client_id, orders=orders)
+
+    def NewOrder(self, request, context):
+        self.call(context)
+        transaction_id = next(self.transaction_ids)
+        with self.lock:
+            order = self.orders[transaction_id] = Order(
+                order_no=next(self.order_nos), transaction_id=transaction_id, security_code=request.security_code, security_board=request.security_board,
+                client_id=request.client_id, status=OrderStatus.ORDER_STATUS_ACTIVE, buy_sell=request.buy_sell, price=request.price.value,
+                quantity=request.quantity, balance=request.quantity)
+            self.publish_order(order)
+        if self.fill_delay is not None:  # Если заявки исполняются
+            Timer(self.fill_delay, self.fill_order, (transaction_id,)).start()
+        return NewOrderResult(client_id=request.client_id, transaction_id=transaction_id, security_code=request.security_code)
+
+    def CancelOrder(self, request, context):
+        self.call(context)
+        with self.lock:
+            order = self.orders.get(request.transaction_id)
+            if order is None:  # Если заявки нет
+                context.abort(grpc.StatusCode.NOT_FOUND, 'Заявка не найдена')
+            if order.status == OrderStatus.ORDER_STATUS_ACTIVE:  # Отменить можно только активную заявку
+                order.status = OrderStatus.ORDER_STATUS_CANCELLED
+                self.publish_order(order)
+        return CancelOrderResult(client_id=request.client_id, transaction_id=request.transaction_id)
+
+    # Portfolios
+
+    def GetPortfolio(self, request, context):
+        self.call(context)
+        return GetPortfolioResult(client_id=request.client_id, content=request.content, equity=1_000_000, balance=1_000_000,
+                                  positions=[PositionRow(security_code='S00000', market=Market.MARKET_STOCK, balance=10, current_price=100, average_price=99, currency='RUB')],
+                                  money=[MoneyRow(market=Market.MARKET_STOCK, currency='RUB', balance=999_000)])
+
+    # Securities
+
+    def GetSecurities(self, request, context):
+        self.call(context)
+        return self.securities
+
+    # Stops
+
+    def GetStops(self, request, context):
+        self.call(context)
+        with self.lock:
+            stops = [stop for stop in self.stops.values() if stop.client_id == request.client_id]
+        return GetStopsResult(client_id=request.client_id, stops=stops)
+
+    def NewStop(self, request, context):
+        self.call(context)
+        stop_id = next(self.stop_ids)
+        with self.lock:
+            self.stops[stop_id] = Stop(stop_id=stop_id, security_code=request.security_code, security_board=request.security_board, client_id=request.client_id,
+                                       buy_sell=request.buy_sell, status=StopStatus.STOP_STATUS_ACTIVE, stop_loss=request.stop_loss, take_profit=request.take_profit)
+        return NewStopResult(client_id=request.client_id, stop_id=stop_id, security_code=request.security_code, security_board=request.security_board)
+
+    def CancelStop(self, request, context):
+        self.call(context)
+        with self.lock:
+            stop = self.stops.get(request.stop_id)
+            if stop is None:  # Если стоп-заявки нет
+                context.abort(grpc.StatusCode.NOT_FOUND, 'Стоп-заявка не найдена')
+            stop.status = StopStatus.STOP_STATUS_CANCELLED
+        return CancelStopResult(client_id=request.client_id, stop_id=request.stop_id)
+
+
+if __name__ == '__main__':  # Запуск сервера в отдельном процессе: python -m FinamPy.FakeFinamServer --port 50051
+    parser = ArgumentParser(description='Локальный сервер, заменяющий Finam Trade API')
+    parser.add_argument('--port', type=int, default=50051, help='Порт сервера')
+    parser.add_argument('--events_rate', type=float, default=10000, help='Событий в секунду на поток событий. 0 - как можно быстрее')
+    parser.add_argument('--trade_ratio', type=float, default=0.1, help='Доля сделок среди рыночных событий')
+    parser.add_argument('--depth', type=int, default=10, help='Количество уровней стакана')
+    parser.add_argument('--latency', type=float, default=0.0, help='Задержка ответа на вызовы, с')
+    parser.add_argument('--securities', type=int, default=1000, help='Количество инструментов в справочнике')
+    parser.add_argument('--access_token', default=None, help='Торговый токен доступа')
+    parser.add_argument('--fill_delay', type=float, default=None, help='Задержка исполнения заявок, с. Без параметра заявки не исполняются')
+    arguments = parser.parse_args()
+    fake_server = FakeFinamServer(**vars(arguments)).start()
+    print(f'Сервер запущен: {fake_server.address}', flush=True)
+    fake_server.server.wait_for_termination()
@@ -1,11 +1,13 @@
 from datetime import datetime
 from typing import Union  # Объединение типов
 from uuid import uuid4  # Номера подписок должны быть уникальными во времени и пространстве
-from pytz import timezone, utc  # Работаем с временнОй зоной и UTC
-from threading import Thread  # Поток обработки подписок
+from pytz import timezone  # Работаем с временнОй зоной
+from threading import Thread, Lock, BoundedSemaphore  # Поток обработки подписок, блокировка реестра подписок, ограничение параллельных вызовов
 from queue import SimpleQueue  # Очередь подписок/отписок
+from random import uniform  # Случайная составляющая задержки переподключения
+from time import monotonic, sleep, time, perf_counter  # Контроль потока событий и задержка переподключения, замер вызовов
 
-from grpc import ssl_channel_credentials, secure_channel, RpcError  # Защищенный канал
+from grpc import ssl_channel_credentials, secure_channel, RpcError, ChannelCredentials, Compression, StatusCode  # Защищенный канал, коды ошибок
 from google.protobuf.timestamp_pb2 import Timestamp  # Представление времени
 from google.protobuf.wrappers_pb2 import DoubleValue  # Представление цены
 from .proto.tradeapi.v1 import common_pb2 as common  # Покупка/продажа
@@ -26,6 +28,28 @@ from .grpc.tradeapi.v1.securities_pb2_grpc import SecuritiesStub  # Сервис
 from .proto.tradeapi.v1.stops_pb2 import (
     GetStopsRequest, GetStopsResult, StopLoss, TakeProfit, NewStopRequest, NewStopResult, CancelStopRequest, CancelStopResult)   # Стоп заявки
 from .grpc.tradeapi.v1.stops_pb2_grpc import StopsStub  # Сервис стоп заявок
+from .EventDispatcher import EventDispatcher  # Диспетчер событий подписок
+from .EventBuffer import EventBuffer  # Буфер событий между потоком чтения подписок и потоком обработчиков
+from .SecuritiesCache import SecuritiesCache  # Справочник инструментов с хранением на диске
+from .EventRecorder import EventRecorder  # Запись событий подписок в двоичный журнал
+from .Metrics import Metrics  # Замеры задержек вызовов и обработки событий
+from .MskTime import MskTime  # Перевод времени UTC в московское
+from .AccountsSnapshot import AccountSnapshot, AccountsSnapshot  # Снимок счетов
+from .RequestScheduler import RequestScheduler  # Ограничение частоты запросов с приоритетами
+
+
+def event_handler_property(event_type):
+    """Свойство основного обработчика события, хранящегося в диспетчере событий
+
+    :param str event_type: Тип события
+    """
+    def getter(self):
+        return self.dispatcher.handlers[event_type] or self.default_handler  # Если обработчик не задан, то возвращаем обработчик по умолчанию
+
+    def setter(self, handler):
+        self.dispatcher.set_handler(event_type, None if handler == self.default_handler else handler)  # Обработчик по умолчанию не вызываем
+
+    return property(getter, setter)
 
 
 class FinamPy:
@@ -34,6 +58,7 @@ class FinamPy:
     Генерация кода в папках grpc/proto осуществлена из proto контрактов: https://github.com/FinamWeb/trade-api-docs/tree/master/contracts
     """
     tz_msk = timezone('Europe/Moscow')  # Время UTC в Alor OpenAPI будем приводить к московскому времени
+    msk_time = MskTime(tz_msk)  # Перевод времени UTC в московское с запоминанием смещения
     server = 'trade-api.finam.ru'  # Сервер для исполнения вызовов
     markets = {Market.MARKET_STOCK: 'Фондовый рынок Московской Биржи',
                Market.MARKET_FORTS: 'Срочный рынок Московской Биржи',
@@ -43,6 +68,13 @@ class FinamPy:
                Market.MARKET_BONDS: 'Долговой рынок Московской Биржи',
                Market.MARKET_OPTIONS: 'Рынок опционов Московской Биржи'}  # Рынки
 
+    # События Finam Trade API
+    on_order = event_handler_property('order')  # Заявка
+    on_trade = event_handler_property('trade')  # Сделка
+    on_order_book = event_handler_property('order_book')  # Стакан
+    on_portfolio = event_handler_property('portfolio')  # Портфель
+    on_response = event_handler_property('response')  # Результат выполнения запроса
+
     def default_handler(self, event: Union[OrderEvent, TradeEvent, OrderBookEvent, PortfolioEvent, ResponseEvent]):
         """Пустой обработчик события по умолчанию. Его можно заменить на пользовательский"""
         pass
@@ -53,71 +85,345 @@ class FinamPy:
         :param datetime dt: Время UTC
         :return: Московское время
         """
-        dt_msk = utc.localize(dt).astimezone(self.tz_msk)  # Переводим UTC в МСК
-        return dt_msk.replace(tzinfo=None)  # Убираем временнУю зону
+        return self.msk_time.utc_to_msk_datetime(dt)  # Переводим UTC в МСК по запомненному смещению
+
+    def timestamps_to_msk_datetime64(self, timestamps):
+        """Перевод последовательности времени UTC из ответов и событий в массив московского времени
 
-    def request_iterator(self):
-        """Генератор запросов на подписку/отписку"""
+        :param timestamps: Последовательность Timestamp, например, [order.created_at for order in orders.orders]
+        :return: Московское время, массив numpy datetime64[ns]
+        """
+        return self.msk_time.timestamps_to_msk_datetime64(timestamps)
+
+    def request_iterator(self, queue: SimpleQueue):
+        """Генератор запросов на подписку/отписку
+
+        :param SimpleQueue queue: Очередь запросов потока событий. None в очереди завершает генератор
+        """
         while True:  # Будем пытаться читать из очереди до закрытии канала
-            yield self.subscription_queue.get()  # Возврат из этой функции. При повторном ее вызове исполнение продолжится с этой строки
+            request = queue.get()
+            if request is None:  # Если поток событий переподключается или закрывается
+                return  # то завершаем генератор
+            yield request  # Возврат из этой функции. При повторном ее вызове исполнение продолжится с этой строки
+            if self.reconnect_started is not None:  # gRPC просит следующий запрос, когда предыдущий отправлен. Значит, новый поток событий установлен
+                self.on_stream_established(queue)
 
-    def subscribtions_handler(self):
-        """Поток обработки подписок"""
-        events = self.events_stub.GetEvents(request_iterator=self.request_iterator(), metadata=self.metadata)  # Получаем значения подписок
-        try:
+    def read_events(self, events):
+        """Чтение событий подписок до закрытия потока событий
+
+        :param events: Поток событий GetEvents
+        """
+        self.last_event_time = monotonic()  # Поток событий открыт
+        if self.recorder:  # Если события записываются в журнал
+            record = self.recorder.record  # Запись сообщения в журнал
+            dispatch = self.dispatcher.dispatch  # Передача события обработчикам по типу события
+            put = self.event_buffer.put if self.event_buffer else None  # Постановка события в буфер
+            for data in events:  # Поток событий без разбора отдает сообщения в байтах
+                self.on_event_received()
+                record(data)  # Записываем сообщение в том виде, как оно пришло
+                event = Event.FromString(data)  # Разбираем сообщение
+                if put:  # Если события обрабатываются в отдельном потоке
+                    event_type = event.WhichOneof('payload')  # Тип события
+                    if event_type:  # Если событие не пустое
+                        put(event_type, getattr(event, event_type))
+                else:  # Если события обрабатываются в потоке подписок
+                    try:
+                        dispatch(event)
+                    except Exception as e:  # Исключение в обработчике не должно останавливать поток подписок
+                        self.handler_error(e)
+        elif self.event_buffer:  # Если события обрабатываются в отдельном потоке
+            put = self.event_buffer.put  # то только кладем их в буфер
+            for event in events:  # Пробегаемся по значениям подписок до закрытия канала
+                self.on_event_received()
+                event_type = event.WhichOneof('payload')  # Тип события
+                if event_type:  # Если событие не пустое
+                    put(event_type, getattr(event, event_type))
+        else:  # Если события обрабатываются в потоке подписок
+            dispatch = self.dispatcher.dispatch  # Передача события обработчикам по типу события
             for event in events:  # Пробегаемся по значениям подписок до закрытия канала
-                e: Event = event  # Приводим пришедшее значение к подпискам
-                if e.order != OrderEvent():  # Если пришло событие с заявкой
-                    self.on_order(e.order)
-                if e.trade != TradeEvent():  # Если пришло событие со сделкой
-                    self.on_trade(e.trade)
-                if e.order_book != OrderBookEvent():  # Если пришло событие стакана
-                    self.on_order_book(e.order_book)
-                if e.portfolio != PortfolioEvent():  # Если пришло событие портфеля
-                    self.on_portfolio(e.portfolio)
-                if e.response != ResponseEvent:  # Если пришло событие результата выполнения запроса
-                    self.on_response(e.response)
-        except RpcError:  # При закрытии канала попадем на эту ошибку (grpc._channel._MultiThreadedRendezvous)
-            pass  # Все в порядке, ничего делать не нужно
-
-    def __init__(self, access_token):
+                self.on_event_received()
+                try:
+                    dispatch(event)
+                except Exception as e:  # Исключение в обработчике не должно останавливать поток подписок
+                    self.handler_error(e)
+
+    def handler_error(self, error: Exception):
+        """Исключение в обработчике события, вызванном из потока подписок. Учитывается и передается в on_handler_error
+
+        :param Exception error: Исключение
+        """
+        self.handler_errors += 1
+        self.last_handler_error = error
+        try:
+            self.on_handler_error(error)
+        except Exception:  # Ошибка в обработчике ошибок тоже не должна останавливать поток подписок
+            pass
+
+    def on_event_received(self):
+        """Отметка о приходе события. После переподключения фиксирует окончание окна без событий"""
+        self.last_event_time = monotonic()  # Время прихода последнего события для контроля зависания
+        if self.gap_open:  # Если это первое событие после разрыва
+            self.on_stream_established(self.subscription_queue)  # Поток событий мог восстановиться без запросов подписок
+            self.gap_open = False
+            self.reconnect_stats['last_gap'] = (self.gap_start, time())  # Окно, в котором события не приходили: последнее событие до разрыва - первое после
+
+    def on_stream_established(self, queue: SimpleQueue):
+        """Поток событий после переподключения установлен. Сбрасывает задержку переподключения и сообщает о переподключении
+
+        :param SimpleQueue queue: Очередь запросов установленного потока событий
+        """
+        with self.reconnect_lock:  # Вызывается из потока отправки запросов gRPC и из потока подписок
+            if self.reconnect_started is None or queue is not self.subscription_queue:  # Если о переподключении уже сообщили или поток событий устарел
+                return  # то ничего не делаем
+            duration = monotonic() - self.reconnect_started  # Время от обнаружения разрыва до установки нового потока событий
+            self.reconnect_started = None
+            self.reconnect_attempt = 0  # Сбрасываем задержку переподключения
+        self.reconnect_stats['last_duration'] = duration
+        self.reconnect_stats['max_duration'] = max(self.reconnect_stats['max_duration'], duration)
+        self.on_reconnect({'duration': duration, 'gap_start': self.gap_start, 'reconnects': self.reconnect_stats['reconnects']})
+
+    def subscribtions_handler(self):
+        """Поток обработки подписок. При обрыве потока событий переподключается и повторяет все активные подписки"""
+        while not self.closing:  # Пока провайдер не закрывается
+            with self.subscriptions_lock:  # Новые подписки попадут либо в реестр до повтора, либо в новую очередь
+                queue = SimpleQueue()  # Очередь запросов нового потока событий
+                for request in self.subscriptions.values():  # Повторяем все активные подписки
+                    queue.put(request)
+                self.subscription_queue = queue
+            opened = monotonic()  # Время открытия потока событий
+            try:
+                get_events = self.get_events_raw if self.recorder else self.events_stub.GetEvents  # При записи в журнал сообщения получаем без разбора
+                self.events = get_events(request_iterator=self.request_iterator(queue), metadata=self.metadata)  # Получаем значения подписок
+                self.read_events(self.events)
+            except (RpcError, ValueError):  # При обрыве или закрытии канала попадем на эти ошибки (grpc._channel._MultiThreadedRendezvous / закрытый канал)
+                pass
+            queue.put(None)  # Завершаем генератор запросов старого потока событий
+            with self.subscriptions_lock:  # Старый поток событий больше не текущий. Подписки до переподключения повторятся из реестра
+                self.subscription_queue = SimpleQueue()
+            if self.closing:  # Если провайдер закрывается
+                break  # то переподключаться не нужно
+            with self.reconnect_lock:
+                if self.reconnect_started is None:  # Если разрыв только что обнаружен
+                    self.reconnect_started = monotonic()
+                    if not self.gap_open:  # Если после прошлого разрыва события уже приходили
+                        self.gap_open = True
+                        self.gap_start = time() - (self.reconnect_started - self.last_event_time)  # Время последнего события до разрыва
+                if monotonic() - opened > self.reconnect_max_delay:  # Если поток событий долго работал без ошибок (например, без подписок)
+                    self.reconnect_attempt = 0  # то переподключаемся без накопленной задержки
+            self.reconnect_stats['reconnects'] += 1
+            delay = min(self.reconnect_max_delay, self.reconnect_delay * 2 ** self.reconnect_attempt)  # Экспоненциальная задержка
+            self.reconnect_attempt += 1
+            sleep(uniform(delay / 2, delay))  # Случайная составляющая, чтобы клиенты не переподключались одновременно
+
+    def watchdog_handler(self):
+        """Поток контроля зависания потока событий. Если события не приходят дольше stall_timeout, то поток событий переоткрывается"""
+        while not self.closing:  # Пока провайдер не закрывается
+            sleep(self.stall_timeout / 4)
+            if self.events is not None and monotonic() - self.last_event_time > self.stall_timeout:  # Если события давно не приходили
+                self.reconnect_stats['stalls'] += 1
+                self.last_event_time = monotonic()  # Следующая проверка - через stall_timeout
+                self.events.cancel()  # Отменяем поток событий. Поток подписок переподключится
+
+    def __init__(self, access_token, event_buffer: EventBuffer = None,
+                 keepalive_time_ms=None, keepalive_timeout_ms=None, stall_timeout=None, reconnect_delay=0.1, reconnect_max_delay=10,
+                 max_message_length=None, flow_control_window=None, bdp_probe=None, compression: Compression = None,
+                 separate_channels=False, channel_options=None, server=None, credentials: ChannelCredentials = None, recorder: EventRecorder = None,
+                 metrics: Metrics = None, scheduler: RequestScheduler = None):
         """Инициализация
 
         :param str access_token: Торговый токен доступа
+        :param EventBuffer event_buffer: Буфер событий. Если задан, то обработчики вызываются из отдельного потока, а не из потока подписок
+            EventBuffer.conflation(max_rate) - склейка стаканов: не чаще max_rate стаканов в секунду по каждому инструменту
+        :param int keepalive_time_ms: Период проверки соединения (keepalive ping), мс. None - без проверки соединения.
+            Период должен быть не меньше разрешенного сервером, иначе сервер закроет соединение (GOAWAY too_many_pings)
+        :param int keepalive_timeout_ms: Время ожидания ответа на проверку соединения, мс. Без ответа соединение считается разорванным. None - по умолчанию gRPC
+        :param float stall_timeout: Если события не приходят дольше этого времени, с, то поток событий переоткрывается. None - не контролировать
+        :param float reconnect_delay: Начальная задержка переподключения потока событий, с. Удваивается с каждой неудачной попыткой
+        :param float reconnect_max_delay: Максимальная задержка переподключения потока событий, с
+        :param int max_message_length: Максимальный размер принимаемого и отправляемого сообщения, байт. None - по умолчанию gRPC (прием 4 МБ)
+        :param int flow_control_window: Окно управления потоком HTTP/2 на один вызов, байт. None - по умолчанию gRPC
+        :param bool bdp_probe: Динамический подбор окна управления потоком по пропускной способности. None - по умолчанию gRPC
+        :param Compression compression: Сжатие сообщений. None - без сжатия
+        :param bool separate_channels: Поток событий в отдельном канале (своем соединении HTTP/2),
+            чтобы всплеск стаканов не задерживал выставление заявок
+        :param list channel_options: Дополнительные параметры каналов gRPC [(имя, значение), ...]
+        :param str server: Сервер для исполнения вызовов. None - сервер Finam Trade API
+        :param ChannelCredentials credentials: Учетные данные канала. None - SSL. Для локального сервера grpc.local_channel_credentials()
+        :param EventRecorder recorder: Запись всех событий подписок в двоичный журнал. None - не записывать
+        :param Metrics metrics: Замеры задержек вызовов и времени обработки событий. None - без замеров
+        :param RequestScheduler scheduler: Ограничение частоты запросов с приоритетами, может быть общим для нескольких клиентов. None - без ограничения
         """
         self.metadata = [('x-api-key', access_token)]  # Торговый токен доступа
-        self.channel = secure_channel(self.server, ssl_channel_credentials())  # Защищенный канал
+        if server:  # Если задан сервер
+            self.server = server  # то работаем с ним
+        credentials = credentials or ssl_channel_credentials()  # Учетные данные канала
+        options = []  # Параметры каналов
+        if keepalive_time_ms:  # Если задана проверка соединения. Проверки без вызовов и без данных ограничиваются по умолчанию gRPC
+            options.append(('grpc.keepalive_time_ms', keepalive_time_ms))
+            if keepalive_timeout_ms:  # Если задано время ожидания ответа на проверку
+                options.append(('grpc.keepalive_timeout_ms', keepalive_timeout_ms))
+        if max_message_length:  # Если задан максимальный размер сообщения
+            options += [('grpc.max_receive_message_length', max_message_length), ('grpc.max_send_message_length', max_message_length)]
+        if flow_control_window:  # Если задано окно управления потоком
+            options.append(('grpc.http2.lookahead_bytes', flow_control_window))
+        if bdp_probe is not None:  # Если задан подбор окна управления потоком
+            options.append(('grpc.http2.bdp_probe', int(bdp_probe)))
+        options += channel_options or []  # Дополнительные параметры каналов
+        self.channel = secure_channel(self.server, credentials, options, compression)  # Защищенный канал
+        if separate_channels:  # Если поток событий в отдельном канале
+            events_options = options + [('grpc.use_local_subchannel_pool', 1)]  # Свое соединение, а не общее с каналом запросов
+            self.events_channel = secure_channel(self.server, credentials, events_options, compression)  # Канал потока событий
+        else:  # Если все в одном канале
+            self.events_channel = self.channel  # то поток событий идет по каналу запросов
 
         # Сервисы
-        self.events_stub = EventsStub(self.channel)  # Сервис событий
+        self.events_stub = EventsStub(self.events_channel)  # Сервис событий
+        self.get_events_raw = self.events_channel.stream_stream(
+            '/grpc.tradeapi.v1.Events/GetEvents', request_serializer=SubscriptionRequest.SerializeToString)  # Поток событий, отдающий сообщения в байтах
         self.orders_stub = OrdersStub(self.channel)  # Сервис заявок
         self.portfolios_stub = PortfoliosStub(self.channel)  # Сервис портфелей
         self.securities_stub = SecuritiesStub(self.channel)  # Сервис тикеров
         self.stops_stub = StopsStub(self.channel)  # Сервис стоп заявок
-
-        # События Finam Trade API
-        self.on_order = self.default_handler  # Заявка
-        self.on_trade = self.default_handler  # Сделка
-        self.on_order_book = self.default_handler  # Стакан
-        self.on_portfolio = self.default_handler  # Портфель
-        self.on_response = self.default_handler  # Результат выполнения запроса
-
-        self.subscription_queue: SimpleQueue[SubscriptionRequest] = SimpleQueue()  # Буфер команд на подписку/отписку
+        self.method_names = {method: name for stub in (self.orders_stub, self.portfolios_stub, self.securities_stub, self.stops_stub)
+                             for name, method in vars(stub).items()}  # Имена функций сервисов для замеров
+        self.scheduler = scheduler  # Ограничение частоты запросов
+        self.method_classes = {method: RequestScheduler.grpc_class(name) for method, name in self.method_names.items()}  # Классы запросов функций: cancel, new, query
+
+        # События Finam Trade API. Обработчики on_order, on_trade, on_order_book, on_portfolio, on_response хранятся в диспетчере
+        self.dispatcher = EventDispatcher()  # Диспетчер событий. Несколько слушателей на тип события и маршрутизация по инструменту
+        self.event_buffer = event_buffer  # Буфер событий
+        self.recorder = recorder  # Запись событий в журнал
+        self.metrics = metrics  # Замеры
+        self.dispatcher.set_metrics(metrics)  # Замеры обработки событий включаем до запуска буфера событий
+        if self.event_buffer:  # Если задан буфер событий
+            self.event_buffer.start(self.dispatcher)  # то запускаем поток обработчиков
+
+        self.securities_cache = SecuritiesCache(self.get_securities, source=self.server)  # Справочник инструментов. Загружается при первом обращении
+
+        # Переподключение потока событий
+        self.on_reconnect = self.default_handler  # Поток событий восстановлен. Получает справочник с длительностью переподключения и началом окна без событий
+        self.stall_timeout = stall_timeout  # Максимальное время без событий, с
+        self.reconnect_delay = reconnect_delay  # Начальная задержка переподключения, с
+        self.reconnect_max_delay = reconnect_max_delay  # Максимальная задержка переподключения, с
+        self.reconnect_attempt = 0  # Номер попытки переподключения
+        self.reconnect_started: Union[float, None] = None  # Время обнаружения разрыва. None - поток событий работает
+        self.reconnect_lock = Lock()  # Блокировка состояния переподключения
+        self.gap_start = 0.0  # Время последнего события до разрыва
+        self.gap_open = False  # После разрыва еще не пришло ни одного события
+        self.last_event_time = monotonic()  # Время прихода последнего события
+        self.reconnect_stats = {'reconnects': 0, 'stalls': 0, 'last_duration': None, 'max_duration': 0.0, 'last_gap': None}  # Статистика переподключений
+        self.on_handler_error = self.default_handler  # Исключение в обработчике события. Получает исключение
+        self.handler_errors = 0  # Количество исключений в обработчиках, вызванных из потока подписок. При буфере событий - в EventBuffer.errors
+        self.last_handler_error: Union[Exception, None] = None  # Последнее исключение в обработчике
+        self.closing = False  # Провайдер закрывается
+        self.events = None  # Текущий поток событий GetEvents
+
+        self.subscriptions: dict[tuple, SubscriptionRequest] = {}  # Реестр активных подписок. Повторяются при переподключении
+        self.subscriptions_lock = Lock()  # Блокировка реестра подписок и очереди запросов
+        self.subscription_queue: SimpleQueue[Union[SubscriptionRequest, None]] = SimpleQueue()  # Буфер команд на подписку/отписку текущего потока событий
         self.subscriptions_thread = Thread(target=self.subscribtions_handler, name='SubscriptionsThread')  # Создаем поток обработки подписок
         self.subscriptions_thread.start()  # Запускаем поток
+        if self.stall_timeout:  # Если контролируем зависание потока событий
+            Thread(target=self.watchdog_handler, name='SubscriptionsWatchdogThread', daemon=True).start()  # то запускаем поток контроля
 
     # Запросы
 
     def call_function(self, func, request):
         """Вызов функции"""
+        if self.scheduler:  # Если частота запросов ограничена
+            self.scheduler.acquire(self.method_classes.get(func, 'query'))  # то ждем своей очереди. Задержка в очереди не входит в замер вызова
+        if self.metrics:  # Если замеры включены
+            return self.call_function_measured(func, request)  # то вызываем функцию с замером
         try:  # Пытаемся
             response, call = func.with_call(request=request, metadata=self.metadata)  # вызвать функцию
             return response  # и вернуть ответ
         except RpcError:  # Если получили ошибку канала
             return None  # то возвращаем пустое значение
 
+    def call_function_measured(self, func, request):
+        """Вызов функции с замером задержки и учетом ошибок"""
+        name = self.method_names.get(func, str(func))  # Имя функции сервиса
+        start = perf_counter()  # Начало вызова
+        try:  # Пытаемся
+            response, call = func.with_call(request=request, metadata=self.metadata)  # вызвать функцию
+            self.metrics.observe_rpc(name, perf_counter() - start)
+            return response  # и вернуть ответ
+        except RpcError as e:  # Если получили ошибку канала
+            self.metrics.observe_rpc(name, perf_counter() - start, e.code().name)  # Код ошибки gRPC
+            return None  # то возвращаем пустое значение
+
+    def call_functions(self, func, requests, max_concurrency=16) -> list[tuple]:
+        """Параллельный вызов функции для списка запросов по общему каналу
+
+        :param func: Функция сервиса
+        :param list requests: Запросы
+        :param int max_concurrency: Максимальное количество одновременных вызовов
+        :return: Список (ответ, None) или (None, ошибка) в порядке запросов. Ошибка - RpcError или исключение, из-за которого вызов не начался
+        """
+        return [(response, error) for response, error, latency in self.call_functions_timed([(func, request) for request in requests], max_concurrency)]
+
+    def call_functions_timed(self, calls, max_concurrency=16) -> list[tuple]:
+        """Параллельный вызов разных функций по общему каналу с замером длительности каждого вызова
+
+        :param list calls: Вызовы [(функция сервиса, запрос), ...]
+        :param int max_concurrency: Максимальное количество одновременных вызовов
+        :return: Список (ответ, None, длительность) или (None, ошибка, длительность) в порядке вызовов. Длительность в с.
+            Ошибка - RpcError или исключение, из-за которого вызов не начался (длительность 0)
+        """
+        semaphore = BoundedSemaphore(max_concurrency)  # Ограничение одновременных вызовов
+        metrics = self.metrics  # Замеры
+        futures = []  # Вызовы в порядке запросов. None - вызов не начался
+        call_errors = {}  # Исключения вызовов, которые не начались, по номеру вызова
+        starts, latencies = [0.0] * len(calls), [0.0] * len(calls)  # Начало и длительность вызовов
+        for index, (func, request) in enumerate(calls):  # Пробегаемся по всем вызовам
+            semaphore.acquire()  # Ждем, пока количество вызовов не станет меньше максимального
+            try:
+                if self.scheduler:  # Если частота запросов ограничена
+                    self.scheduler.acquire(self.method_classes.get(func, 'query'))  # то ждем своей очереди
+                start = starts[index] = perf_counter()  # Начало вызова
+                future = func.future(request=request, metadata=self.metadata)  # Вызываем функцию, не дожидаясь ответа
+            except Exception as e:  # Если вызов не начался (канал закрыт, неверный запрос)
+                semaphore.release()  # то освобождаем место
+                call_errors[index] = e  # и запоминаем ошибку для этого вызова. Остальные вызовы продолжаются
+                futures.append(None)
+                continue
+
+            def on_done(f, index=index, start=start, name=self.method_names.get(func, str(func))):
+                """Завершение вызова"""
+                latencies[index] = perf_counter() - start  # Длительность вызова
+                semaphore.release()  # Освобождаем место
+                if metrics:  # Если замеры включены
+                    metrics.observe_rpc(name, latencies[index], None if f.code() == StatusCode.OK else f.code().name)
+            future.add_done_callback(on_done)
+            futures.append(future)
+        results = []  # Результаты в порядке запросов
+        for index, future in enumerate(futures):  # Пробегаемся по всем вызовам
+            if future is None:  # Если вызов не начался
+                results.append((None, call_errors[index], 0.0))
+                continue
+            try:
+                response, error = future.result(), None
+            except RpcError as e:  # Если получили ошибку канала
+                response, error = None, e  # то возвращаем ее для этого запроса
+            results.append((response, error, latencies[index] or perf_counter() - starts[index]))  # Обработчик завершения мог еще не выполниться
+        return results
+
     # Events
 
+    def send_subscription(self, request: SubscriptionRequest, key: tuple, subscribe: bool):
+        """Отправка запроса на подписку/отписку с учетом в реестре активных подписок
+
+        :param SubscriptionRequest request: Запрос на подписку/отписку
+        :param tuple key: Ключ подписки в реестре
+        :param bool subscribe: Подписка (True) или отписка (False)
+        """
+        with self.subscriptions_lock:
+            if subscribe:  # Если подписываемся
+                self.subscriptions[key] = request  # то запоминаем подписку для повтора при переподключении
+            else:  # Если отписываемся
+                self.subscriptions.pop(key, None)  # то удаляем подписку из реестра
+            self.subscription_queue.put(request)
+
     def subscribe_order_book(self, security_code, security_board, request_id=None) -> str:
         """Запрос подписки на стакан
 
@@ -127,8 +433,8 @@ class FinamPy:
         """
         if not request_id:  # Если идентификатор запроса не указан
             request_id = str(uuid4())  # то создаем его из уникального идентификатора
-        self.subscription_queue.put(SubscriptionRequest(order_book_subscribe_request=OrderBookSubscribeRequest(
-            request_id=request_id, security_code=security_code, security_board=security_board)))
+        self.send_subscription(SubscriptionRequest(order_book_subscribe_request=OrderBookSubscribeRequest(
+            request_id=request_id, security_code=security_code, security_board=security_board)), ('order_book', security_board, security_code), True)
         return request_id
 
     def unsubscribe_order_book(self, request_id, security_code, security_board):
@@ -138,8 +444,8 @@ class FinamPy:
         :param str security_code: Тикер инструмента
         :param str security_board: Режим торгов
         """
-        self.subscription_queue.put(SubscriptionRequest(order_book_unsubscribe_request=OrderBookUnsubscribeRequest(
-            request_id=request_id, security_code=security_code, security_board=security_board)))
+        self.send_subscription(SubscriptionRequest(order_book_unsubscribe_request=OrderBookUnsubscribeRequest(
+            request_id=request_id, security_code=security_code, security_board=security_board)), ('order_book', security_board, security_code), False)
 
     def subscribe_order_trade(self, client_ids, include_trades=True, include_orders=True, request_id=None) -> str:
         """Запрос подписки на ордера и сделки
@@ -151,8 +457,8 @@ class FinamPy:
         """
         if not request_id:  # Если идентификатор запроса не указан
             request_id = str(uuid4())  # то создаем его из уникального идентификатора
-        self.subscription_queue.put(SubscriptionRequest(order_trade_subscribe_request=OrderTradeSubscribeRequest(
-            request_id=request_id, client_ids=client_ids, include_trades=include_trades, include_orders=include_orders)))
+        self.send_subscription(SubscriptionRequest(order_trade_subscribe_request=OrderTradeSubscribeRequest(
+            request_id=request_id, client_ids=client_ids, include_trades=include_trades, include_orders=include_orders)), ('order_trade', request_id), True)
         return request_id
 
     def unsubscribe_order_trade(self, request_id):
@@ -160,8 +466,8 @@ class FinamPy:
 
         :param str request_id: Идентификатор запроса
         """
-        self.subscription_queue.put(SubscriptionRequest(order_trade_unsubscribe_request=OrderTradeUnsubscribeRequest(
-            request_id=request_id)))
+        self.send_subscription(SubscriptionRequest(order_trade_unsubscribe_request=OrderTradeUnsubscribeRequest(
+            request_id=request_id)), ('order_trade', request_id), False)
 
     # Orders
 
@@ -213,10 +519,16 @@ class FinamPy:
                 ORDER_VALID_BEFORE_TYPE_EXACT_TIME - Заявка действует до указанного времени. Параметр OrderValidBefore.time должно быть установлен
             time: Время действия заявки в UTC
         """
-        request = NewOrderRequest(client_id=client_id, security_board=security_board, security_code=security_code, buy_sell=buy_sell, quantity=quantity, price=DoubleValue(value=price),
-                                  use_credit=use_credit, property=property, condition=condition, valid_before=valid_before)
+        request = self.new_order_request(client_id, security_board, security_code, buy_sell, quantity, use_credit, price, property, condition, valid_before)
         return self.call_function(self.orders_stub.NewOrder, request)
 
+    @staticmethod
+    def new_order_request(client_id, security_board, security_code, buy_sell: common, quantity, use_credit=False, price: float = None,
+                          property: OrderProperty = OrderProperty.ORDER_PROPERTY_PUT_IN_QUEUE, condition: OrderCondition = None, valid_before: OrderValidBefore = None) -> NewOrderRequest:
+        """Запрос на создание новой заявки. Параметры как у new_order"""
+        return NewOrderRequest(client_id=client_id, security_board=security_board, security_code=security_code, buy_sell=buy_sell, quantity=quantity, price=DoubleValue(value=price),
+                               use_credit=use_credit, property=property, condition=condition, valid_before=valid_before)
+
     def cancel_order(self, client_id, transaction_id) -> Union[CancelOrderResult, None]:
         """Отменяет заявку
 
@@ -244,6 +556,40 @@ class FinamPy:
             include_max_buy_sell=include_max_buy_sell))
         return self.call_function(self.portfolios_stub.GetPortfolio, request)
 
+    def get_accounts_snapshot(self, client_ids, include_portfolio=True, include_orders=True, include_stops=True, max_concurrency=16) -> AccountsSnapshot:
+        """Параллельное получение портфелей, заявок и стоп заявок нескольких счетов
+
+        :param list client_ids: Идентификаторы торговых счетов
+        :param bool include_portfolio: Получить портфели со всеми позициями
+        :param bool include_orders: Получить все заявки
+        :param bool include_stops: Получить все стоп заявки
+        :param int max_concurrency: Максимальное количество одновременных вызовов
+        :return: Снимок счетов. Ошибки и длительность вызовов - по каждому счету
+        """
+        calls, parts = [], []  # Вызовы и (счет, часть снимка) для каждого вызова
+        for client_id in client_ids:  # Пробегаемся по всем счетам
+            if include_portfolio:
+                calls.append((self.portfolios_stub.GetPortfolio, GetPortfolioRequest(client_id=client_id, content=PortfolioContent(
+                    include_currencies=True, include_money=True, include_positions=True, include_max_buy_sell=True))))
+                parts.append((client_id, 'portfolio'))
+            if include_orders:
+                calls.append((self.orders_stub.GetOrders, GetOrdersRequest(client_id=client_id, include_matched=True, include_canceled=True, include_active=True)))
+                parts.append((client_id, 'orders'))
+            if include_stops:
+                calls.append((self.stops_stub.GetStops, GetStopsRequest(client_id=client_id, include_executed=True, include_canceled=True, include_active=True)))
+                parts.append((client_id, 'stops'))
+        start = perf_counter()  # Начало снимка
+        results = self.call_functions_timed(calls, max_concurrency)
+        accounts = {client_id: AccountSnapshot(client_id) for client_id in client_ids}  # Снимки в порядке счетов
+        for (client_id, part), (response, error, latency) in zip(parts, results):  # Раскладываем ответы по счетам
+            account = accounts[client_id]
+            account.latencies[part] = latency
+            if error is None:  # Если вызов успешен
+                setattr(account, part, response)
+            else:  # Если получили ошибку
+                account.errors[part] = error  # то она относится только к этой части снимка
+        return AccountsSnapshot(accounts, perf_counter() - start)
+
     # Securities
 
     def get_securities(self) -> Union[GetSecuritiesResult, None]:
@@ -315,11 +661,18 @@ class FinamPy:
                 ORDER_VALID_BEFORE_TYPE_EXACT_TIME - Заявка действует до указанного времени. Параметр OrderValidBefore.time должно быть установлен
             time: Время действия заявки в UTC
         """
-        request = NewStopRequest(client_id=client_id, security_board=security_board, security_code=security_code, buy_sell=buy_sell,
-                                 stop_loss=stop_loss, take_profit=take_profit,
-                                 expiration_date=expiration_date, link_order=link_order, valid_before=valid_before)
+        request = self.new_stop_request(client_id, security_board, security_code, buy_sell, stop_loss, take_profit, expiration_date, link_order, valid_before)
         return self.call_function(self.stops_stub.NewStop, request)
 
+    @staticmethod
+    def new_stop_request(client_id, security_board, security_code, buy_sell: common,
+                         stop_loss: StopLoss = None, take_profit: TakeProfit = None,
+                         expiration_date: Timestamp = None, link_order=None, valid_before: common.OrderValidBefore = None) -> NewStopRequest:
+        """Запрос на выставление стоп-заявки. Параметры как у new_stop"""
+        return NewStopRequest(client_id=client_id, security_board=security_board, security_code=security_code, buy_sell=buy_sell,
+                              stop_loss=stop_loss, take_profit=take_profit,
+                              expiration_date=expiration_date, link_order=link_order, valid_before=valid_before)
+
     def cancel_stop(self, client_id, stop_id) -> Union[CancelStopResult, None]:
         """Снимает стоп-заявку
 
@@ -329,11 +682,58 @@ class FinamPy:
         request = CancelStopRequest(client_id=client_id, stop_id=stop_id)
         return self.call_function(self.stops_stub.CancelStop, request)
 
+    # Пакетные запросы. Все запросы пакета выполняются параллельно по общему каналу
+
+    def new_orders(self, orders, max_concurrency=16) -> list[tuple[Union[NewOrderResult, None], Union[RpcError, None]]]:
+        """Создать пакет новых заявок
+
+        :param list orders: Заявки. Каждая заявка - справочник параметров new_order
+        :param int max_concurrency: Максимальное количество одновременных вызовов
+        :return: Список (ответ, None) или (None, ошибка) в порядке заявок
+        """
+        return self.call_functions(self.orders_stub.NewOrder, [self.new_order_request(**order) for order in orders], max_concurrency)
+
+    def cancel_orders(self, orders, max_concurrency=16) -> list[tuple[Union[CancelOrderResult, None], Union[RpcError, None]]]:
+        """Отменить пакет заявок
+
+        :param list orders: Заявки. Каждая заявка - (идентификатор торгового счёта, идентификатор транзакции)
+        :param int max_concurrency: Максимальное количество одновременных вызовов
+        :return: Список (ответ, None) или (None, ошибка) в порядке заявок
+        """
+        requests = [CancelOrderRequest(client_id=client_id, transaction_id=transaction_id) for client_id, transaction_id in orders]
+        return self.call_functions(self.orders_stub.CancelOrder, requests, max_concurrency)
+
+    def new_stops(self, stops, max_concurrency=16) -> list[tuple[Union[NewStopResult, None], Union[RpcError, None]]]:
+        """Выставить пакет стоп-заявок
+
+        :param list stops: Стоп-заявки. Каждая стоп-заявка - справочник параметров new_stop
+        :param int max_concurrency: Максимальное количество одновременных вызовов
+        :return: Список (ответ, None) или (None, ошибка) в порядке стоп-заявок
+        """
+        return self.call_functions(self.stops_stub.NewStop, [self.new_stop_request(**stop) for stop in stops], max_concurrency)
+
+    def cancel_stops(self, stops, max_concurrency=16) -> list[tuple[Union[CancelStopResult, None], Union[RpcError, None]]]:
+        """Снять пакет стоп-заявок
+
+        :param list stops: Стоп-заявки. Каждая стоп-заявка - (идентификатор торгового счёта, идентификатор стоп-заявки)
+        :param int max_concurrency: Максимальное количество одновременных вызовов
+        :return: Список (ответ, None) или (None, ошибка) в порядке стоп-заявок
+        """
+        requests = [CancelStopRequest(client_id=client_id, stop_id=stop_id) for client_id, stop_id in stops]
+        return self.call_functions(self.stops_stub.CancelStop, requests, max_concurrency)
+
     # Выход и закрытие
 
     def close_subscriptions_thread(self):
         """Закрытие потока подписок"""
+        self.closing = True  # Поток подписок не будет переподключаться
         self.channel.close()  # Принудительно закрываем канал
+        if self.events_channel is not self.channel:  # Если поток событий в отдельном канале
+            self.events_channel.close()  # то закрываем и его
+        if self.event_buffer:  # Если задан буфер событий
+            self.event_buffer.close()  # то закрываем его. Поток обработчиков завершится после обработки оставшихся событий
+        if self.recorder:  # Если события записываются в журнал
+            self.recorder.close()  # то записываем оставшиеся события и закрываем журнал
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close_subscriptions_thread()
@@ -1,5 +1,10 @@
-from requests import post, get, delete  # Запросы/ответы от сервера запросов
-from json import loads  # Ответы принимаются в виде JSON сообщений
+from typing import Iterator  # Записи ответа по частям
+
+from .JsonStream import JsonStream  # Разбор ответов JSON: целиком через orjson, если он установлен, или по частям
+from .SecuritiesCache import RestSecuritiesCache  # Справочник инструментов с хранением на диске
+from .RestTransport import RestTransport  # Транспорт запросов с пулом постоянных соединений
+from .RestCache import RestCache  # Кэш ответов запросов чтения
+from .RequestScheduler import RequestScheduler  # Ограничение частоты запросов с приоритетами
 
 
 class FinamRestPy:
@@ -13,7 +18,7 @@ class FinamRestPy:
     # Функции для запросов/ответов
 
     def get_headers(self):
-        """Получение хедеров для запросов"""
+        """Получение хедеров для запросов. Передаются в каждом запросе поверх заголовков транспорта"""
         return {'accept': 'text/plain', 'X-Api-Key': self.access_token}
 
     def check_result(self, response):
@@ -23,36 +28,91 @@ class FinamRestPy:
         :return: Справочник из JSON, текст, None в случае веб ошибки
         """
         if response.status_code != 200:  # Если статус ошибки
-            self.OnError(f'Ошибка сервера: {response.status_code} {response.content.decode("utf-8")} {response.request}')  # Событие ошибки
+            self.OnError(f'Ошибка сервера: {response.status_code} {response.content.decode("utf-8", "replace")} {response.request}')  # Событие ошибки
             return None  # то возвращаем пустое значение
-        content = loads(response.content.decode('utf-8'))  # Декодируем полученное значение JSON в справочник
+        content = JsonStream.loads(response.content)  # Декодируем полученное значение JSON в справочник прямо из байт
         error = content['error']  # Данные об ошибке
         if error:  # Если произошла ошибка
             self.OnError(f'Ошибка запроса: {error["code"]} {error["message"]} {error["data"]} {response.request}')  # Событие ошибки
             return None  # то возвращаем пустое значение
         return content['data']  # Возвращаем полученное значение
 
+    def check_result_stream(self, response, path, chunk_size=65536) -> Iterator:
+        """Анализ результата запроса с выдачей записей по мере прихода ответа
+
+        :param response response: Результат запроса с stream=True
+        :param tuple path: Путь к массиву записей, например, ('data', 'securities')
+        :param int chunk_size: Размер части ответа, байт
+        :return: Записи массива. При ошибке записей нет, ошибка передается в OnError
+        """
+        with response:  # Соединение возвращается в пул после чтения ответа
+            if response.status_code != 200:  # Если статус ошибки
+                self.OnError(f'Ошибка сервера: {response.status_code} {response.content.decode("utf-8", "replace")} {response.request}')  # Событие ошибки
+                return
+            stream = JsonStream(response.iter_content(chunk_size))
+            yield from stream.iter_items(path)  # При ошибке вместо данных приходит null, записей не будет
+            error = stream.document.get('error')  # Данные об ошибке идут после данных
+            if error:  # Если произошла ошибка
+                self.OnError(f'Ошибка запроса: {error["code"]} {error["message"]} {error["data"]} {response.request}')  # Событие ошибки
+
+    def get_data(self, path, params=None):
+        """Запрос чтения через кэш, если он задан
+
+        :param str path: Путь, например, /api/v1/orders
+        :param dict params: Параметры запроса
+        :return: Данные ответа, None в случае ошибки
+        """
+        if self.cache is None:  # Если кэша нет
+            return self.check_result(self.transport.get(path, params=params, headers=self.headers))
+        return self.cache.fetch(path, params, lambda headers: self.transport.get(path, params=params, headers={**self.headers, **headers} if headers else self.headers), self.check_result)
+
+    def invalidate_orders(self):
+        """Сброс кэша заявок и портфеля счета после изменения заявок. Вызывается после ответа, чтобы не сохранилось чтение, выполненное во время запроса"""
+        if self.cache is not None:  # Если кэш задан
+            self.cache.invalidate('/api/v1/orders', '/api/v1/portfolio', client_id=self.client_id)
+
     # Инициализация и вход
 
-    def __init__(self, client_id, access_token):
+    def __init__(self, client_id, access_token, server=None, pool_size=10, timeout=(3.05, 30), transport: RestTransport = None, cache: RestCache = None,
+                 scheduler: RequestScheduler = None):
         """Инициализация
 
         :param str client_id: Идентификатор торгового счёта
         :param str access_token: Торговый токен доступа
+        :param str server: Сервер для исполнения вызовов. None - сервер Comon Trade API
+        :param int pool_size: Максимальное количество постоянных соединений с сервером
+        :param timeout: Таймаут запросов по умолчанию, с: число или (подключение, чтение)
+        :param RestTransport transport: Общий транспорт запросов. None - создать свой
+        :param RestCache cache: Кэш ответов запросов чтения, может быть общим для нескольких счетов. None - без кэша
+        :param RequestScheduler scheduler: Ограничение частоты запросов с приоритетами, может быть общим с FinamPy. None - без ограничения. Для своего транспорта
         """
         self.client_id = client_id  # Идентификатор торгового счёта
         self.access_token = access_token  # Торговый токен доступа
+        self.headers = self.get_headers()  # Заголовки с токеном передаются в каждом запросе, поэтому транспорт может быть общим для счетов с разными токенами
+        if server:  # Если задан сервер
+            self.server = server  # то работаем с ним
+        self.transport = transport or RestTransport(self.server, access_token, pool_size, timeout, scheduler=scheduler)  # Транспорт запросов. Все методы работают через одну сессию
+        self.cache = cache  # Кэш ответов запросов чтения
         self.OnError = self.default_handler  # Ошибка
+        self.securities_cache = RestSecuritiesCache(self.get_securities, source=self.server)  # Справочник инструментов. Загружается при первом обращении
 
     def __enter__(self):
         """Вход в класс, например, с with"""
         return self
 
+    def close(self):
+        """Закрытие соединений с сервером"""
+        self.transport.close()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Выход из класса, например, с with"""
+        self.close()  # Закрываем соединения
+
     # AccessTokens
 
     def check_access_token(self):
         """Проверка токена"""
-        return self.check_result(get(url=f'{self.server}/api/v1/access-tokens/check', headers=self.get_headers()))
+        return self.check_result(self.transport.get('/api/v1/access-tokens/check', headers=self.headers))
 
     # Orders
 
@@ -105,7 +165,9 @@ class FinamRestPy:
                   'validBefore':
                       {'type': valid_type,
                        'time': valid_time}}
-        return self.check_result(post(url=f'{self.server}/api/v1/orders', params=params, headers=self.get_headers()))
+        result = self.check_result(self.transport.post('/api/v1/orders', params=params, headers=self.headers))
+        self.invalidate_orders()  # Заявки и портфель изменятся
+        return result
 
     def delete_order(self, transaction_id):
         """Отменяет заявку
@@ -113,7 +175,9 @@ class FinamRestPy:
         :param int transaction_id: Идентификатор транзакции, который может быть использован для отмены заявки или определения номера заявки в сервисе событий
         """
         params = {'ClientId': self.client_id, 'TransactionId': transaction_id}
-        return self.check_result(delete(url=f'{self.server}/api/v1/orders', params=params, headers=self.get_headers()))
+        result = self.check_result(self.transport.delete('/api/v1/orders', params=params, headers=self.headers))
+        self.invalidate_orders()  # Заявки и портфель изменятся
+        return result
 
     def get_orders(self, include_matched=True, include_canceled=True, include_active=True):
         """Возвращает список заявок
@@ -126,7 +190,7 @@ class FinamRestPy:
                   'IncludeMatched': include_matched,
                   'IncludeCanceled': include_canceled,
                   'IncludeActive': include_active}
-        return self.check_result(get(url=f'{self.server}/api/v1/orders', params=params, headers=self.get_headers()))
+        return self.get_data('/api/v1/orders', params)
 
     # Portfolio
 
@@ -143,13 +207,20 @@ class FinamRestPy:
                   'Content.IncludeMoney': include_money,
                   'Content.IncludePositions': include_positions,
                   'Content.IncludeMaxBuySell': include_max_buy_sell}
-        return self.check_result(get(url=f'{self.server}/api/v1/portfolio', params=params, headers=self.get_headers()))
+        return self.get_data('/api/v1/portfolio', params)
 
     # Securities
 
     def get_securities(self):
         """Справочник инструментов"""
-        return self.check_result(get(url=f'{self.server}/api/v1/securities', headers=self.get_headers()))
+        return self.get_data('/api/v1/securities')
+
+    def iter_securities(self, chunk_size=65536) -> Iterator[dict]:
+        """Инструменты справочника по одному по мере прихода ответа, без сборки всего списка в памяти
+
+        :param int chunk_size: Размер части ответа, байт
+        """
+        yield from self.check_result_stream(self.transport.get('/api/v1/securities', stream=True, headers=self.headers), ('data', 'securities'), chunk_size)
 
     # Stops
 
@@ -230,7 +301,9 @@ class FinamRestPy:
                   'validBefore':
                       {'type': valid_type,
                        'time': valid_time}}
-        return self.check_result(post(url=f'{self.server}/api/v1/orders', params=params, headers=self.get_headers()))
+        result = self.check_result(self.transport.post('/api/v1/orders', params=params, headers=self.headers))
+        self.invalidate_orders()  # Заявки изменятся
+        return result
 
     def delete_stop_order(self, stop_id):
         """Снимает стоп-заявку
@@ -238,7 +311,9 @@ class FinamRestPy:
         :param int stop_id: Идентификатор стоп-заявки
         """
         params = {'ClientId': self.client_id, 'StopId': stop_id}
-        return self.check_result(delete(url=f'{self.server}/api/v1/stops', params=params, headers=self.get_headers()))
+        result = self.check_result(self.transport.delete('/api/v1/stops', params=params, headers=self.headers))
+        self.invalidate_orders()  # Стоп-заявки изменятся
+        return result
 
     def get_stop_orders(self, include_executed=True, include_canceled=True, include_active=True):
         """Возвращает список стоп-заявок
@@ -251,4 +326,4 @@ class FinamRestPy:
                   'IncludeExecuted': include_executed,
                   'IncludeCanceled': include_canceled,
                   'IncludeActive': include_active}
-        return self.check_result(get(url=f'{self.server}/api/v1/orders', params=params, headers=self.get_headers()))
+        return self.get_data('/api/v1/orders', params)
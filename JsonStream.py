@@ -0,0 +1,128 @@
+from codecs import getincrementaldecoder  # Декодирование UTF-8 по частям
+from json import JSONDecoder, JSONDecodeError  # Разбор значений JSON из строки
+from re import compile  # Окончание числа на границе части
+from typing import Iterable, Iterator  # Части ответа, записи
+
+try:
+    from orjson import loads  # Быстрый разбор JSON из байт
+    backend = 'orjson'
+except ImportError:  # Если orjson не установлен
+    from json import loads  # Стандартный разбор JSON. Тоже принимает байты
+    backend = 'json'
+
+
+class JsonStream:
+    """Разбор ответов JSON сервера
+
+    loads разбирает ответ целиком из байт без промежуточной строки, через orjson, если он установлен.
+    Для больших ответов iter_items выдает записи массива по пути, например, ('data', 'securities'), по мере прихода частей ответа,
+    не собирая весь список. Остальная часть документа (например, error) после разбора доступна в document
+    """
+    loads = staticmethod(loads)  # Разбор JSON из байт целиком
+    backend = backend  # Библиотека разбора JSON: orjson или json
+    decoder = JSONDecoder()  # Разбор отдельных значений
+    whitespace = ' \t\n\r'  # Пробельные символы JSON
+    number_tail = compile(r'[-+.eE0-9]*$')  # До конца текста только символы числа. Число может продолжиться в следующей части
+
+    def __init__(self, chunks: Iterable[bytes]):
+        """Инициализация
+
+        :param chunks: Части ответа в байтах, например, response.iter_content(65536)
+        """
+        self.chunks = iter(chunks)  # Части ответа
+        self.text_decoder = getincrementaldecoder('utf-8')()  # Символ UTF-8 может быть разрезан между частями
+        self.buffer = ''  # Неразобранный текст
+        self.pos = 0  # Позиция разбора в тексте
+        self.eof = False  # Все части ответа получены
+        self.document = None  # Документ без выданного массива. Заполняется после разбора
+
+    def fill(self):
+        """Чтение следующей части ответа. Разобранный текст отбрасывается"""
+        if self.eof:  # Если ответ закончился
+            raise ValueError('Неожиданный конец JSON')
+        try:
+            text = self.text_decoder.decode(next(self.chunks))
+        except StopIteration:  # Если частей больше нет
+            text = self.text_decoder.decode(b'', final=True)
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+
+    def peek(self) -> str:
+        """Следующий символ после пробелов"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.whitespace:
+                self.pos += 1
+            if self.pos < len(self.buffer):  # Если символ есть
+                return self.buffer[self.pos]
+            self.fill()
+
+    def expect(self, chars) -> str:
+        """Чтение одного из ожидаемых символов
+
+        :param str chars: Ожидаемые символы
+        :return: Прочитанный символ
+        """
+        char = self.peek()
+        if char not in chars:  # Если символ не тот
+            raise ValueError(f'Ожидается один из символов {chars!r}, получен {char!r}')
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Чтение значения JSON целиком"""
+        self.peek()  # Пропускаем пробелы
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except JSONDecodeError:  # Значение еще не пришло целиком
+                self.fill()
+                continue
+            if not self.eof and (end == len(self.buffer) or isinstance(value, (int, float)) and self.number_tail.match(self.buffer, end)):  # Число на границе части может продолжиться в следующей
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+    def iter_array(self) -> Iterator:
+        """Записи массива по одной"""
+        self.expect('[')
+        if self.peek() == ']':  # Если массив пустой
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':  # Если массив закончился
+                return
+
+    def iter_object(self, path):
+        """Разбор объекта с выдачей записей массива по пути
+
+        :param tuple path: Оставшийся путь к массиву
+        :return: Объект без выданного массива
+        """
+        obj = {}
+        self.expect('{')
+        if self.peek() == '}':  # Если объект пустой
+            self.pos += 1
+            return obj
+        while True:
+            key = self.value()
+            self.expect(':')
+            char = self.peek()
+            if path and key == path[0] and len(path) == 1 and char == '[':  # Если нашли массив
+                yield from self.iter_array()
+                obj[key] = None  # Записи уже выданы
+            elif path and key == path[0] and len(path) > 1 and char == '{':  # Если нашли объект на пути к массиву
+                obj[key] = yield from self.iter_object(path[1:])
+            else:  # Остальные значения, в т.ч. null вместо данных при ошибке, разбираем целиком
+                obj[key] = self.value()
+            if self.expect(',}') == '}':  # Если объект закончился
+                return obj
+
+    def iter_items(self, path) -> Iterator:
+        """Записи массива по пути по мере прихода ответа
+
+        :param tuple path: Путь к массиву, например, ('data', 'securities')
+        """
+        self.document = yield from self.iter_object(tuple(path))
@@ -0,0 +1,162 @@
+from bisect import bisect_left  # Поиск интервала гистограммы
+from functools import partial  # Обработчики partial в сводке
+from threading import Lock  # Блокировка счетчиков
+from time import monotonic  # Время сбора для расчета частоты событий
+
+
+class Histogram:
+    """Гистограмма длительностей с экспоненциальными интервалами"""
+    bounds = tuple(0.00001 * 2 ** i for i in range(21))  # Верхние границы интервалов, с: от 10 мкс до 10 с
+
+    def __init__(self):
+        """Инициализация"""
+        self.counts = [0] * (len(self.bounds) + 1)  # Количество значений в интервалах. Последний - больше всех границ
+        self.count = 0  # Количество значений
+        self.sum = 0.0  # Сумма значений
+        self.max = 0.0  # Максимальное значение
+
+    def observe(self, value):
+        """Добавление значения. Без блокировки: значения одной гистограммы добавляются из одного потока или под блокировкой вызывающего
+
+        :param float value: Значение, с
+        """
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, share) -> float:
+        """Оценка квантиля по верхней границе интервала
+
+        :param float share: Доля значений, например, 0.99
+        """
+        counts = list(self.counts)  # Снимок интервалов
+        rank, total = share * sum(counts), 0
+        for index, count in enumerate(counts):  # Пробегаемся по интервалам
+            total += count
+            if total >= rank and total:  # Если набрали нужную долю значений
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return 0.0
+
+    def snapshot(self) -> dict:
+        """Сводка гистограммы"""
+        return {'count': self.count, 'mean': self.sum / self.count if self.count else 0.0,
+                'p50': self.quantile(0.5), 'p99': self.quantile(0.99), 'max': self.max}
+
+
+class Metrics:
+    """Замеры задержек вызовов и обработки событий
+
+    Хранит гистограммы задержек и количество ошибок по функциям сервисов, время обработки по типам событий и по обработчикам,
+    количество событий по инструментам. Сводка - stats(), выгрузка в текстовом формате Prometheus - prometheus().
+    Пока замеры не подключены к провайдеру, вызовы и события обрабатываются без них
+    """
+    instrument_event_types = frozenset(('order', 'trade', 'order_book'))  # Типы событий, которые считаются по инструментам
+
+    def __init__(self, prefix='finampy'):
+        """Инициализация
+
+        :param str prefix: Начало имен метрик Prometheus
+        """
+        self.prefix = prefix  # Начало имен метрик
+        self.started = monotonic()  # Время начала сбора
+        self.rpc: dict[str, Histogram] = {}  # Задержки по функциям сервисов
+        self.rpc_errors: dict[str, dict[str, int]] = {}  # Количество ошибок по функциям сервисов и кодам ошибок
+        self.events: dict[str, Histogram] = {}  # Время обработки по типам событий
+        self.handlers: dict = {}  # Время обработки по обработчикам
+        self.instruments: dict[tuple, int] = {}  # Количество событий по (тип события, режим торгов, тикер)
+        self.lock = Lock()  # Блокировка справочников
+
+    def histogram(self, histograms: dict, key) -> Histogram:
+        """Гистограмма по ключу. Создается при первом обращении"""
+        histogram = histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = histograms.setdefault(key, Histogram())
+        return histogram
+
+    def observe_rpc(self, method, duration, error_code=None):
+        """Замер вызова функции сервиса
+
+        :param str method: Функция сервиса
+        :param float duration: Длительность вызова, с
+        :param str error_code: Код ошибки gRPC. None - вызов успешен
+        """
+        histogram = self.histogram(self.rpc, method)
+        with self.lock:  # Функции вызываются из разных потоков
+            histogram.observe(duration)
+            if error_code is not None:  # Если вызов завершился ошибкой
+                errors = self.rpc_errors.setdefault(method, {})
+                errors[error_code] = errors.get(error_code, 0) + 1
+
+    def observe_event(self, event_type, payload, duration):
+        """Замер обработки события
+
+        :param str event_type: Тип события
+        :param payload: Событие
+        :param float duration: Время обработки всеми обработчиками, с
+        """
+        self.histogram(self.events, event_type).observe(duration)  # События обрабатываются в одном потоке
+        if event_type in self.instrument_event_types:  # Если у события есть инструмент
+            key = (event_type, payload.security_board if event_type == 'order_book' else '', payload.security_code)  # Режим торгов есть только у стакана
+            self.instruments[key] = self.instruments.get(key, 0) + 1
+
+    def observe_handler(self, handler, duration):
+        """Замер обработчика события
+
+        :param handler: Обработчик
+        :param float duration: Время обработки, с
+        """
+        self.histogram(self.handlers, handler).observe(duration)
+
+    @staticmethod
+    def handler_name(handler) -> str:
+        """Имя обработчика для сводки. У лямбд, partial и вызываемых объектов имя не уникально, к нему добавляется id обработчика"""
+        if isinstance(handler, partial):  # Если обработчик - partial
+            return f'partial({Metrics.handler_name(handler.func)})#{id(handler):x}'
+        name = getattr(handler, '__qualname__', None)  # Имя функции или метода
+        if name is None:  # Если обработчик - вызываемый объект
+            return f'{type(handler).__qualname__}#{id(handler):x}'
+        if '<lambda>' in name:  # Если обработчик - лямбда
+            return f'{name}#{id(handler):x}'
+        return name
+
+    def stats(self) -> dict:
+        """Сводка замеров
+
+        :return: Справочник: rpc - задержки и ошибки по функциям, events - по типам событий, handlers - по обработчикам,
+            instruments - количество и частота событий по инструментам
+        """
+        elapsed = max(monotonic() - self.started, 1e-9)  # Время сбора, с
+        return {'rpc': {method: {**histogram.snapshot(), 'errors': dict(self.rpc_errors.get(method, {}))} for method, histogram in list(self.rpc.items())},
+                'events': {event_type: histogram.snapshot() for event_type, histogram in list(self.events.items())},
+                'handlers': {self.handler_name(handler): histogram.snapshot() for handler, histogram in list(self.handlers.items())},
+                'instruments': {key: {'count': count, 'rate': count / elapsed} for key, count in list(self.instruments.items())}}
+
+    def prometheus(self) -> str:
+        """Выгрузка замеров в текстовом формате Prometheus"""
+        lines = []
+
+        def histograms(name, label, items):
+            """Гистограммы с одной меткой"""
+            lines.append(f'# TYPE {self.prefix}_{name} histogram')
+            for key, histogram in items:
+                counts, total, count = list(histogram.counts), histogram.sum, histogram.count
+                cumulative = 0
+                for bound, bucket in zip((*histogram.bounds, '+Inf'), counts):  # Интервалы Prometheus накопительные
+                    cumulative += bucket
+                    lines.append(f'{self.prefix}_{name}_bucket{{{label}="{key}",le="{bound}"}} {cumulative}')
+                lines.append(f'{self.prefix}_{name}_sum{{{label}="{key}"}} {total}')
+                lines.append(f'{self.prefix}_{name}_count{{{label}="{key}"}} {count}')
+        histograms('rpc_duration_seconds', 'method', list(self.rpc.items()))
+        lines.append(f'# TYPE {self.prefix}_rpc_errors_total counter')
+        for method, errors in list(self.rpc_errors.items()):
+            for code, count in list(errors.items()):
+                lines.append(f'{self.prefix}_rpc_errors_total{{method="{method}",code="{code}"}} {count}')
+        histograms('event_dispatch_seconds', 'event_type', list(self.events.items()))
+        histograms('handler_seconds', 'handler', [(self.handler_name(handler).replace('"', "'"), histogram) for handler, histogram in list(self.handlers.items())])
+        lines.append(f'# TYPE {self.prefix}_instrument_events_total counter')
+        for (event_type, board, code), count in list(self.instruments.items()):
+            lines.append(f'{self.prefix}_instrument_events_total{{event_type="{event_type}",board="{board}",code="{code}"}} {count}')
+        return '\n'.join(lines) + '\n'
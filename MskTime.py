@@ -0,0 +1,105 @@
+from bisect import bisect_right  # Поиск периода действия смещения
+from datetime import datetime, timedelta  # Время и смещение
+from typing import Iterable  # Последовательность значений времени
+
+import numpy as np  # Массивы времени
+from pytz import timezone  # Временная зона
+from google.protobuf.timestamp_pb2 import Timestamp  # Представление времени
+
+
+class MskTime:
+    """Перевод времени UTC в московское по таблице переходов временнОй зоны pytz
+
+    Смещение текущего периода запоминается, поэтому перевод одного значения - сравнение и сложение без обращения к pytz.
+    Массивы переводятся целиком: период каждого значения ищется через numpy.searchsorted по моментам переходов
+    """
+    epoch = datetime(1970, 1, 1)  # Начало отсчета времени Unix
+
+    def __init__(self, tz=timezone('Europe/Moscow')):
+        """Инициализация
+
+        :param tz: ВременнАя зона pytz
+        """
+        self.tz = tz  # ВременнАя зона
+        self.transitions = list(tz._utc_transition_times)  # Моменты переходов UTC. Первый - datetime(1, 1, 1)
+        self.offsets = [info[0] for info in tz._transition_info]  # Смещение от UTC после каждого перехода
+        self.transitions_ns = np.array([(dt - self.epoch) // timedelta(microseconds=1) for dt in self.transitions], dtype=np.int64) * 1000  # Моменты переходов, нс Unix
+        self.transitions_ns[0] = np.iinfo(np.int64).min  # Первый период действует с начала времен
+        self.offsets_ns = np.array([offset // timedelta(microseconds=1) for offset in self.offsets], dtype=np.int64) * 1000  # Смещения, нс
+        self.period = self.get_period(self.transitions[-1])  # Период действия смещения (начало, окончание, смещение). Сначала - последний
+        self.period_ns = (0, 0, 0)  # Период действия смещения в нс. Ищется при первом переводе
+
+    def get_period(self, dt: datetime) -> tuple:
+        """Период действия смещения, в котором находится время
+
+        :param datetime dt: Время UTC
+        :return: Начало периода, окончание периода, смещение
+        """
+        index = bisect_right(self.transitions, dt) - 1  # Последний переход до этого времени
+        end = self.transitions[index + 1] if index + 1 < len(self.transitions) else datetime.max  # Следующий переход
+        return self.transitions[index], end, self.offsets[index]
+
+    def utc_to_msk_datetime(self, dt: datetime) -> datetime:
+        """Перевод времени из UTC в московское
+
+        :param datetime dt: Время UTC
+        :return: Московское время без временнОй зоны
+        """
+        start, end, offset = self.period  # Запомненный период. Кортеж заменяется целиком, поэтому читается без блокировки
+        if not start <= dt < end:  # Если время не в запомненном периоде
+            start, end, offset = self.period = self.get_period(dt)  # то ищем период и запоминаем его
+        return dt + offset
+
+    def utc_to_msk_ns_value(self, utc_ns: int) -> int:
+        """Перевод одного значения времени UTC в московское
+
+        :param int utc_ns: Время UTC, нс Unix
+        :return: Московское время, нс Unix
+        """
+        start, end, offset = self.period_ns  # Запомненный период в нс
+        if not start <= utc_ns < end:  # Если время не в запомненном периоде
+            index = int(np.searchsorted(self.transitions_ns, utc_ns, side='right')) - 1  # Последний переход до этого времени
+            end = int(self.transitions_ns[index + 1]) if index + 1 < len(self.transitions_ns) else 2 ** 63 - 1  # Следующий переход
+            start, end, offset = self.period_ns = (int(self.transitions_ns[index]), end, int(self.offsets_ns[index]))
+        return utc_ns + offset
+
+    def utc_to_msk_ns(self, utc_ns) -> np.ndarray:
+        """Перевод массива времени UTC в московское
+
+        :param utc_ns: Время UTC, нс Unix (массив int64)
+        :return: Московское время, нс Unix (массив int64)
+        """
+        utc_ns = np.asarray(utc_ns, dtype=np.int64)
+        indexes = np.searchsorted(self.transitions_ns, utc_ns, side='right') - 1  # Период каждого значения
+        return utc_ns + self.offsets_ns[indexes]
+
+    def utc_to_msk_datetime64(self, values) -> np.ndarray:
+        """Перевод массива времени UTC в московское
+
+        :param values: Время UTC: массив datetime64 или нс Unix
+        :return: Московское время, массив datetime64[ns]
+        """
+        values = np.asarray(values)
+        if values.dtype.kind == 'M':  # Если это массив datetime64
+            values = values.astype('datetime64[ns]').view(np.int64)  # то переводим его в нс
+        return self.utc_to_msk_ns(values).view('datetime64[ns]')
+
+    @staticmethod
+    def timestamps_to_ns(timestamps: Iterable[Timestamp]) -> np.ndarray:
+        """Перевод последовательности protobuf Timestamp в массив нс Unix
+
+        :param timestamps: Последовательность Timestamp, например, [order.created_at for order in orders]
+        :return: Время, нс Unix (массив int64)
+        """
+        timestamps = timestamps if isinstance(timestamps, (list, tuple)) else list(timestamps)
+        seconds = np.fromiter((timestamp.seconds for timestamp in timestamps), dtype=np.int64, count=len(timestamps))
+        nanos = np.fromiter((timestamp.nanos for timestamp in timestamps), dtype=np.int64, count=len(timestamps))
+        return seconds * 1_000_000_000 + nanos
+
+    def timestamps_to_msk_datetime64(self, timestamps: Iterable[Timestamp]) -> np.ndarray:
+        """Перевод последовательности protobuf Timestamp UTC в массив московского времени
+
+        :param timestamps: Последовательность Timestamp
+        :return: Московское время, массив datetime64[ns]
+        """
+        return self.utc_to_msk_ns(self.timestamps_to_ns(timestamps)).view('datetime64[ns]')
@@ -0,0 +1,263 @@
+from math import nan  # Значение при отсутствии котировок
+from threading import Lock  # Блокировка стакана при обновлении и чтении
+from typing import Union  # Объединение типов
+
+import numpy as np  # Уровни стакана храним в предвыделенных массивах
+
+from .proto.tradeapi.v1.common_pb2 import BuySell  # Направление заявки
+from .proto.tradeapi.v1.events_pb2 import OrderBookEvent  # Событие стакана
+from .EventDispatcher import EventDispatcher  # Диспетчер событий подписок
+
+
+class OrderBookSide:
+    """Сторона стакана. Уровни отсортированы от лучшей цены к худшей"""
+
+    def __init__(self, ascending, capacity=50):
+        """Инициализация
+
+        :param bool ascending: Лучшая цена минимальная (продажа) или максимальная (покупка)
+        :param int capacity: Начальное количество уровней в массивах
+        """
+        self.ascending = ascending  # Порядок цен от лучшей к худшей
+        self.size = 0  # Количество уровней
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        """Выделение массивов под уровни
+
+        :param int capacity: Количество уровней
+        """
+        self.price = np.zeros(capacity, dtype=np.float64)  # Цены уровней
+        self.quantity = np.zeros(capacity, dtype=np.int64)  # Количество на уровнях
+        self.cum_quantity = np.zeros(capacity, dtype=np.int64)  # Накопленное количество от лучшей цены
+        self.cum_value = np.zeros(capacity, dtype=np.float64)  # Накопленный объем в деньгах от лучшей цены
+
+    def update(self, rows):
+        """Обновление уровней на месте из повторяющегося поля стакана
+
+        :param rows: Уровни стакана OrderBookRow
+        """
+        size = len(rows)  # Количество уровней
+        if size > len(self.price):  # Если уровней больше, чем выделено
+            self.allocate(size * 2)  # то выделяем массивы с запасом
+        price = self.price[:size]  # Представления массивов без копирования
+        quantity = self.quantity[:size]
+        price[:] = [row.price for row in rows]  # Единственный проход по protobuf за обновление
+        quantity[:] = [row.quantity for row in rows]
+        if size > 1 and (price[0] > price[-1]) == self.ascending:  # Если уровни пришли от худшей цены к лучшей
+            price[:] = price[::-1].copy()  # то разворачиваем
+            quantity[:] = quantity[::-1].copy()
+        np.cumsum(quantity, out=self.cum_quantity[:size])
+        np.cumsum(price * quantity, out=self.cum_value[:size])
+        self.size = size
+
+    def best(self) -> float:
+        """Лучшая цена"""
+        return self.price[0] if self.size else nan
+
+    def depth(self, levels=None) -> int:
+        """Накопленное количество до заданного уровня
+
+        :param int levels: Количество уровней от лучшей цены. None - все уровни
+        """
+        size = self.size if levels is None else min(levels, self.size)
+        return int(self.cum_quantity[size - 1]) if size > 0 else 0
+
+    def price_for_volume(self, volume, average=False) -> float:
+        """Цена, по которой набирается заданное количество
+
+        :param int volume: Количество
+        :param bool average: Средняя цена исполнения вместо цены последнего нужного уровня
+        :return: Цена. nan, если в стакане недостаточно количества
+        """
+        if volume <= 0:  # Если количество не задано
+            return self.best()
+        index = int(np.searchsorted(self.cum_quantity[:self.size], volume))  # Первый уровень, на котором набирается количество
+        if index >= self.size:  # Если количества во всем стакане недостаточно
+            return nan
+        price = float(self.price[index])  # Цена последнего нужного уровня
+        if not average:  # Если средняя цена не нужна
+            return price
+        before_quantity = int(self.cum_quantity[index - 1]) if index else 0  # Количество на уровнях до последнего нужного
+        before_value = float(self.cum_value[index - 1]) if index else 0.0  # Объем в деньгах на уровнях до последнего нужного
+        return (before_value + (volume - before_quantity) * price) / volume
+
+
+class OrderBook:
+    """Стакан инструмента"""
+    sides = {BuySell.BUY_SELL_BUY: 'asks', 'buy': 'asks', BuySell.BUY_SELL_SELL: 'bids', 'sell': 'bids'}  # Сторона стакана, с которой исполняется заявка, по направлению
+
+    def __init__(self, security_board, security_code, capacity=50):
+        """Инициализация
+
+        :param str security_board: Режим торгов
+        :param str security_code: Тикер инструмента
+        :param int capacity: Начальное количество уровней в массивах
+        """
+        self.security_board = security_board  # Режим торгов
+        self.security_code = security_code  # Тикер инструмента
+        self.asks = OrderBookSide(True, capacity)  # Продажа. Лучшая цена минимальная
+        self.bids = OrderBookSide(False, capacity)  # Покупка. Лучшая цена максимальная
+        self.updates = 0  # Количество обновлений
+        self.lock = Lock()  # Блокировка стакана
+
+    def update(self, event: OrderBookEvent):
+        """Обновление стакана из события
+
+        :param OrderBookEvent event: Событие стакана
+        """
+        with self.lock:
+            self.asks.update(event.asks)
+            self.bids.update(event.bids)
+            self.updates += 1
+
+    def side(self, buy_sell) -> OrderBookSide:
+        """Сторона стакана, с которой исполняется заявка
+
+        :param buy_sell: Направление заявки BuySell.BUY_SELL_BUY или 'buy' - покупка (берем продажу), BuySell.BUY_SELL_SELL или 'sell' - продажа (берем покупку)
+        """
+        side = self.sides.get(buy_sell)  # Сторона стакана по направлению заявки
+        if side is None:  # Если направление не покупка и не продажа
+            raise ValueError(f'Неизвестное направление заявки {buy_sell!r}. Допустимые: BuySell.BUY_SELL_BUY, BuySell.BUY_SELL_SELL, buy, sell')
+        return getattr(self, side)
+
+    def best_ask(self) -> float:
+        """Лучшая цена продажи"""
+        with self.lock:
+            return self.asks.best()
+
+    def best_bid(self) -> float:
+        """Лучшая цена покупки"""
+        with self.lock:
+            return self.bids.best()
+
+    def spread(self) -> float:
+        """Спред между лучшими ценами продажи и покупки"""
+        with self.lock:
+            return self.asks.best() - self.bids.best()
+
+    def mid_price(self) -> float:
+        """Середина спреда"""
+        with self.lock:
+            return (self.asks.best() + self.bids.best()) / 2
+
+    def depth(self, buy_sell, levels=None) -> int:
+        """Накопленное количество стороны стакана до заданного уровня
+
+        :param buy_sell: Направление заявки BuySell.BUY_SELL_BUY/'buy' - покупка (продажа стакана), BuySell.BUY_SELL_SELL/'sell' - продажа (покупка стакана)
+        :param int levels: Количество уровней от лучшей цены. None - все уровни
+        """
+        with self.lock:
+            return self.side(buy_sell).depth(levels)
+
+    def price_for_volume(self, buy_sell, volume, average=False) -> float:
+        """Цена, по которой заявка заданного количества исполнится по стакану
+
+        :param buy_sell: Направление заявки BuySell.BUY_SELL_BUY/'buy' - покупка, BuySell.BUY_SELL_SELL/'sell' - продажа
+        :param int volume: Количество
+        :param bool average: Средняя цена исполнения вместо цены последнего нужного уровня
+        :return: Цена. nan, если в стакане недостаточно количества
+        """
+        with self.lock:
+            return self.side(buy_sell).price_for_volume(volume, average)
+
+
+class OrderBookStore:
+    """Хранилище стаканов по режиму торгов и тикеру, обновляемое из событий OrderBookEvent
+
+    Использование: store = OrderBookStore().attach(fp_provider.dispatcher)
+    """
+
+    def __init__(self, capacity=50):
+        """Инициализация
+
+        :param int capacity: Начальное количество уровней в массивах каждого стакана
+        """
+        self.capacity = capacity  # Начальное количество уровней
+        self.order_books: dict[tuple[str, str], OrderBook] = {}  # Стаканы по (режим торгов, тикер)
+
+    def attach(self, dispatcher: EventDispatcher):
+        """Подключение к событиям стакана диспетчера
+
+        :param EventDispatcher dispatcher: Диспетчер событий
+        :return: Хранилище стаканов
+        """
+        dispatcher.add_listener('order_book', self.on_order_book)
+        return self
+
+    def detach(self, dispatcher: EventDispatcher):
+        """Отключение от событий стакана диспетчера
+
+        :param EventDispatcher dispatcher: Диспетчер событий
+        """
+        dispatcher.remove_listener('order_book', self.on_order_book)
+
+    def on_order_book(self, event: OrderBookEvent):
+        """Обработчик события стакана
+
+        :param OrderBookEvent event: Событие стакана
+        """
+        key = (event.security_board, event.security_code)  # Ключ стакана
+        order_book = self.order_books.get(key)
+        if order_book is None:  # Если стакана еще нет
+            order_book = self.order_books.setdefault(key, OrderBook(event.security_board, event.security_code, self.capacity))
+        order_book.update(event)
+
+    def get(self, security_board, security_code) -> Union[OrderBook, None]:
+        """Стакан инструмента
+
+        :param str security_board: Режим торгов
+        :param str security_code: Тикер инструмента
+        :return: Стакан или None, если событий стакана еще не было
+        """
+        return self.order_books.get((security_board, security_code))
+
+    def best_ask(self, security_board, security_code) -> float:
+        """Лучшая цена продажи
+
+        :param str security_board: Режим торгов
+        :param str security_code: Тикер инструмента
+        """
+        order_book = self.get(security_board, security_code)
+        return order_book.best_ask() if order_book else nan
+
+    def best_bid(self, security_board, security_code) -> float:
+        """Лучшая цена покупки
+
+        :param str security_board: Режим торгов
+        :param str security_code: Тикер инструмента
+        """
+        order_book = self.get(security_board, security_code)
+        return order_book.best_bid() if order_book else nan
+
+    def spread(self, security_board, security_code) -> float:
+        """Спред между лучшими ценами продажи и покупки
+
+        :param str security_board: Режим торгов
+        :param str security_code: Тикер инструмента
+        """
+        order_book = self.get(security_board, security_code)
+        return order_book.spread() if order_book else nan
+
+    def depth(self, security_board, security_code, buy_sell, levels=None) -> int:
+        """Накопленное количество стороны стакана до заданного уровня
+
+        :param str security_board: Режим торгов
+        :param str security_code: Тикер инструмента
+        :param buy_sell: Направление заявки BuySell.BUY_SELL_BUY/'buy' - покупка, BuySell.BUY_SELL_SELL/'sell' - продажа
+        :param int levels: Количество уровней от лучшей цены. None - все уровни
+        """
+        order_book = self.get(security_board, security_code)
+        return order_book.depth(buy_sell, levels) if order_book else 0
+
+    def price_for_volume(self, security_board, security_code, buy_sell, volume, average=False) -> float:
+        """Цена, по которой заявка заданного количества исполнится по стакану
+
+        :param str security_board: Режим торгов
+        :param str security_code: Тикер инструмента
+        :param buy_sell: Направление заявки BuySell.BUY_SELL_BUY/'buy' - покупка, BuySell.BUY_SELL_SELL/'sell' - продажа
+        :param int volume: Количество
+        :param bool average: Средняя цена исполнения вместо цены последнего нужного уровня
+        """
+        order_book = self.get(security_board, security_code)
+        return order_book.price_for_volume(buy_sell, volume, average) if order_book else nan
@@ -0,0 +1,303 @@
+from collections import OrderedDict  # Отложенные сделки в порядке прихода для удаления самых старых
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError  # Ожидание состояния заявки
+from threading import RLock  # Блокировка индексов. Обработчики будущих результатов могут обращаться к заявкам
+from time import monotonic  # Время прихода отложенных сделок
+from typing import Callable, Union  # Функции и обработчики, объединение типов
+
+from .proto.tradeapi.v1.events_pb2 import OrderEvent, TradeEvent  # События заявок и сделок
+from .proto.tradeapi.v1.orders_pb2 import Order, OrderStatus, GetOrdersResult  # Заявки
+from .proto.tradeapi.v1.stops_pb2 import Stop, StopStatus, GetStopsResult  # Стоп заявки
+from .EventDispatcher import EventDispatcher  # Диспетчер событий подписок
+
+
+class TrackedOrder:
+    """Заявка с ее сделками"""
+    final_statuses = frozenset((OrderStatus.ORDER_STATUS_CANCELLED, OrderStatus.ORDER_STATUS_MATCHED))  # Заявка больше не изменится
+
+    def __init__(self, order: Union[Order, OrderEvent], received=True):
+        """Инициализация
+
+        :param order: Заявка из get_orders или события заявки
+        :param bool received: Заявка получена. False - пустая заявка, на которой ждут первого события
+        """
+        self.order = order  # Последнее состояние заявки
+        self.received = received  # Заявка получена с сервера или из события
+        self.trades: dict[int, TradeEvent] = {}  # Сделки по номеру сделки
+        self.traded_quantity = 0  # Исполненное количество по сделкам, полученным отслеживанием
+        self.waiters: list[tuple[Future, Callable]] = []  # Ожидания (будущий результат, условие)
+
+    @property
+    def transaction_id(self) -> int:
+        """Номер транзакции"""
+        return self.order.transaction_id
+
+    @property
+    def order_no(self) -> int:
+        """Биржевой номер заявки"""
+        return self.order.order_no
+
+    @property
+    def status(self):
+        """Статус заявки"""
+        return self.order.status
+
+    @property
+    def is_final(self) -> bool:
+        """Заявка исполнена или отменена"""
+        return self.order.status in self.final_statuses
+
+    @property
+    def filled_quantity(self) -> int:
+        """Исполненное количество: по остатку заявки. Сделки, полученные отслеживанием, - нижняя граница, т.к. событие заявки может прийти позже сделки"""
+        return max(self.traded_quantity, self.order.quantity - self.order.balance if self.order.quantity else 0)
+
+    @property
+    def is_filled(self) -> bool:
+        """Заявка исполнена полностью"""
+        return self.order.status == OrderStatus.ORDER_STATUS_MATCHED or (self.order.quantity > 0 and self.filled_quantity >= self.order.quantity)
+
+    @property
+    def average_price(self) -> float:
+        """Средняя цена исполнения по сделкам. 0 - сделок нет"""
+        quantity = sum(trade.quantity for trade in self.trades.values())
+        return sum(trade.price * trade.quantity for trade in self.trades.values()) / quantity if quantity else 0.0
+
+    def add_trade(self, trade: TradeEvent) -> bool:
+        """Добавление сделки
+
+        :param TradeEvent trade: Событие сделки
+        :return: True, если сделка новая
+        """
+        if trade.trade_no in self.trades:  # Сделка могла прийти повторно после переподключения
+            return False
+        self.trades[trade.trade_no] = trade
+        self.traded_quantity += trade.quantity
+        return True
+
+    def check_waiters(self):
+        """Завершение ожиданий, условия которых выполнились"""
+        waiters = []
+        for future, condition in self.waiters:
+            if future.done():  # Если ожидание отменено
+                continue
+            if condition(self):  # Если условие выполнилось
+                future.set_result(self)
+            else:
+                waiters.append((future, condition))
+        self.waiters = waiters
+
+
+class OrderTracker:
+    """Заявки и стоп заявки счетов с индексами, обновляемые из событий OrderEvent и TradeEvent без запросов get_orders
+
+    Заявки загружаются один раз через get_orders/get_stops, дальше обновляются событиями подписки на заявки и сделки
+    (subscribe_order_trade). Индексы: по номеру транзакции, по биржевому номеру заявки, по (счет, тикер).
+    По каждой заявке хранятся сделки и исполненное количество. Можно дождаться исполнения или отмены заявки.
+    Событий стоп заявок в подписке нет, поэтому стоп заявки обновляются только запросом refresh_stops
+
+    Использование: tracker = OrderTracker(fp_provider.get_orders, fp_provider.get_stops).attach(fp_provider.dispatcher)
+    """
+
+    def __init__(self, get_orders: Callable[[str], Union[GetOrdersResult, None]] = None, get_stops: Callable[[str], Union[GetStopsResult, None]] = None,
+                 on_update: Callable = None, max_pending_orders=10000, pending_ttl=3600):
+        """Инициализация
+
+        :param get_orders: Функция получения заявок по идентификатору счета, например, FinamPy.get_orders. None - без загрузки
+        :param get_stops: Функция получения стоп заявок по идентификатору счета, например, FinamPy.get_stops. None - без загрузки
+        :param on_update: Обработчик изменения заявки (TrackedOrder). None - без обработчика
+        :param int max_pending_orders: Максимальное количество заявок, сделки которых пришли раньше заявки. Самые старые удаляются
+        :param float pending_ttl: Время хранения сделок, пришедших раньше заявки, с. Заявки других терминалов и до запуска могут не прийти никогда
+        """
+        self.get_orders = get_orders  # Функция получения заявок
+        self.get_stops = get_stops  # Функция получения стоп заявок
+        self.on_update = on_update  # Обработчик изменения заявки
+        self.by_transaction_id: dict[int, TrackedOrder] = {}  # Заявки по номеру транзакции
+        self.by_order_no: dict[int, TrackedOrder] = {}  # Заявки по биржевому номеру
+        self.by_instrument: dict[tuple[str, str], dict[int, TrackedOrder]] = {}  # Заявки по (счет, тикер), затем по номеру транзакции
+        self.stops: dict[int, Stop] = {}  # Стоп заявки по номеру
+        self.pending_trades: OrderedDict[int, tuple[float, list[TradeEvent]]] = OrderedDict()  # Сделки, пришедшие раньше своей заявки, по биржевому номеру заявки: (время прихода, сделки)
+        self.max_pending_orders = max_pending_orders  # Максимальное количество заявок с отложенными сделками
+        self.pending_ttl = pending_ttl  # Время хранения отложенных сделок, с
+        self.dropped_trades = 0  # Количество удаленных отложенных сделок, заявки которых не пришли
+        self.lock = RLock()  # Блокировка индексов
+
+    def attach(self, dispatcher: EventDispatcher):
+        """Подключение к событиям заявок и сделок диспетчера
+
+        :param EventDispatcher dispatcher: Диспетчер событий
+        :return: Отслеживание заявок
+        """
+        dispatcher.add_listener('order', self.on_order)
+        dispatcher.add_listener('trade', self.on_trade)
+        return self
+
+    def detach(self, dispatcher: EventDispatcher):
+        """Отключение от событий диспетчера
+
+        :param EventDispatcher dispatcher: Диспетчер событий
+        """
+        dispatcher.remove_listener('order', self.on_order)
+        dispatcher.remove_listener('trade', self.on_trade)
+
+    def load(self, client_id):
+        """Загрузка заявок и стоп заявок счета с сервера
+
+        :param str client_id: Идентификатор торгового счёта
+        """
+        orders = self.get_orders(client_id) if self.get_orders else None
+        if orders is not None:  # Если заявки получены
+            for order in orders.orders:
+                self.update_order(order)
+        self.refresh_stops(client_id)
+
+    def refresh_stops(self, client_id) -> bool:
+        """Обновление стоп заявок счета с сервера. Стоп заявки счета, которых нет в ответе, удаляются
+
+        :param str client_id: Идентификатор торгового счёта
+        :return: True, если стоп заявки получены
+        """
+        stops = self.get_stops(client_id) if self.get_stops else None
+        if stops is None:  # Если стоп заявки не получены
+            return False
+        with self.lock:
+            self.stops = {**{stop_id: stop for stop_id, stop in self.stops.items() if stop.client_id != client_id},
+                          **{stop.stop_id: stop for stop in stops.stops}}  # Стоп заявки других счетов оставляем
+        return True
+
+    def update_order(self, order: Union[Order, OrderEvent]) -> TrackedOrder:
+        """Обновление заявки во всех индексах
+
+        :param order: Заявка или событие заявки
+        :return: Отслеживаемая заявка
+        """
+        with self.lock:
+            tracked = self.by_transaction_id.get(order.transaction_id)
+            if tracked is None:  # Если заявка новая
+                tracked = self.by_transaction_id[order.transaction_id] = TrackedOrder(order)
+            else:  # Если заявка уже есть
+                tracked.order = order  # то запоминаем ее последнее состояние
+                tracked.received = True
+            self.by_instrument.setdefault((order.client_id, order.security_code), {})[order.transaction_id] = tracked  # Заявка могла ожидаться до первого события
+            if order.order_no:  # Биржевой номер появляется после регистрации заявки на бирже
+                self.by_order_no[order.order_no] = tracked
+                for trade in self.pending_trades.pop(order.order_no, (0, ()))[1]:  # Сделки, пришедшие раньше заявки
+                    tracked.add_trade(trade)
+            tracked.check_waiters()
+        if self.on_update:
+            self.on_update(tracked)
+        return tracked
+
+    def on_order(self, event: OrderEvent):
+        """Обработчик события заявки
+
+        :param OrderEvent event: Событие заявки
+        """
+        self.update_order(event)
+
+    def on_trade(self, event: TradeEvent):
+        """Обработчик события сделки
+
+        :param TradeEvent event: Событие сделки
+        """
+        with self.lock:
+            tracked = self.by_order_no.get(event.order_no)
+            if tracked is None:  # Если заявки этой сделки еще нет
+                self.add_pending_trade(event)  # то откладываем сделку до прихода заявки
+                return
+            if not tracked.add_trade(event):  # Если сделка уже была
+                return
+            tracked.check_waiters()
+        if self.on_update:
+            self.on_update(tracked)
+
+    def add_pending_trade(self, trade: TradeEvent):
+        """Отложенная сделка до прихода заявки. Вызывается под блокировкой. Устаревшие и лишние отложенные сделки удаляются
+
+        :param TradeEvent trade: Событие сделки
+        """
+        now = monotonic()
+        pending = self.pending_trades.get(trade.order_no)
+        if pending is None:  # Если сделок этой заявки еще не откладывали
+            self.pending_trades[trade.order_no] = (now, [trade])
+        else:
+            pending[1].append(trade)
+        while self.pending_trades:  # Удаляем самые старые заявки с отложенными сделками
+            order_no, (received, trades) = next(iter(self.pending_trades.items()))
+            if len(self.pending_trades) <= self.max_pending_orders and now - received <= self.pending_ttl:  # Если лишних и устаревших нет
+                break
+            del self.pending_trades[order_no]
+            self.dropped_trades += len(trades)
+
+    def get(self, transaction_id) -> Union[TrackedOrder, None]:
+        """Заявка по номеру транзакции"""
+        return self.by_transaction_id.get(transaction_id)
+
+    def get_by_order_no(self, order_no) -> Union[TrackedOrder, None]:
+        """Заявка по биржевому номеру"""
+        return self.by_order_no.get(order_no)
+
+    def get_orders_by_instrument(self, client_id, security_code, active_only=False) -> list[TrackedOrder]:
+        """Заявки счета по тикеру
+
+        :param str client_id: Идентификатор торгового счёта
+        :param str security_code: Тикер
+        :param bool active_only: Только активные заявки
+        """
+        with self.lock:
+            orders = list(self.by_instrument.get((client_id, security_code), {}).values())
+        return [tracked for tracked in orders if not active_only or tracked.status == OrderStatus.ORDER_STATUS_ACTIVE]
+
+    def get_active_stops(self, client_id=None) -> list[Stop]:
+        """Активные стоп заявки на момент последнего load/refresh_stops
+
+        :param str client_id: Идентификатор торгового счёта. None - всех счетов
+        """
+        with self.lock:
+            return [stop for stop in self.stops.values() if stop.status == StopStatus.STOP_STATUS_ACTIVE and (client_id is None or stop.client_id == client_id)]
+
+    def wait(self, transaction_id, condition: Callable[[TrackedOrder], bool] = None) -> Future:
+        """Ожидание состояния заявки
+
+        :param int transaction_id: Номер транзакции из ответа new_order
+        :param condition: Условие. None - заявка исполнена или отменена
+        :return: Будущий результат: отслеживаемая заявка, когда условие выполнится. future.result(timeout) ждет его.
+            future.cancel() прекращает ожидание
+        """
+        condition = condition or (lambda tracked: tracked.is_final or tracked.is_filled)
+        future = Future()
+        with self.lock:
+            tracked = self.by_transaction_id.get(transaction_id)
+            if tracked is None:  # Если события заявки еще не было
+                tracked = self.by_transaction_id[transaction_id] = TrackedOrder(Order(transaction_id=transaction_id), False)  # то ждем его на пустой заявке
+            if condition(tracked):  # Если условие уже выполнено
+                future.set_result(tracked)
+            else:
+                tracked.waiters.append((future, condition))
+                future.add_done_callback(lambda done: self.remove_waiter(tracked, done) if done.cancelled() else None)  # Отмененное ожидание убираем
+        return future
+
+    def remove_waiter(self, tracked: TrackedOrder, future: Future):
+        """Удаление ожидания. Пустая заявка без ожиданий удаляется
+
+        :param TrackedOrder tracked: Отслеживаемая заявка
+        :param Future future: Будущий результат ожидания
+        """
+        with self.lock:
+            tracked.waiters = [(waiter, condition) for waiter, condition in tracked.waiters if waiter is not future]
+            if not tracked.received and not tracked.waiters and self.by_transaction_id.get(tracked.transaction_id) is tracked:  # Если заявку больше никто не ждет
+                del self.by_transaction_id[tracked.transaction_id]  # то пустую заявку удаляем
+
+    def wait_filled_or_cancelled(self, transaction_id, timeout=None) -> TrackedOrder:
+        """Ожидание исполнения или отмены заявки
+
+        :param int transaction_id: Номер транзакции
+        :param float timeout: Время ожидания, с. None - без ограничения
+        :return: Отслеживаемая заявка. По истечении времени - TimeoutError
+        """
+        future = self.wait(transaction_id)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:  # Если время ожидания истекло
+            if future.cancel():  # то прекращаем ожидание
+                raise
+            return future.result()  # Условие выполнилось одновременно с истечением времени
@@ -0,0 +1,248 @@
+from threading import Thread, Lock, Event  # Поток сверки, блокировка портфелей, остановка сверки
+from time import monotonic  # Время обновления портфеля
+from typing import Callable, Union  # Функции и обработчики, объединение типов
+
+from .proto.tradeapi.v1.events_pb2 import PortfolioEvent  # Событие портфеля
+from .proto.tradeapi.v1.portfolios_pb2 import GetPortfolioResult, PositionRow, MoneyRow, CurrencyRow  # Портфель и его строки
+from .EventDispatcher import EventDispatcher  # Диспетчер событий подписок
+
+
+class Portfolio:
+    """Состояние портфеля счета"""
+    parts = {'positions': (PositionRow, lambda row: row.security_code),  # Части портфеля: класс строки, ключ строки
+             'money': (MoneyRow, lambda row: (row.market, row.currency)),
+             'currencies': (CurrencyRow, lambda row: row.name)}
+    fields = {part: tuple(field.name for field in row_class.DESCRIPTOR.fields) for part, (row_class, key) in parts.items()}  # Поля строк для сравнения
+
+    def __init__(self, client_id):
+        """Инициализация
+
+        :param str client_id: Идентификатор торгового счёта
+        """
+        self.client_id = client_id  # Идентификатор торгового счёта
+        self.equity = self.balance = 0.0  # Оценка и входящая оценка портфеля
+        self.positions: dict[str, PositionRow] = {}  # Позиции по тикеру
+        self.money: dict[tuple, MoneyRow] = {}  # Деньги по (рынок, валюта)
+        self.currencies: dict[str, CurrencyRow] = {}  # Валюты по названию
+        self.updated = None  # Время последнего обновления (monotonic). None - портфель еще не получен
+
+    @classmethod
+    def row_diff(cls, part, old, new) -> dict:
+        """Изменения полей строки
+
+        :param str part: Часть портфеля
+        :param old: Старая строка. None - строка добавлена
+        :param new: Новая строка. None - строка удалена
+        :return: Справочник поле - (старое значение, новое значение)
+        """
+        changes = {}
+        for name in cls.fields[part]:  # Пробегаемся по всем полям строки
+            old_value = getattr(old, name) if old is not None else None
+            new_value = getattr(new, name) if new is not None else None
+            if old_value != new_value:  # Если значение изменилось
+                changes[name] = (old_value, new_value)
+        return changes
+
+    def apply(self, result: Union[GetPortfolioResult, PortfolioEvent], parts) -> list[tuple]:
+        """Применение полного портфеля или события портфеля
+
+        :param result: Портфель
+        :param parts: Части портфеля, которые есть в сообщении
+        :return: Изменения [(часть, ключ, {поле: (старое, новое)}), ...]. Часть account - оценка портфеля
+        """
+        changes = []
+        account = {name: (getattr(self, name), getattr(result, name)) for name in ('equity', 'balance') if getattr(self, name) != getattr(result, name)}
+        if account:  # Если изменилась оценка портфеля
+            self.equity, self.balance = result.equity, result.balance
+            changes.append(('account', self.client_id, account))
+        for part in parts:  # Пробегаемся по частям портфеля, которые есть в сообщении
+            row_class, key = self.parts[part]
+            rows = getattr(self, part)  # Текущие строки
+            new_rows = {key(row): row for row in getattr(result, part)}  # Новые строки
+            for row_key, row in new_rows.items():  # Добавленные и измененные строки
+                row_changes = self.row_diff(part, rows.get(row_key), row)
+                if row_changes:
+                    changes.append((part, row_key, row_changes))
+            for row_key in rows.keys() - new_rows.keys():  # Удаленные строки
+                changes.append((part, row_key, self.row_diff(part, rows[row_key], None)))
+            setattr(self, part, new_rows)  # Строки заменяем целиком. Читатели всегда видят целый справочник
+        self.updated = monotonic()
+        return changes
+
+
+class PortfolioCache:
+    """Портфели счетов, обновляемые из событий PortfolioEvent без постоянных запросов get_portfolio
+
+    Портфель счета загружается один раз через get_portfolio, дальше обновляется событиями портфеля. Изменения передаются
+    в обработчик on_change(идентификатор счета, часть портфеля, ключ строки, {поле: (старое значение, новое значение)}).
+    Часть портфеля: account (оценка), positions (ключ - тикер), money (ключ - (рынок, валюта)), currencies (ключ - валюта).
+    Для защиты от пропущенных событий портфели можно редко сверять с сервером в отдельном потоке
+
+    Использование: cache = PortfolioCache(fp_provider.get_portfolio).attach(fp_provider.dispatcher)
+    """
+
+    def __init__(self, get_portfolio: Callable[[str], Union[GetPortfolioResult, None]], on_change: Callable = None):
+        """Инициализация
+
+        :param get_portfolio: Функция получения портфеля по идентификатору счета, например, FinamPy.get_portfolio
+        :param on_change: Обработчик изменений портфеля. None - без обработчика
+        """
+        self.get_portfolio = get_portfolio  # Функция получения портфеля
+        self.on_change = on_change  # Обработчик изменений
+        self.portfolios: dict[str, Portfolio] = {}  # Портфели по идентификатору счета
+        self.event_counts: dict[str, int] = {}  # Количество событий портфеля по идентификатору счета. По нему видно, что событие пришло во время запроса
+        self.lock = Lock()  # Блокировка портфелей и статистики
+        self.stats = {'events': 0, 'loads': 0, 'reconciles': 0, 'drifts': 0, 'stale': 0}  # Событий, загрузок, сверок, расхождений при сверке, устаревших ответов
+        self.reconcile_stop = Event()  # Остановка сверки
+
+    def attach(self, dispatcher: EventDispatcher):
+        """Подключение к событиям портфеля диспетчера
+
+        :param EventDispatcher dispatcher: Диспетчер событий
+        :return: Портфели счетов
+        """
+        dispatcher.add_listener('portfolio', self.on_portfolio)
+        return self
+
+    def detach(self, dispatcher: EventDispatcher):
+        """Отключение от событий портфеля диспетчера
+
+        :param EventDispatcher dispatcher: Диспетчер событий
+        """
+        dispatcher.remove_listener('portfolio', self.on_portfolio)
+
+    @staticmethod
+    def message_parts(message: Union[GetPortfolioResult, PortfolioEvent]) -> tuple:
+        """Части портфеля, которые есть в сообщении
+
+        :param message: Портфель или событие портфеля
+        """
+        content = message.content
+        parts = tuple(part for part, flag in (('positions', content.include_positions), ('money', content.include_money),
+                                              ('currencies', content.include_currencies)) if flag)
+        if parts:  # Если состав портфеля указан
+            return parts
+        return tuple(part for part in Portfolio.parts if getattr(message, part))  # Без состава считаем, что есть только непустые части
+
+    def apply(self, message: Union[GetPortfolioResult, PortfolioEvent], events=None) -> Union[list[tuple], None]:
+        """Применение портфеля или события портфеля с передачей изменений в обработчик
+
+        :param message: Портфель или событие портфеля
+        :param int events: Количество событий портфеля счета перед запросом портфеля. Если после него пришли события, ответ устарел. None - применять всегда
+        :return: Изменения [(часть, ключ, {поле: (старое, новое)}), ...]. None, если ответ устарел
+        """
+        with self.lock:
+            if events is not None and self.event_counts.get(message.client_id, 0) != events:  # Если во время запроса пришло событие портфеля
+                self.stats['stale'] += 1
+                return None  # то ответ мог его затереть, не применяем
+            portfolio = self.portfolios.get(message.client_id)
+            if portfolio is None:  # Если портфеля счета еще нет
+                portfolio = self.portfolios[message.client_id] = Portfolio(message.client_id)
+            changes = portfolio.apply(message, self.message_parts(message))
+        if self.on_change:  # Если задан обработчик изменений
+            for part, key, fields in changes:
+                self.on_change(message.client_id, part, key, fields)
+        return changes
+
+    def on_portfolio(self, event: PortfolioEvent):
+        """Обработчик события портфеля
+
+        :param PortfolioEvent event: Событие портфеля
+        """
+        with self.lock:
+            self.stats['events'] += 1
+            self.event_counts[event.client_id] = self.event_counts.get(event.client_id, 0) + 1  # До применения: запрос, идущий сейчас, устарел
+        self.apply(event)
+
+    def fetch(self, client_id, attempts=2) -> Union[list[tuple], None]:
+        """Запрос портфеля счета с сервера и его применение, если во время запроса не пришли события портфеля
+
+        :param str client_id: Идентификатор торгового счёта
+        :param int attempts: Количество запросов. Если во время запроса пришло событие, портфель запрашивается снова
+        :return: Изменения. None, если портфель не получен или все ответы устарели
+        """
+        for _ in range(attempts):  # Пробуем несколько раз
+            with self.lock:
+                events = self.event_counts.get(client_id, 0)  # Количество событий портфеля счета перед запросом
+            result = self.get_portfolio(client_id)  # Запрос идет без блокировки, события в это время применяются
+            if result is None:  # Если портфель не получен
+                return None
+            if not result.client_id:  # В ответе идентификатора счета может не быть
+                result.client_id = client_id
+            changes = self.apply(result, events)
+            if changes is not None:  # Если ответ применен
+                return changes
+        return None
+
+    def load(self, client_id) -> Union[Portfolio, None]:
+        """Загрузка портфеля счета с сервера
+
+        :param str client_id: Идентификатор торгового счёта
+        :return: Портфель. None, если портфель не получен
+        """
+        if self.fetch(client_id) is None:  # Если портфель не получен или все ответы устарели
+            return self.portfolios.get(client_id)  # то портфель есть, только если его собрали события
+        with self.lock:
+            self.stats['loads'] += 1
+        return self.portfolios[client_id]
+
+    def get(self, client_id) -> Union[Portfolio, None]:
+        """Портфель счета. При первом обращении загружается с сервера
+
+        :param str client_id: Идентификатор торгового счёта
+        """
+        portfolio = self.portfolios.get(client_id)
+        return portfolio if portfolio is not None else self.load(client_id)
+
+    def get_position(self, client_id, security_code) -> Union[PositionRow, None]:
+        """Позиция по тикеру
+
+        :param str client_id: Идентификатор торгового счёта
+        :param str security_code: Тикер
+        """
+        portfolio = self.get(client_id)
+        return portfolio.positions.get(security_code) if portfolio else None
+
+    def get_money(self, client_id, market, currency) -> Union[MoneyRow, None]:
+        """Деньги по рынку и валюте
+
+        :param str client_id: Идентификатор торгового счёта
+        :param market: Рынок
+        :param str currency: Валюта
+        """
+        portfolio = self.get(client_id)
+        return portfolio.money.get((market, currency)) if portfolio else None
+
+    def reconcile(self, client_ids=None) -> int:
+        """Сверка портфелей с сервером
+
+        :param list client_ids: Идентификаторы счетов. None - все загруженные счета
+        :return: Количество найденных расхождений
+        """
+        drifts = 0
+        for client_id in client_ids or list(self.portfolios):  # Пробегаемся по всем счетам
+            changes = self.fetch(client_id)
+            if changes is None:  # Если портфель не получен или события шли во время каждого запроса
+                continue  # то сверим в следующий раз
+            drifts += len(changes)  # Изменения после полного портфеля - пропущенные события
+        with self.lock:
+            self.stats['reconciles'] += 1
+            self.stats['drifts'] += drifts
+        return drifts
+
+    def start_reconciliation(self, interval=60, client_ids=None):
+        """Запуск редкой сверки портфелей с сервером в отдельном потоке
+
+        :param float interval: Период сверки, с
+        :param list client_ids: Идентификаторы счетов. None - все загруженные счета
+        """
+        self.reconcile_stop.clear()
+
+        def reconcile_handler():
+            while not self.reconcile_stop.wait(interval):  # Пока сверку не остановили
+                self.reconcile(client_ids)
+        Thread(target=reconcile_handler, name='PortfolioReconcileThread', daemon=True).start()
+
+    def stop_reconciliation(self):
+        """Остановка сверки портфелей"""
+        self.reconcile_stop.set()
@@ -0,0 +1,125 @@
+from heapq import heappush, heappop, heapify  # Очередь ожидающих запросов по приоритету
+from itertools import count  # Порядок прихода запросов с одинаковым приоритетом
+from threading import Condition  # Ожидание токена
+from time import monotonic  # Пополнение токенов
+from typing import Callable  # Часы
+
+from .Metrics import Histogram  # Гистограмма задержек
+
+
+class TokenBucket:
+    """Ведро токенов: не больше rate запросов в секунду в среднем и не больше capacity подряд"""
+
+    def __init__(self, rate, capacity, now):
+        """Инициализация
+
+        :param float rate: Пополнение токенов в секунду
+        :param float capacity: Емкость ведра. Столько запросов можно выполнить подряд
+        :param float now: Текущее время
+        """
+        self.rate = rate  # Пополнение токенов в секунду
+        self.capacity = capacity  # Емкость ведра
+        self.tokens = float(capacity)  # Токенов в ведре. Вначале ведро полное
+        self.updated = now  # Время последнего пополнения
+
+    def delay(self, now) -> float:
+        """Время до появления токена, с. 0 - токен есть
+
+        :param float now: Текущее время
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)  # Пополняем ведро за прошедшее время
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        """Забираем токен"""
+        self.tokens -= 1
+
+
+class RequestScheduler:
+    """Ограничение частоты запросов к серверу с приоритетами, общее для нескольких клиентов в одном процессе
+
+    Запросы делятся на классы: cancel - снятие заявок, new - новые заявки, query - запросы чтения. У каждого класса
+    свое ведро токенов, несколько классов могут делить одно ведро. Когда токенов нет, запросы ждут в очереди ведра:
+    снятие заявки проходит раньше новой заявки, новая заявка - раньше запроса чтения, внутри класса - в порядке прихода.
+    Задержка в очереди собирается по классам в stats()
+
+    Использование: scheduler = RequestScheduler(); FinamPy(token, scheduler=scheduler); FinamRestPy(client_id, token, scheduler=scheduler)
+    """
+    priorities = {'cancel': 0, 'new': 1, 'query': 2}  # Приоритеты классов запросов. Меньше - важнее
+    default_buckets = {'api': (100 / 60, 10)}  # Ведра по умолчанию: имя - (запросов в секунду, запросов подряд)
+    default_classes = {'cancel': 'api', 'new': 'api', 'query': 'api'}  # Ведро для каждого класса запросов
+    rest_classes = {'DELETE': 'cancel', 'POST': 'new'}  # Классы запросов REST по методу HTTP. Остальные - query
+
+    def __init__(self, buckets: dict[str, tuple[float, float]] = None, classes: dict[str, str] = None, clock: Callable[[], float] = monotonic):
+        """Инициализация
+
+        :param dict buckets: Ведра: имя - (запросов в секунду, запросов подряд). None - default_buckets
+        :param dict classes: Ведро для класса запросов cancel/new/query. Класс без ведра не ограничивается. None - default_classes
+        :param clock: Часы
+        """
+        self.clock = clock  # Часы
+        now = clock()
+        self.buckets = {name: TokenBucket(rate, capacity, now) for name, (rate, capacity) in (buckets or self.default_buckets).items()}  # Ведра по имени
+        self.classes = self.default_classes if classes is None else classes  # Ведро для класса запросов
+        self.queues: dict[str, list[tuple[int, int]]] = {name: [] for name in self.buckets}  # Очереди ожидающих запросов по ведрам: (приоритет, номер)
+        self.sequence = count()  # Номера запросов
+        self.delays = {method_class: Histogram() for method_class in self.priorities}  # Задержка в очереди по классам запросов
+        self.condition = Condition()  # Ожидание токена
+
+    @staticmethod
+    def grpc_class(name) -> str:
+        """Класс запроса по имени функции сервиса gRPC
+
+        :param str name: Имя функции, например, CancelOrder
+        """
+        return 'cancel' if name.startswith('Cancel') else 'new' if name.startswith('New') else 'query'
+
+    def rest_class(self, method) -> str:
+        """Класс запроса по методу HTTP
+
+        :param str method: Метод HTTP: GET, POST, DELETE
+        """
+        return self.rest_classes.get(method, 'query')
+
+    def acquire(self, method_class) -> float:
+        """Ожидание разрешения на запрос
+
+        :param str method_class: Класс запроса: cancel, new, query
+        :return: Задержка в очереди, с
+        """
+        bucket_name = self.classes.get(method_class)
+        if bucket_name is None:  # Если класс не ограничивается
+            return 0.0
+        bucket = self.buckets[bucket_name]  # Ведро класса
+        queue = self.queues[bucket_name]  # Очередь ведра
+        start = self.clock()  # Начало ожидания
+        ticket = (self.priorities[method_class], next(self.sequence))  # Место в очереди
+        with self.condition:
+            heappush(queue, ticket)
+            try:
+                while True:
+                    if queue[0] == ticket:  # Если запрос первый в очереди
+                        wait = bucket.delay(self.clock())  # то ждем только пополнения ведра
+                        if not wait:  # Если токен есть
+                            bucket.take()  # то забираем его
+                            break
+                    else:  # Если впереди более важные или более ранние запросы
+                        wait = None  # то ждем, пока они пройдут
+                    self.condition.wait(wait)
+            finally:
+                if queue[0] == ticket:  # Обычно проходит первый в очереди
+                    heappop(queue)
+                else:  # Ожидание могли прервать
+                    queue.remove(ticket)
+                    heapify(queue)
+                self.condition.notify_all()  # Следующий в очереди проверяет ведро
+            delay = self.clock() - start  # Задержка в очереди
+            self.delays[method_class].observe(delay)  # Под блокировкой ожидания, т.к. запросы идут из разных потоков
+        return delay
+
+    def stats(self) -> dict:
+        """Сводка: задержка в очереди по классам запросов, ожидающие запросы и токены по ведрам"""
+        with self.condition:
+            return {'delays': {method_class: histogram.snapshot() for method_class, histogram in self.delays.items()},
+                    'buckets': {name: {'tokens': bucket.tokens, 'waiting': len(self.queues[name])} for name, bucket in self.buckets.items()}}
@@ -0,0 +1,157 @@
+from collections import OrderedDict  # Порядок последнего обращения для вытеснения
+from threading import Lock  # Блокировка записей
+from time import monotonic  # Срок годности записей
+from typing import Callable, Union  # Запрос и анализ ответа, объединение типов
+
+
+class CacheEntry:
+    """Запись кэша: разобранные данные ответа со сроком годности и признаками для повторной проверки"""
+    __slots__ = ('data', 'expires', 'etag', 'last_modified')
+
+    def __init__(self, data, expires, etag=None, last_modified=None):
+        """Инициализация
+
+        :param data: Данные ответа после check_result
+        :param float expires: Время окончания срока годности по monotonic
+        :param str etag: Заголовок ETag ответа
+        :param str last_modified: Заголовок Last-Modified ответа
+        """
+        self.data = data  # Данные ответа
+        self.expires = expires  # Окончание срока годности
+        self.etag = etag  # ETag
+        self.last_modified = last_modified  # Last-Modified
+
+
+class RestCache:
+    """Кэш ответов запросов чтения REST со сроком годности по точкам доступа и вытеснением давно не используемых записей
+
+    Хранятся уже разобранные данные, поэтому попадание в кэш не требует ни запроса, ни разбора JSON. Устаревшая запись
+    с ETag/Last-Modified проверяется условным запросом: ответ 304 продлевает ее без передачи тела.
+    После заявок и их отмены записи заявок и портфеля счета сбрасываются. Возвращаемые данные общие для всех вызовов, их нельзя изменять
+
+    Использование: FinamRestPy(client_id, token, cache=RestCache())
+    """
+    default_ttl = {'/api/v1/securities': 600.0, '/api/v1/portfolio': 2.0, '/api/v1/orders': 2.0}  # Срок годности по точкам доступа, с
+
+    def __init__(self, ttl: dict[str, float] = None, max_size=256, revalidate=True, clock: Callable[[], float] = monotonic):
+        """Инициализация
+
+        :param dict ttl: Срок годности по пути точки доступа, с. Пути без срока не кэшируются. None - default_ttl
+        :param int max_size: Максимальное количество записей
+        :param bool revalidate: Проверять устаревшие записи условным запросом If-None-Match/If-Modified-Since
+        :param clock: Часы для срока годности
+        """
+        self.ttl = self.default_ttl if ttl is None else ttl  # Срок годности по точкам доступа
+        self.max_size = max_size  # Максимальное количество записей
+        self.revalidate = revalidate  # Проверять устаревшие записи
+        self.clock = clock  # Часы
+        self.entries: OrderedDict[tuple, CacheEntry] = OrderedDict()  # Записи по (путь, параметры). В конце - последние использованные
+        self.generation = 0  # Номер сброса. Ответ, запрошенный до сброса, не сохраняется
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'evictions': 0, 'invalidations': 0}  # Статистика
+        self.lock = Lock()  # Блокировка записей
+
+    @staticmethod
+    def key(path, params=None) -> tuple:
+        """Ключ записи
+
+        :param str path: Путь точки доступа
+        :param dict params: Параметры запроса
+        """
+        return path, tuple(sorted((name, str(value)) for name, value in params.items())) if params else ()
+
+    def is_cached(self, path) -> bool:
+        """Кэшируются ли ответы точки доступа"""
+        return bool(self.ttl.get(path))
+
+    def fetch(self, path, params, request: Callable[[Union[dict, None]], object], check_result: Callable):
+        """Данные ответа из кэша или с сервера
+
+        :param str path: Путь точки доступа
+        :param dict params: Параметры запроса
+        :param request: Запрос к серверу с дополнительными заголовками, возвращает ответ requests
+        :param check_result: Анализ ответа, например, FinamRestPy.check_result
+        :return: Данные ответа. None в случае ошибки, ошибки не кэшируются
+        """
+        ttl = self.ttl.get(path)
+        if not ttl:  # Если точка доступа не кэшируется
+            return check_result(request(None))
+        key = self.key(path, params)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:  # Если запись есть
+                self.entries.move_to_end(key)  # то она использована последней
+                if entry.expires > self.clock():  # Если запись не устарела
+                    self.stats['hits'] += 1
+                    return entry.data
+            self.stats['misses'] += 1
+            generation = self.generation  # Номер сброса на момент запроса
+        headers = self.conditional_headers(entry) if entry is not None and self.revalidate else None  # Устаревшую запись проверяем условным запросом
+        response = request(headers)
+        if response.status_code == 304 and headers:  # Если данные не изменились
+            with self.lock:
+                entry.expires = self.clock() + ttl  # то продлеваем запись
+                self.stats['revalidated'] += 1
+            return entry.data
+        data = check_result(response)
+        if data is not None:  # Если ответ без ошибки
+            self.put(key, data, ttl, response.headers, generation)
+        return data
+
+    @staticmethod
+    def conditional_headers(entry: CacheEntry) -> Union[dict, None]:
+        """Заголовки условного запроса для записи. None - записи нечем проверить"""
+        headers = {}
+        if entry.etag:  # Если у записи есть ETag
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:  # Если у записи есть время изменения
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers or None
+
+    def put(self, key, data, ttl, headers=None, generation=None):
+        """Сохранение записи с вытеснением давно не используемых
+
+        :param tuple key: Ключ записи
+        :param data: Данные ответа
+        :param float ttl: Срок годности, с
+        :param headers: Заголовки ответа
+        :param int generation: Номер сброса на момент запроса. None - сохранить в любом случае
+        """
+        headers = headers or {}
+        with self.lock:
+            if generation is not None and generation != self.generation:  # Если после запроса был сброс
+                return  # то ответ мог устареть, не сохраняем
+            self.entries[key] = CacheEntry(data, self.clock() + ttl, headers.get('ETag'), headers.get('Last-Modified'))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:  # Пока записей больше допустимого
+                self.entries.popitem(last=False)  # вытесняем давно не используемую
+                self.stats['evictions'] += 1
+
+    def invalidate(self, *paths, client_id=None):
+        """Сброс записей
+
+        :param paths: Пути точек доступа. Без путей - все записи
+        :param str client_id: Только записи этого счета. None - всех счетов
+        """
+        with self.lock:
+            self.generation += 1
+            for key in list(self.entries):
+                path, params = key
+                if paths and path not in paths:  # Если путь не тот
+                    continue
+                if client_id is not None and ('ClientId', str(client_id)) not in params:  # Если счет не тот
+                    continue
+                del self.entries[key]
+                self.stats['invalidations'] += 1
+
+    def clear(self):
+        """Сброс всех записей"""
+        self.invalidate()
+
+    @property
+    def hit_ratio(self) -> float:
+        """Доля попаданий в кэш"""
+        requests = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / requests if requests else 0.0
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,87 @@
+from threading import Lock  # Блокировка статистики
+from time import perf_counter  # Замер длительности запросов
+from typing import Callable, Union  # Обработчик запросов, объединение типов
+
+from requests import Session, Response  # Сессия с постоянными соединениями
+from requests.adapters import HTTPAdapter  # Пул соединений
+
+from .RequestScheduler import RequestScheduler  # Ограничение частоты запросов с приоритетами
+
+
+class RestTransport:
+    """Транспорт запросов REST: сессия с пулом постоянных соединений, заголовками и таймаутами по умолчанию
+
+    Соединение TCP+TLS устанавливается один раз и переиспользуется всеми запросами. Длительность запросов
+    собирается по точкам доступа (метод, путь) и может передаваться в обработчик on_request(метод, путь, статус, длительность)
+    """
+
+    def __init__(self, server, access_token, pool_size=10, timeout=(3.05, 30), retries=0, session: Session = None, scheduler: RequestScheduler = None):
+        """Инициализация
+
+        :param str server: Сервер, например, https://trade-api.comon.ru
+        :param str access_token: Торговый токен доступа по умолчанию. Клиенты передают свой токен в заголовках каждого запроса
+        :param int pool_size: Максимальное количество постоянных соединений с сервером
+        :param timeout: Таймаут по умолчанию, с: число или (подключение, чтение)
+        :param int retries: Количество повторов при ошибке подключения
+        :param Session session: Своя сессия requests. None - создать новую
+        :param RequestScheduler scheduler: Ограничение частоты запросов с приоритетами. None - без ограничения
+        """
+        self.server = server.rstrip('/')  # Сервер
+        self.timeout = timeout  # Таймаут по умолчанию
+        self.session = session or Session()  # Сессия с постоянными соединениями
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries)  # Пул соединений к одному серверу
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'accept': 'text/plain', 'X-Api-Key': access_token})  # Заголовки собираются один раз
+        self.on_request: Union[Callable, None] = None  # Обработчик завершения запроса (метод, путь, статус, длительность). None - без обработчика
+        self.stats: dict[tuple[str, str], dict] = {}  # Статистика по (метод, путь): count, errors, total, max
+        self.scheduler = scheduler  # Ограничение частоты запросов
+        self.lock = Lock()  # Блокировка статистики
+
+    def request(self, method, path, params=None, timeout=None, headers=None, stream=False) -> Response:
+        """Запрос к серверу
+
+        :param str method: Метод HTTP: GET, POST, DELETE
+        :param str path: Путь, например, /api/v1/orders
+        :param dict params: Параметры запроса
+        :param timeout: Таймаут, с. None - по умолчанию
+        :param dict headers: Дополнительные заголовки
+        :param bool stream: Читать тело ответа по частям через iter_content. Длительность - до получения заголовков
+        :return: Ответ сервера
+        """
+        if self.scheduler:  # Если частота запросов ограничена
+            self.scheduler.acquire(self.scheduler.rest_class(method))  # то ждем своей очереди. Задержка в очереди не входит в длительность запроса
+        start = perf_counter()  # Начало запроса
+        status = None  # Статус ответа. None - ответ не получен
+        try:
+            response = self.session.request(method, f'{self.server}{path}', params=params, headers=headers, timeout=timeout or self.timeout, stream=stream)
+            status = response.status_code
+            return response
+        finally:
+            duration = perf_counter() - start  # Длительность запроса
+            with self.lock:
+                stats = self.stats.get((method, path))
+                if stats is None:  # Если запросов к этой точке доступа еще не было
+                    stats = self.stats[(method, path)] = {'count': 0, 'errors': 0, 'total': 0.0, 'max': 0.0}
+                stats['count'] += 1
+                stats['errors'] += status is None or status >= 400
+                stats['total'] += duration
+                stats['max'] = max(stats['max'], duration)
+            if self.on_request:  # Если задан обработчик запросов
+                self.on_request(method, path, status, duration)
+
+    def get(self, path, params=None, **kwargs) -> Response:
+        """Запрос GET"""
+        return self.request('GET', path, params, **kwargs)
+
+    def post(self, path, params=None, **kwargs) -> Response:
+        """Запрос POST"""
+        return self.request('POST', path, params, **kwargs)
+
+    def delete(self, path, params=None, **kwargs) -> Response:
+        """Запрос DELETE"""
+        return self.request('DELETE', path, params, **kwargs)
+
+    def close(self):
+        """Закрытие всех соединений"""
+        self.session.close()
@@ -0,0 +1,208 @@
+import os  # Файл справочника на диске
+import re  # Имя файла справочника по серверу
+from json import dumps  # Справочник REST хранится в JSON
+from tempfile import gettempdir  # Папка для файла справочника по умолчанию
+from threading import Lock  # Блокировка ленивой загрузки
+from time import time  # Проверка срока годности файла
+from typing import Callable, Union  # Функция получения справочника, объединение типов
+
+from .grpc.tradeapi.v1.securities_pb2 import GetSecuritiesResult  # Справочник инструментов gRPC
+from .JsonStream import JsonStream  # Быстрый разбор JSON из байт
+
+
+class SecuritiesCache:
+    """Справочник инструментов с хранением на диске, сроком годности и индексами
+
+    Справочник загружается лениво при первом обращении: из файла, если он не старше ttl, иначе с сервера с записью в файл.
+    В первой строке файла записан сервер, с которого получен справочник. Файл другого сервера не используется.
+    Поиск инструмента по (режим торгов, тикер), тикеру и коду инструмента выполняется по хэш индексам
+    """
+    file_name = 'FinamPySecurities.bin'  # Имя файла справочника по умолчанию
+    fields = {'board': 'board', 'code': 'code', 'ticker': 'ticker', 'instrument_code': 'instrument_code', 'market': 'market'}  # Имена полей инструмента
+
+    def __init__(self, get_securities: Callable, path=None, ttl=24 * 60 * 60, source=''):
+        """Инициализация
+
+        :param get_securities: Функция получения справочника инструментов с сервера
+        :param str path: Файл справочника. None - файл сервера во временной папке
+        :param int ttl: Срок годности файла справочника, с
+        :param str source: Сервер, с которого получается справочник, например, trade-api.finam.ru
+        """
+        self.get_securities = get_securities  # Функция получения справочника с сервера
+        self.source = source  # Сервер справочника
+        self.path = path or os.path.join(gettempdir(), self.default_file_name(source))  # Файл справочника
+        self.ttl = ttl  # Срок годности файла, с
+        self.lock = Lock()  # Блокировка ленивой загрузки
+        self.securities: Union[list, None] = None  # Инструменты. None - справочник еще не загружен
+        self.by_board_code = {}  # Инструмент по (режим торгов, тикер)
+        self.by_ticker = {}  # Инструменты по тикеру
+        self.by_instrument_code = {}  # Инструменты по коду инструмента
+        self.by_market = {}  # Инструменты по рынку
+
+    @classmethod
+    def default_file_name(cls, source) -> str:
+        """Имя файла справочника по умолчанию для сервера. У каждого сервера свой файл
+
+        :param str source: Сервер справочника
+        """
+        if not source:  # Если сервер не задан
+            return cls.file_name
+        name, extension = os.path.splitext(cls.file_name)
+        return f'{name}_{re.sub(r"[^0-9A-Za-z.-]", "_", source)}{extension}'  # Недопустимые в имени файла символы (://) заменяем
+
+    # Формат справочника. Переопределяется для REST
+
+    def records(self, data) -> list:
+        """Список инструментов из ответа сервера"""
+        return list(data.securities)
+
+    def serialize(self, data) -> bytes:
+        """Ответ сервера в байты для записи в файл"""
+        return data.SerializeToString()
+
+    def deserialize(self, content: bytes):
+        """Ответ сервера из байт файла"""
+        return GetSecuritiesResult.FromString(content)
+
+    def field(self, security, name):
+        """Значение поля инструмента"""
+        return getattr(security, self.fields[name])
+
+    # Загрузка
+
+    def is_fresh(self) -> bool:
+        """Файл справочника существует и не старше срока годности"""
+        try:
+            return time() - os.path.getmtime(self.path) < self.ttl
+        except OSError:  # Если файла нет
+            return False
+
+    def load(self, force=False):
+        """Загрузка справочника и построение индексов
+
+        :param bool force: Загрузить справочник с сервера, даже если файл не устарел
+        :return: Справочник инструментов
+        """
+        with self.lock:
+            if self.securities is not None and not force:  # Если справочник уже загружен
+                return self
+            data = None
+            if not force and self.is_fresh():  # Если файл справочника не устарел
+                try:
+                    with open(self.path, 'rb') as f:
+                        source, _, content = f.read().partition(b'\n')  # Сервер справочника и ответ сервера
+                    if source.decode('utf-8') == self.source:  # Если справочник получен с этого сервера
+                        data = self.deserialize(content)  # то читаем справочник из файла
+                except Exception:  # Если файл не читается
+                    data = None  # то загрузим справочник с сервера
+            if data is None:  # Если справочника из файла нет
+                data = self.get_securities()  # Получаем справочник с сервера
+                if data is None:  # Если сервер не вернул справочник
+                    raise ConnectionError('Не удалось получить справочник инструментов с сервера')
+                self.save(data)
+            self.index(self.records(data))
+        return self
+
+    def save(self, data):
+        """Запись ответа сервера в файл справочника. Файл подменяется целиком, чтобы другие процессы не прочитали его частично
+
+        :param data: Ответ сервера
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = f'{self.path}.{os.getpid()}.tmp'  # Временный файл
+        with open(temp_path, 'wb') as f:
+            f.write(self.source.encode('utf-8') + b'\n')  # Сервер справочника для проверки при чтении
+            f.write(self.serialize(data))
+        os.replace(temp_path, self.path)
+
+    def index(self, securities: list):
+        """Построение индексов
+
+        :param list securities: Инструменты
+        """
+        by_board_code, by_ticker, by_instrument_code, by_market = {}, {}, {}, {}
+        field = self.field
+        for security in securities:  # Пробегаемся по всем инструментам один раз
+            by_board_code[(field(security, 'board'), field(security, 'code'))] = security
+            by_ticker.setdefault(field(security, 'ticker'), []).append(security)
+            by_instrument_code.setdefault(field(security, 'instrument_code'), []).append(security)
+            by_market.setdefault(field(security, 'market'), []).append(security)
+        self.by_board_code, self.by_ticker, self.by_instrument_code, self.by_market = by_board_code, by_ticker, by_instrument_code, by_market
+        self.securities = securities
+
+    def invalidate(self):
+        """Сброс справочника. Следующее обращение загрузит его с сервера"""
+        with self.lock:
+            self.securities = None
+            try:
+                os.remove(self.path)
+            except OSError:  # Если файла нет
+                pass
+
+    # Поиск
+
+    def get_all(self, market=None) -> list:
+        """Все инструменты
+
+        :param market: Рынок. None - все рынки
+        """
+        if self.securities is None:
+            self.load()
+        return self.securities if market is None else self.by_market.get(market, [])
+
+    def get(self, board, code):
+        """Инструмент по режиму торгов и тикеру
+
+        :param str board: Режим торгов
+        :param str code: Тикер инструмента
+        :return: Инструмент или None, если не найден
+        """
+        if self.securities is None:
+            self.load()
+        return self.by_board_code.get((board, code))
+
+    def find_by_ticker(self, ticker, market=None) -> list:
+        """Инструменты по тикеру
+
+        :param str ticker: Тикер
+        :param market: Рынок. None - все рынки
+        """
+        if self.securities is None:
+            self.load()
+        return self.filter(self.by_ticker.get(ticker, []), market)
+
+    def find_by_instrument_code(self, instrument_code, market=None) -> list:
+        """Инструменты по коду инструмента
+
+        :param str instrument_code: Код инструмента
+        :param market: Рынок. None - все рынки
+        """
+        if self.securities is None:
+            self.load()
+        return self.filter(self.by_instrument_code.get(instrument_code, []), market)
+
+    def filter(self, securities: list, market) -> list:
+        """Отбор инструментов по рынку
+
+        :param list securities: Инструменты
+        :param market: Рынок. None - все рынки
+        """
+        return securities if market is None else [security for security in securities if self.field(security, 'market') == market]
+
+
+class RestSecuritiesCache(SecuritiesCache):
+    """Справочник инструментов FinamRestPy. Инструменты - справочники из JSON"""
+    file_name = 'FinamRestPySecurities.json'  # Имя файла справочника по умолчанию
+    fields = {'board': 'board', 'code': 'code', 'ticker': 'ticker', 'instrument_code': 'instrumentCode', 'market': 'market'}  # Имена полей инструмента в JSON
+
+    def records(self, data) -> list:
+        return data['securities'] if isinstance(data, dict) else data
+
+    def serialize(self, data) -> bytes:
+        return dumps(data, ensure_ascii=False).encode('utf-8')
+
+    def deserialize(self, content: bytes):
+        return JsonStream.loads(content)
+
+    def field(self, security, name):
+        return security.get(self.fields[name])
@@ -0,0 +1,199 @@
+import os  # Файл таблицы
+from mmap import mmap, ACCESS_READ  # Отображение файла в память только для чтения
+from struct import Struct  # Заголовок файла
+from typing import Union  # Объединение типов
+
+import numpy as np  # Колонки таблицы
+
+from .grpc.tradeapi.v1.securities_pb2 import GetSecuritiesResult  # Справочник инструментов
+from .proto.tradeapi.v1.security_pb2 import Security  # Инструмент
+
+
+class SecurityView:
+    """Инструмент в таблице. Значения колонок читаются из отображенного файла только при обращении"""
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table, row):
+        """Инициализация
+
+        :param SecuritiesTable table: Таблица инструментов
+        :param int row: Номер строки
+        """
+        self.table = table  # Таблица инструментов
+        self.row = row  # Номер строки
+
+    def __getattr__(self, name):
+        """Значение колонки инструмента"""
+        return self.table.value(name, self.row)
+
+    def to_security(self) -> Security:
+        """Инструмент в виде сообщения protobuf"""
+        return Security(**{name: self.table.value(name, self.row) for name in self.table.columns})
+
+    def __repr__(self):
+        return f'SecurityView({self.board}.{self.code})'
+
+
+class SecuritiesTable:
+    """Справочник инструментов в колоночном двоичном файле, отображаемом в память
+
+    Числовые колонки хранятся массивами фиксированной ширины, строковые - номерами строк в общей таблице интернированных строк.
+    Файл открывается только для чтения через mmap, поэтому страницы справочника общие для всех процессов.
+    Строки таблицы отсортированы по (режим торгов, тикер) для двоичного поиска без построения индексов в памяти процесса
+    """
+    magic = b'FPSECTBL'  # Сигнатура файла
+    version = 1  # Версия формата
+    header = Struct('<8sIII')  # Сигнатура, версия, количество инструментов, количество строк в таблице строк
+    numeric_columns = {'market': np.int32, 'decimals': np.int32, 'lot_size': np.int32, 'min_step': np.int32, 'lot_divider': np.int32,
+                       'properties': np.int32, 'price_sign': np.int32, 'bp_cost': np.float64, 'accrued_interest': np.float64}  # Числовые колонки. Целые в security.proto - sint32/enum
+    string_columns = ('board', 'code', 'ticker', 'instrument_code', 'short_name', 'currency', 'time_zone_name')  # Строковые колонки
+    columns = (*string_columns, *numeric_columns)  # Все колонки
+
+    @staticmethod
+    def align(offset) -> int:
+        """Выравнивание смещения колонки на 8 байт"""
+        return (offset + 7) & ~7
+
+    @classmethod
+    def layout(cls, rows, strings):
+        """Смещения колонок в файле
+
+        :param int rows: Количество инструментов
+        :param int strings: Количество строк в таблице строк
+        :return: Смещения колонок, смещение таблицы смещений строк, смещение данных строк
+        """
+        offset = cls.align(cls.header.size)
+        offsets = {}
+        for name in cls.string_columns:  # Номера строк
+            offsets[name] = offset
+            offset = cls.align(offset + rows * 4)
+        for name, dtype in cls.numeric_columns.items():  # Числовые колонки
+            offsets[name] = offset
+            offset = cls.align(offset + rows * np.dtype(dtype).itemsize)
+        strings_offset = offset  # Смещения строк в данных строк
+        data_offset = cls.align(offset + (strings + 1) * 8)
+        return offsets, strings_offset, data_offset
+
+    @classmethod
+    def export(cls, securities: Union[GetSecuritiesResult, list], path):
+        """Выгрузка справочника инструментов в файл
+
+        :param securities: Справочник инструментов GetSecuritiesResult или список инструментов Security
+        :param str path: Файл таблицы
+        """
+        if isinstance(securities, GetSecuritiesResult):
+            securities = securities.securities
+        securities = sorted(securities, key=lambda security: (security.board, security.code))  # Сортируем для двоичного поиска
+        rows = len(securities)
+        strings = {}  # Номер строки по строке. Одинаковые строки (валюта, режим торгов, ...) хранятся один раз
+        string_indexes = {name: np.fromiter((strings.setdefault(getattr(security, name), len(strings)) for security in securities), np.uint32, rows)
+                          for name in cls.string_columns}
+        numeric = {name: np.fromiter((getattr(security, name) for security in securities), dtype, rows) for name, dtype in cls.numeric_columns.items()}
+        encoded = [string.encode('utf-8') for string in strings]  # Строки в порядке номеров
+        string_offsets = np.zeros(len(encoded) + 1, np.uint64)
+        np.cumsum([len(item) for item in encoded], out=string_offsets[1:])
+        offsets, strings_offset, data_offset = cls.layout(rows, len(encoded))
+        temp_path = f'{path}.{os.getpid()}.tmp'  # Файл подменяется целиком, чтобы другие процессы не прочитали его частично
+        with open(temp_path, 'wb') as f:
+            f.write(cls.header.pack(cls.magic, cls.version, rows, len(encoded)))
+            for name, column in (*string_indexes.items(), *numeric.items(), ('', string_offsets)):
+                f.write(b'\0' * ((offsets.get(name, strings_offset)) - f.tell()))  # Выравнивание
+                f.write(column.tobytes())
+            f.write(b'\0' * (data_offset - f.tell()))
+            f.write(b''.join(encoded))
+        os.replace(temp_path, path)
+
+    def __init__(self, path):
+        """Открытие файла таблицы
+
+        :param str path: Файл таблицы
+        """
+        self.path = path  # Файл таблицы
+        with open(path, 'rb') as f:
+            self.mm = mmap(f.fileno(), 0, access=ACCESS_READ)  # Отображение файла в память только для чтения
+        magic, version, self.rows, strings = self.header.unpack_from(self.mm, 0)
+        if magic != self.magic or version != self.version:  # Если формат файла не тот
+            self.mm.close()
+            raise ValueError(f'Файл {path} не является таблицей инструментов версии {self.version}')
+        offsets, strings_offset, self.data_offset = self.layout(self.rows, strings)
+        self.arrays = {name: np.frombuffer(self.mm, np.uint32, self.rows, offsets[name]) for name in self.string_columns}  # Колонки без копирования
+        self.arrays.update({name: np.frombuffer(self.mm, dtype, self.rows, offsets[name]) for name, dtype in self.numeric_columns.items()})
+        self.string_offsets = np.frombuffer(self.mm, np.uint64, strings + 1, strings_offset)  # Смещения строк
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, row) -> SecurityView:
+        if not -self.rows <= row < self.rows:
+            raise IndexError(row)
+        return SecurityView(self, row % self.rows)
+
+    def __iter__(self):
+        return (SecurityView(self, row) for row in range(self.rows))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def column(self, name) -> np.ndarray:
+        """Колонка таблицы без копирования. Для строковых колонок - номера строк в таблице строк
+
+        Колонка - представление отображенного файла. Пока она жива, отображение не закрывается: close() отложит закрытие
+        до освобождения всех колонок. Если колонка нужна после close(), ее надо скопировать (column(name).copy())
+
+        :param str name: Имя колонки
+        """
+        return self.arrays[name]
+
+    def string(self, index) -> str:
+        """Строка из таблицы строк
+
+        :param int index: Номер строки
+        """
+        start, end = self.string_offsets[index], self.string_offsets[index + 1]
+        return self.mm[self.data_offset + int(start):self.data_offset + int(end)].decode('utf-8')
+
+    def value(self, name, row):
+        """Значение колонки инструмента
+
+        :param str name: Имя колонки
+        :param int row: Номер строки
+        """
+        try:
+            column = self.arrays[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        if name in self.numeric_columns:  # Числовая колонка
+            return column[row].item()
+        return self.string(column[row])  # Строковая колонка
+
+    def find(self, board, code) -> Union[SecurityView, None]:
+        """Инструмент по режиму торгов и тикеру двоичным поиском
+
+        :param str board: Режим торгов
+        :param str code: Тикер инструмента
+        :return: Инструмент или None, если не найден
+        """
+        key = (board, code)
+        low, high = 0, self.rows
+        while low < high:  # Двоичный поиск по отсортированным строкам
+            middle = (low + high) // 2
+            if (self.value('board', middle), self.value('code', middle)) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.rows and (self.value('board', low), self.value('code', low)) == key:
+            return SecurityView(self, low)
+        return None
+
+    def close(self):
+        """Закрытие отображения файла. Если снаружи еще держат колонки из column(), отображение закроется после их освобождения"""
+        self.arrays = {}  # Представления массивов держат ссылку на отображение
+        self.string_offsets = None
+        try:
+            self.mm.close()
+        except BufferError:  # Если есть живые представления колонок
+            pass  # то отображение закроется сборщиком мусора, когда освободится последнее из них
+        self.mm = None  # Справочником больше пользоваться нельзя
@@ -1,2 +1,4 @@
 from .FinamPy import FinamPy
 from .FinamRestPy import FinamRestPy
+from .AsyncFinamPy import AsyncFinamPy
+from .AsyncFinamRestPy import AsyncFinamRestPy